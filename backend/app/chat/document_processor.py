@@ -1,7 +1,82 @@
 import io
-from typing import BinaryIO
-from PyPDF2 import PdfReader
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import BinaryIO, Optional, Union
+import fitz
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from tokenizers import Tokenizer
+
+
+# Below this many pages the pool round-trip costs more than it saves
+PARALLEL_PAGE_THRESHOLD = 8
+PAGE_WORKERS = os.cpu_count() or 1
+
+# Chunk sizes are measured in tokens of the embedding model, not characters
+EMBEDDING_TOKENIZER = "nomic-ai/nomic-embed-text-v1.5"
+CHUNK_SIZE_TOKENS = 200
+CHUNK_OVERLAP_TOKENS = 20
+MIN_CHUNK_TOKENS = 100
+MAX_MERGED_CHUNK_TOKENS = 230
+
+_page_pool: Optional[ProcessPoolExecutor] = None
+
+
+@lru_cache(maxsize=1)
+def _get_tokenizer() -> Tokenizer:
+    """Load the embedding tokenizer on first chunking rather than at import."""
+    return Tokenizer.from_pretrained(EMBEDDING_TOKENIZER)
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    """Lazily create the shared process pool used for page extraction."""
+    global _page_pool
+    if _page_pool is None:
+        _page_pool = ProcessPoolExecutor(max_workers=PAGE_WORKERS)
+    return _page_pool
+
+
+def _open_pdf(source: Union[bytes, str]) -> fitz.Document:
+    """Open a PDF from raw bytes or from a path on disk."""
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _pdf_source(file) -> Union[bytes, str]:
+    """
+    Resolve an upload into something PyMuPDF can open.
+    
+    Files that already live on disk are opened by path so MuPDF reads pages
+    on demand instead of going through a Python ``bytes`` copy; everything
+    else is read once into memory.
+    
+    Args:
+        file: Raw bytes, a binary file object, or an UploadFile
+        
+    Returns:
+        The PDF bytes or a filesystem path
+    """
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    
+    # FastAPI's UploadFile wraps the spooled temp file in .file
+    file = getattr(file, "file", file)
+    name = getattr(file, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    
+    file.seek(0)  # Always reset pointer
+    return file.read()
+
+
+def _extract_page_range(source: Union[bytes, str], start: int, stop: int) -> list[str]:
+    """Worker: open the PDF once and extract text for pages [start, stop)."""
+    doc = _open_pdf(source)
+    try:
+        return [doc[i].get_text("text") for i in range(start, stop)]
+    finally:
+        doc.close()
 
 
 class DocumentProcessor:
@@ -9,34 +84,72 @@ class DocumentProcessor:
     
     def __init__(self):
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+            chunk_size=CHUNK_SIZE_TOKENS,
+            chunk_overlap=CHUNK_OVERLAP_TOKENS,
+            length_function=self.count_tokens,
+            separators=["\n\n", "\n", ". ", " ", ""]
         )
     
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        """Number of embedding-model tokens in text."""
+        return len(_get_tokenizer().encode(text, add_special_tokens=False).ids)
+    
     def extract_text_from_pdf(self, file: BinaryIO) -> str:
         try:
-            # 🔥 Convert bytes → file-like object if needed
-            if isinstance(file, bytes):
-                file = io.BytesIO(file)
+            # 🔥 Open on-disk uploads by path, raw bytes straight from memory
+            source = _pdf_source(file)
 
-            file.seek(0)  # Always reset pointer
+            doc = _open_pdf(source)
+            try:
+                page_count = doc.page_count
+                if page_count < PARALLEL_PAGE_THRESHOLD:
+                    page_texts = [page.get_text("text") for page in doc]
+            finally:
+                doc.close()
 
-            pdf_reader = PdfReader(file)
-            text_parts = []
+            if page_count >= PARALLEL_PAGE_THRESHOLD:
+                page_texts = self._extract_pages_parallel(source, page_count)
 
-            for page in pdf_reader.pages:
-                text = page.extract_text()
+            # Single writer instead of join() + strip() on a list of parts
+            buf = io.StringIO()
+            for text in page_texts:
                 if text:
-                    text_parts.append(text)
-
-            full_text = "\n\n".join(text_parts)
-            return full_text.strip()
+                    buf.write(text)
+                    buf.write("\n\n")
+            return buf.getvalue().strip()
 
         except Exception as e:
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
 
+    def _extract_pages_parallel(self, source: Union[bytes, str], page_count: int) -> list[str]:
+        """
+        Extract page text across the shared process pool.
+
+        Pages are split into one contiguous range per worker so the PDF is
+        shipped (and parsed) once per worker rather than once per page.
+
+        Args:
+            source: Raw PDF content or path to the PDF on disk
+            page_count: Number of pages in the document
+
+        Returns:
+            Page texts in page order
+        """
+        workers = min(PAGE_WORKERS, page_count)
+        step = -(-page_count // workers)  # ceil division
+        starts = range(0, page_count, step)
+
+        page_texts = []
+        for texts in _get_page_pool().map(
+            _extract_page_range,
+            [source] * len(starts),
+            starts,
+            [min(start + step, page_count) for start in starts],
+        ):
+            page_texts.extend(texts)
+        return page_texts
+
     
     def chunk_text(self, text: str) -> list[str]:
         """
@@ -51,15 +164,85 @@ class DocumentProcessor:
         if not text or not text.strip():
             return []
         
+        # Two passes: recursive split, then greedy re-pack of the fragments
         chunks = self.text_splitter.split_text(text)
-        return chunks
+        chunks = self._pack_chunks(chunks)
+        return self._merge_small_chunks(chunks)
+    
+    def _pack_chunks(self, chunks: list[str]) -> list[str]:
+        """
+        Greedily re-pack split fragments up to CHUNK_SIZE_TOKENS.
+        
+        Consecutive fragments are joined while the running buffer fits the
+        chunk budget; any flushed chunk that still exceeds it is re-split with
+        the same separator cascade.
+        
+        Args:
+            chunks: Chunks as produced by the splitter
+            
+        Returns:
+            Packed chunks, each within the token budget where possible
+        """
+        packed: list[str] = []
+        buf: list[str] = []
+        buf_tokens = 0
+        
+        def flush():
+            if not buf:
+                return
+            chunk = "\n".join(buf)
+            if buf_tokens > CHUNK_SIZE_TOKENS:
+                packed.extend(self.text_splitter.split_text(chunk))
+            else:
+                packed.append(chunk)
+        
+        for chunk in chunks:
+            tokens = self.count_tokens(chunk)
+            if buf and buf_tokens + tokens > CHUNK_SIZE_TOKENS:
+                flush()
+                buf, buf_tokens = [], 0
+            buf.append(chunk)
+            buf_tokens += tokens
+        flush()
+        
+        return packed
+    
+    def _merge_small_chunks(self, chunks: list[str]) -> list[str]:
+        """
+        Fold undersized chunks into their preceding neighbour.
+        
+        A chunk shorter than MIN_CHUNK_TOKENS is appended to the previous one
+        as long as the combined chunk stays under MAX_MERGED_CHUNK_TOKENS.
+        
+        Args:
+            chunks: Chunks as produced by the splitter
+            
+        Returns:
+            Chunks with small fragments merged
+        """
+        merged: list[str] = []
+        merged_tokens: list[int] = []
+        
+        for chunk in chunks:
+            tokens = self.count_tokens(chunk)
+            if merged:
+                prev_tokens = merged_tokens[-1]
+                is_small = tokens < MIN_CHUNK_TOKENS or prev_tokens < MIN_CHUNK_TOKENS
+                if is_small and prev_tokens + tokens < MAX_MERGED_CHUNK_TOKENS:
+                    merged[-1] = f"{merged[-1]}\n{chunk}"
+                    merged_tokens[-1] = prev_tokens + tokens
+                    continue
+            merged.append(chunk)
+            merged_tokens.append(tokens)
+        
+        return merged
     
     def process_document(self, file: BinaryIO, filename: str) -> tuple[str, list[str]]:
         """
         Process document: extract text and chunk it.
         
         Args:
-            file: Binary file object
+            file: UploadFile, binary file object or raw bytes
             filename: Name of the file
             
         Returns:
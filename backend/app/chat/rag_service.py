@@ -1,10 +1,43 @@
+import asyncio
+import logging
 import os
 import shutil
+import threading
+import uuid
+from collections import OrderedDict
 from typing import Optional, List
+import numpy as np
+from chromadb.config import Settings
 from langchain_chroma import Chroma
 from langchain_nomic import NomicEmbeddings
 from langchain_core.documents import Document
 
+logger = logging.getLogger(__name__)
+
+
+# Chunks per embedding request
+EMBED_BATCH_SIZE = 96
+
+# Nomic v1.5 is Matryoshka-trained: truncated 256-dim vectors keep nearly all
+# retrieval quality at a third of the index size
+EMBEDDING_DIMENSIONALITY = 256
+COLLECTION_METADATA = {"hnsw:space": "cosine"}
+
+# Retrieval keeps chunks closer than this cosine distance (1 - cos). 0.3
+# matches the old squared-L2 cutoff of 0.6 on these unit-length vectors
+# (cos > 0.7)
+SCORE_THRESHOLD = 0.3
+
+# All users share one collection; rows are scoped by user_id metadata so a
+# single HNSW graph serves every user instead of one small graph per user
+SHARED_COLLECTION_NAME = "users"
+
+# Per-user collections from before the shared one, named user_<id>
+LEGACY_COLLECTION_PREFIX = "user_"
+
+# Query text -> embedding, so repeated questions skip the Nomic round-trip
+MAX_CACHED_QUERY_VECTORS = 2048
+
 
 class RAGService:
     """Handles vector database operations and document retrieval."""
@@ -19,14 +52,117 @@ class RAGService:
         self.vector_db_dir = vector_db_dir
         self.embedding_function = NomicEmbeddings(
             model="nomic-embed-text-v1.5",
+            dimensionality=EMBEDDING_DIMENSIONALITY,
         )
         
+        # Shared Chroma handle, opened lazily and reused across requests
+        self._vector_db: Optional[Chroma] = None
+        self._lock = threading.Lock()
+        
+        # Recently embedded queries
+        self._query_vectors: "OrderedDict[str, tuple]" = OrderedDict()
+        
         # Ensure directory exists
         os.makedirs(vector_db_dir, exist_ok=True)
     
-    def _get_collection_name(self, user_id: str) -> str:
-        """Get collection name for a user."""
-        return f"user_{user_id}"
+    @staticmethod
+    def _user_filter(user_id: str) -> dict:
+        """Metadata filter restricting a query to one user's chunks."""
+        return {"user_id": user_id}
+    
+    def _client(self) -> Chroma:
+        """Return the shared Chroma handle, opening it on first use."""
+        with self._lock:
+            if self._vector_db is None:
+                self._vector_db = Chroma(
+                    collection_name=SHARED_COLLECTION_NAME,
+                    embedding_function=self.embedding_function,
+                    persist_directory=self.vector_db_dir,
+                    collection_metadata=COLLECTION_METADATA,
+                    client_settings=Settings(
+                        anonymized_telemetry=False,
+                        allow_reset=False,
+                        is_persistent=True,
+                        persist_directory=self.vector_db_dir,
+                    ),
+                )
+            return self._vector_db
+    
+    def _cached_query_vector(self, query: str) -> Optional[tuple]:
+        """Return a previously computed query embedding, if any."""
+        with self._lock:
+            vector = self._query_vectors.get(query)
+            if vector is not None:
+                self._query_vectors.move_to_end(query)
+            return vector
+    
+    def _remember_query_vector(self, query: str, vector: List[float]) -> tuple:
+        """Store a query embedding in the LRU and return it."""
+        vector = tuple(vector)
+        with self._lock:
+            self._query_vectors[query] = vector
+            if len(self._query_vectors) > MAX_CACHED_QUERY_VECTORS:
+                self._query_vectors.popitem(last=False)
+        return vector
+    
+    def _embed_query(self, query: str) -> tuple:
+        """Embed a search query, reusing cached vectors."""
+        vector = self._cached_query_vector(query)
+        if vector is None:
+            vector = self._remember_query_vector(
+                query, self.embedding_function.embed_query(query)
+            )
+        return vector
+    
+    async def _aembed_query(self, query: str) -> tuple:
+        """Async variant of _embed_query."""
+        vector = self._cached_query_vector(query)
+        if vector is None:
+            vector = self._remember_query_vector(
+                query, await self.embedding_function.aembed_query(query)
+            )
+        return vector
+    
+    @staticmethod
+    def _select_documents(
+        result: dict,
+        score_threshold: float,
+        is_summary: bool,
+    ) -> List[str]:
+        """Pick document contents out of a raw collection query result."""
+        contents = result["documents"][0]
+        scores = result["distances"][0]
+        
+        if is_summary:
+            # For summaries, take all retrieved docs
+            return list(contents)
+        
+        # For specific questions, filter by threshold (vectorized)
+        mask = np.asarray(scores, dtype=np.float32) < score_threshold
+        return [contents[i] for i in np.flatnonzero(mask)]
+    
+    def _embed_chunks(self, chunks: List[str]) -> List[List[float]]:
+        """Embed chunks in fixed-size batches, one request per batch."""
+        vectors = []
+        for i in range(0, len(chunks), EMBED_BATCH_SIZE):
+            vectors.extend(
+                self.embedding_function.embed_documents(chunks[i:i + EMBED_BATCH_SIZE])
+            )
+        return vectors
+    
+    def _insert_chunks(self, vector_db: Chroma, user_id: str, chunks: List[str], ids: Optional[List[str]] = None):
+        """
+        Insert chunks with pre-computed embeddings into a collection.
+        
+        Chunks are upserted, so passing the same ids again overwrites them
+        instead of adding duplicates.
+        """
+        vector_db._collection.upsert(
+            ids=ids or [uuid.uuid4().hex for _ in chunks],
+            documents=chunks,
+            embeddings=self._embed_chunks(chunks),
+            metadatas=[{"user_id": user_id}] * len(chunks),
+        )
     
     def vectorize_documents(self, user_id: str, chunks: List[str]) -> bool:
         """
@@ -40,21 +176,9 @@ class RAGService:
             Success status
         """
         try:
-            collection_name = self._get_collection_name(user_id)
-            
-            # Create Document objects
-            documents = [
-                Document(page_content=chunk, metadata={"user_id": user_id})
-                for chunk in chunks
-            ]
-            
             # Create or update vector store
-            vector_db = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embedding_function,
-                collection_name=collection_name,
-                persist_directory=self.vector_db_dir,
-            )
+            vector_db = self._client()
+            self._insert_chunks(vector_db, user_id, chunks)
             
             return True
         
@@ -74,23 +198,11 @@ class RAGService:
             Success status
         """
         try:
-            collection_name = self._get_collection_name(user_id)
-            
             # Get existing vector store
-            vector_db = Chroma(
-                collection_name=collection_name,
-                embedding_function=self.embedding_function,
-                persist_directory=self.vector_db_dir,
-            )
+            vector_db = self._client()
             
-            # Create Document objects
-            documents = [
-                Document(page_content=chunk, metadata={"user_id": user_id})
-                for chunk in chunks
-            ]
-            
-            # Add documents
-            vector_db.add_documents(documents)
+            # Add documents (batched embedding)
+            self._insert_chunks(vector_db, user_id, chunks)
             
             return True
         
@@ -99,12 +211,52 @@ class RAGService:
             # If collection doesn't exist, create it
             return self.vectorize_documents(user_id, chunks)
     
+    def migrate_legacy_collections(self) -> List[str]:
+        """
+        Move chunks from legacy per-user collections into the shared one.
+        
+        Legacy vectors are 768-dim in L2 space, so the stored chunk text is
+        re-embedded. A legacy collection is dropped only once its chunks are
+        written; one that fails is kept and retried on the next run. Chunk ids
+        are derived from the legacy ids, so a retry overwrites chunks a failed
+        run already copied instead of duplicating them.
+        
+        Returns:
+            User IDs whose legacy collection held no chunks (any document
+            records they have are not backed by vectors)
+        """
+        vector_db = self._client()
+        client = vector_db._client
+        empty_users = []
+        
+        for entry in client.list_collections():
+            # chromadb >= 0.6 lists names, older versions Collection objects
+            name = getattr(entry, "name", entry)
+            if not name.startswith(LEGACY_COLLECTION_PREFIX):
+                continue
+            user_id = name[len(LEGACY_COLLECTION_PREFIX):]
+            
+            try:
+                legacy = client.get_collection(name).get(include=["documents"])
+                chunks = legacy["documents"]
+                if chunks:
+                    ids = [f"{name}:{legacy_id}" for legacy_id in legacy["ids"]]
+                    self._insert_chunks(vector_db, user_id, chunks, ids)
+                else:
+                    empty_users.append(user_id)
+                client.delete_collection(name)
+                logger.info(f"Migrated {len(chunks)} chunks from legacy collection {name}")
+            except Exception:
+                logger.exception(f"Could not migrate legacy collection {name}, keeping it for the next run")
+        
+        return empty_users
+    
     def retrieve_documents(
         self,
         user_id: str,
         query: str,
         k: int = 12,
-        score_threshold: float = 0.6,
+        score_threshold: float = SCORE_THRESHOLD,
         is_summary: bool = False
     ) -> List[str]:
         """
@@ -114,42 +266,77 @@ class RAGService:
             user_id: User ID
             query: Search query
             k: Number of documents to retrieve
-            score_threshold: Maximum similarity score (lower is better)
+            score_threshold: Maximum cosine distance (lower is better)
             is_summary: Whether this is a summary request
             
         Returns:
             List of relevant document contents
         """
         try:
-            collection_name = self._get_collection_name(user_id)
-            
             # Get vector store
-            vector_db = Chroma(
-                collection_name=collection_name,
-                embedding_function=self.embedding_function,
-                persist_directory=self.vector_db_dir,
-            )
+            vector_db = self._client()
             
-            # Perform similarity search
-            docs_with_score = vector_db.similarity_search_with_score(query, k=k)
+            # Perform similarity search with the (cached) query vector
+            result = vector_db._collection.query(
+                query_embeddings=[list(self._embed_query(query))],
+                n_results=k,
+                where=self._user_filter(user_id),
+                include=["documents", "distances"],
+            )
             
-            # Debug logging
-            print(f"Collection: {collection_name}")
-            print(f"Query: {query}")
-            print(f"Docs retrieved: {len(docs_with_score)}")
-            for _, score in docs_with_score:
-                print(f"Similarity score: {score}")
+            # Debug logging (skipped entirely unless DEBUG is on)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Collection: %s | Query: %s | Docs retrieved: %d | Scores: %s",
+                    SHARED_COLLECTION_NAME,
+                    query,
+                    len(result["documents"][0]),
+                    result["distances"][0],
+                )
             
             # Filter by score threshold
-            if is_summary:
-                # For summaries, take all retrieved docs
-                docs = [doc for doc, _ in docs_with_score]
-            else:
-                # For specific questions, filter by threshold
-                docs = [doc for doc, score in docs_with_score if score < score_threshold]
+            return self._select_documents(result, score_threshold, is_summary)
+        
+        except Exception as e:
+            print(f"Retrieval error: {str(e)}")
+            return []
+    
+    async def aretrieve_documents(
+        self,
+        user_id: str,
+        query: str,
+        k: int = 12,
+        score_threshold: float = SCORE_THRESHOLD,
+        is_summary: bool = False
+    ) -> List[str]:
+        """
+        Async variant of retrieve_documents for use from request handlers.
+        
+        The query is embedded with the async Nomic client and the blocking
+        HNSW search runs in a worker thread, so the event loop stays free.
+        
+        Args:
+            user_id: User ID
+            query: Search query
+            k: Number of documents to retrieve
+            score_threshold: Maximum cosine distance (lower is better)
+            is_summary: Whether this is a summary request
             
-            # Extract content
-            return [doc.page_content for doc in docs]
+        Returns:
+            List of relevant document contents
+        """
+        try:
+            vector_db = await asyncio.to_thread(self._client)
+            query_vector = await self._aembed_query(query)
+            
+            result = await asyncio.to_thread(
+                vector_db._collection.query,
+                query_embeddings=[list(query_vector)],
+                n_results=k,
+                where=self._user_filter(user_id),
+                include=["documents", "distances"],
+            )
+            return self._select_documents(result, score_threshold, is_summary)
         
         except Exception as e:
             print(f"Retrieval error: {str(e)}")
@@ -166,15 +353,14 @@ class RAGService:
             Whether collection exists
         """
         try:
-            collection_name = self._get_collection_name(user_id)
-            vector_db = Chroma(
-                collection_name=collection_name,
-                embedding_function=self.embedding_function,
-                persist_directory=self.vector_db_dir,
+            vector_db = self._client()
+            # Any chunk tagged with this user?
+            result = vector_db._collection.get(
+                where=self._user_filter(user_id),
+                limit=1,
+                include=[],
             )
-            # Try to get collection
-            collection = vector_db._collection
-            return collection is not None
+            return bool(result["ids"])
         except:
             return False
     
@@ -189,15 +375,9 @@ class RAGService:
             Success status
         """
         try:
-            collection_name = self._get_collection_name(user_id)
-            
-            # Delete the collection
-            vector_db = Chroma(
-                collection_name=collection_name,
-                embedding_function=self.embedding_function,
-                persist_directory=self.vector_db_dir,
-            )
-            vector_db.delete_collection()
+            # Delete this user's chunks from the shared collection
+            vector_db = self._client()
+            vector_db._collection.delete(where=self._user_filter(user_id))
             
             return True
         except Exception as e:
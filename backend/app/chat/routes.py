@@ -1,5 +1,9 @@
 import os
+import asyncio
+import logging
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
+from datetime import datetime
 from typing import Optional
 import uuid
 
@@ -11,8 +15,6 @@ from app.chat.models import (
     DocumentUploadResponse,
     ClearChatResponse,
     UserDocumentsResponse,
-    ChatMessage,
-    DocumentInfo
 )
 from app.chat.document_processor import DocumentProcessor
 from app.chat.rag_service import RAGService
@@ -27,10 +29,35 @@ document_processor = DocumentProcessor()
 rag_service = RAGService(vector_db_dir=VECTOR_DB_DIR)
 chat_service = ChatService()
 
+logger = logging.getLogger(__name__)
+
 # Create router
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
+async def migrate_legacy_vectors():
+    """
+    One-off move of per-user vector collections into the shared collection.
+    
+    Users whose legacy collection was empty keep user_documents rows with no
+    vectors behind them, so has_documents would switch RAG on for nothing;
+    those rows are cleared.
+    """
+    try:
+        empty_users = await asyncio.to_thread(rag_service.migrate_legacy_collections)
+    except Exception:
+        logger.exception("Legacy vector migration failed")
+        return
+    
+    for user_id in empty_users:
+        try:
+            deleted = await db.delete_user_documents(user_id)
+            if deleted:
+                logger.warning(f"Cleared {deleted} document records with no vectors for user {user_id}")
+        except Exception:
+            logger.exception(f"Could not clear stale document records for user {user_id}")
+
+
 @router.post("/upload-document", response_model=DocumentUploadResponse)
 async def upload_document(
     user_id: str,
@@ -57,13 +84,10 @@ async def upload_document(
                 detail="Only PDF files are supported"
             )
         
-        # Read file content
-        content = await file.read()
-        
-        # Process document
+        # Process document straight from the spooled upload (no full read)
         try:
             full_text, chunks = document_processor.process_document(
-                file=content,
+                file=file,
                 filename=file.filename
             )
         except ValueError as e:
@@ -72,22 +96,23 @@ async def upload_document(
         # Generate document ID
         document_id = str(uuid.uuid4())
         
-        # Vectorize and store
+        # Save document metadata to DB
+        await db.save_user_document(
+            user_id=user_id,
+            document_id=document_id,
+            filename=file.filename
+        )
+        
+        # Vectorize and store (all chunks in one batched add)
         success = rag_service.add_documents(user_id, chunks)
         
         if not success:
+            await db.delete_user_document_by_id(user_id, document_id)
             raise HTTPException(
                 status_code=500,
                 detail="Failed to vectorize document"
             )
         
-        # Save document metadata to DB
-        await db.save_user_document(
-            user_id=user_id,
-            document_id=document_id,
-            filename=file.filename
-        )
-        
         return DocumentUploadResponse(
             document_id=document_id,
             filename=file.filename,
@@ -116,18 +141,19 @@ async def send_message(request: ChatSendRequest):
         Assistant's response
     """
     try:
-        # Ensure user exists
-        await db.ensure_user(request.user_id)
-        
-        # Get chat history
-        chat_history = await db.get_chat_history(request.user_id, limit=50)
+        async with db.shared_connection():
+            # Ensure user exists
+            await db.ensure_user(request.user_id)
+            
+            # Chat history (only the last 6 messages feed the prompt) and
+            # document presence in one round-trip
+            overview = await db.get_user_overview(request.user_id, recent_count=6)
+        chat_history = overview["recent_messages"]
         
         # Check if user has documents and should use RAG
         retrieved_docs = None
-        if request.use_rag:
-            has_docs = await db.has_user_documents(request.user_id)
-            
-            if has_docs:
+        if request.use_rag and chat_service.needs_retrieval(request.message):
+            if overview["has_documents"]:
                 # Determine if it's a summary question
                 is_summary = chat_service.is_summary_question(request.message)
                 
@@ -136,16 +162,15 @@ async def send_message(request: ChatSendRequest):
                     "summary of the document" if is_summary else request.message
                 )
                 
-                retrieved_docs = rag_service.retrieve_documents(
+                retrieved_docs = await rag_service.aretrieve_documents(
                     user_id=request.user_id,
                     query=retrieval_query,
                     k=12,
-                    score_threshold=0.6,
                     is_summary=is_summary
                 )
         
         # Generate answer
-        answer = chat_service.answer_question(
+        answer = await chat_service.aanswer_question(
             question=request.message,
             retrieved_docs=retrieved_docs,
             chat_history=chat_history
@@ -179,38 +204,32 @@ async def send_message(request: ChatSendRequest):
 
 
 @router.get("/history/{user_id}", response_model=ChatHistoryResponse)
-async def get_history(user_id: str, limit: int = 50):
+async def get_history(user_id: str, limit: int = 50, before: Optional[datetime] = None):
     """
     Get chat history for a user.
     
     Args:
         user_id: User ID
         limit: Maximum number of messages to retrieve
+        before: Page cursor - created_at of the oldest message already shown
         
     Returns:
         Chat history
     """
     try:
-        # Ensure user exists
-        await db.ensure_user(user_id)
-        
-        # Get history
-        messages = await db.get_chat_history(user_id, limit=limit)
-        
-        # Convert to ChatMessage models
-        chat_messages = [
-            ChatMessage(
-                role=msg["role"],
-                content=msg["content"],
-                created_at=msg["created_at"]
-            )
-            for msg in messages
-        ]
+        async with db.shared_connection():
+            # Ensure user exists
+            await db.ensure_user(user_id)
+            
+            # Get history
+            messages = await db.get_chat_history(user_id, limit=limit, before=before)
         
-        return ChatHistoryResponse(
-            messages=chat_messages,
-            total=len(chat_messages)
-        )
+        # Rows already have the ChatHistoryResponse shape: serialize them
+        # directly (orjson formats the datetimes) instead of via models
+        return ORJSONResponse({
+            "messages": messages,
+            "total": len(messages),
+        })
     
     except Exception as e:
         raise HTTPException(
@@ -264,26 +283,17 @@ async def get_user_documents(user_id: str):
         List of user documents
     """
     try:
-        # Ensure user exists
-        await db.ensure_user(user_id)
-        
-        # Get documents
-        docs = await db.get_user_documents(user_id)
-        
-        # Convert to DocumentInfo models
-        documents = [
-            DocumentInfo(
-                document_id=doc["document_id"],
-                filename=doc["filename"],
-                uploaded_at=doc["uploaded_at"]
-            )
-            for doc in docs
-        ]
+        async with db.shared_connection():
+            # Ensure user exists
+            await db.ensure_user(user_id)
+            
+            # Get documents (serialized directly, see get_history)
+            docs = await db.get_user_documents(user_id)
         
-        return UserDocumentsResponse(
-            documents=documents,
-            total=len(documents)
-        )
+        return ORJSONResponse({
+            "documents": docs,
+            "total": len(docs),
+        })
     
     except Exception as e:
         raise HTTPException(
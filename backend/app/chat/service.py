@@ -1,3 +1,4 @@
+import re
 from typing import Optional, List
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
@@ -5,6 +6,63 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+# Display labels for stored chat roles
+_ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+# Prompt templates (filled with str.format_map per request)
+_RAG_SUMMARY_TMPL = """
+You are an educational assistant.
+Using ONLY the document content below, answer the user's request.
+You may summarize, explain, or reorganize the information,
+but do NOT add information not present in the document.
+
+{conv_prefix}Document:
+{doc_context}
+
+Task:
+{question}
+
+Answer:
+"""
+
+_RAG_QA_TMPL = """
+You are an educational assistant.
+Answer the question ONLY using the context below.
+If the answer is not present in the context, reply with:
+"I don't know."
+
+{conv_prefix}Context:
+{doc_context}
+
+Question:
+{question}
+
+Answer:
+"""
+
+_CONV_TMPL = """
+You are an educational assistant engaged in a conversation with a student.
+
+Previous conversation:
+{conversation_history}
+
+Current question:
+{question}
+
+Provide a clear, concise, and helpful answer based on the conversation context.
+
+Answer:
+"""
+
+_PLAIN_TMPL = """
+Answer the following question clearly and concisely.
+
+Question:
+{question}
+
+Answer:
+"""
+
 class ChatService:
     """Orchestrates chat interactions with RAG and LLM."""
     
@@ -22,6 +80,19 @@ class ChatService:
         "outline"
     ]
     
+    # Single-pass matcher over all summary keywords
+    SUMMARY_RE = re.compile("|".join(re.escape(k) for k in SUMMARY_KEYWORDS))
+    
+    # Greetings, thanks and questions about the assistant itself
+    CHITCHAT_RE = re.compile(
+        r"^\W*(?:hi|hello|hey|yo|hiya|good (?:morning|afternoon|evening)"
+        r"|thanks?(?: you)?|thank you(?: so much)?|ok(?:ay)?|cool|great|bye|goodbye"
+        r"|how are you|who are you|what(?:'s| is) your name|what can you do)\b[\W\s]*$"
+    )
+    
+    # Questions shorter than this (in words) never go to retrieval
+    MIN_RETRIEVAL_WORDS = 3
+    
     def __init__(self):
         """Initialize chat service with LLM."""
         self.llm = ChatGroq(
@@ -42,8 +113,24 @@ class ChatService:
         Returns:
             Whether it's a summary question
         """
-        q = question.lower()
-        return any(keyword in q for keyword in self.SUMMARY_KEYWORDS)
+        return self.SUMMARY_RE.search(question.casefold()) is not None
+    
+    def needs_retrieval(self, question: str) -> bool:
+        """
+        Check if the question is worth a document lookup.
+        
+        Args:
+            question: User's question
+            
+        Returns:
+            False for chit-chat and very short questions, True otherwise
+        """
+        folded = question.casefold()
+        if self.SUMMARY_RE.search(folded):
+            return True
+        if len(folded.split()) < self.MIN_RETRIEVAL_WORDS:
+            return False
+        return self.CHITCHAT_RE.match(folded) is None
     
     def build_conversation_history(self, messages: List[dict]) -> str:
         """
@@ -59,24 +146,19 @@ class ChatService:
             return ""
         
         # Take last 6 messages for context window management
-        recent_messages = messages[-6:]
-        
-        history = []
-        for msg in recent_messages:
-            role = msg["role"].capitalize()
-            content = msg["content"]
-            history.append(f"{role}: {content}")
-        
-        return "\n".join(history)
+        return "\n".join(
+            f"{_ROLE_LABELS.get(m['role']) or m['role'].capitalize()}: {m['content']}"
+            for m in messages[-6:]
+        )
     
-    def generate_answer(
+    def build_prompt(
         self,
         question: str,
         retrieved_docs: Optional[List[str]] = None,
         conversation_history: Optional[str] = None
-    ) -> str:
+    ) -> Optional[str]:
         """
-        Generate an answer using LLM with optional RAG context.
+        Build the LLM prompt with optional RAG context.
         
         Args:
             question: User's question
@@ -84,18 +166,15 @@ class ChatService:
             conversation_history: Formatted conversation history
             
         Returns:
-            Generated answer
+            Prompt text, or None if there is no usable question
         """
         if not question or not question.strip():
-            return "No valid question could be determined."
+            return None
         
         is_summary = self.is_summary_question(question)
         
         # RAG: Document-based answering
         if retrieved_docs:
-            if not retrieved_docs:
-                return "I don't know."
-            
             doc_context = "\n".join(retrieved_docs)
             
             # Build conversation prefix
@@ -104,67 +183,64 @@ class ChatService:
                 conv_prefix = f"Previous conversation:\n{conversation_history}\n\n"
             
             # Build prompt based on summary or specific question
-            if is_summary:
-                prompt = f"""
-You are an educational assistant.
-Using ONLY the document content below, answer the user's request.
-You may summarize, explain, or reorganize the information,
-but do NOT add information not present in the document.
-
-{conv_prefix}Document:
-{doc_context}
-
-Task:
-{question}
-
-Answer:
-"""
-            else:
-                prompt = f"""
-You are an educational assistant.
-Answer the question ONLY using the context below.
-If the answer is not present in the context, reply with:
-"I don't know."
-
-{conv_prefix}Context:
-{doc_context}
-
-Question:
-{question}
-
-Answer:
-"""
+            template = _RAG_SUMMARY_TMPL if is_summary else _RAG_QA_TMPL
+            prompt = template.format_map({
+                "conv_prefix": conv_prefix,
+                "doc_context": doc_context,
+                "question": question,
+            })
         
         # No document: general question with conversation history
         else:
             if conversation_history:
-                prompt = f"""
-You are an educational assistant engaged in a conversation with a student.
-
-Previous conversation:
-{conversation_history}
-
-Current question:
-{question}
-
-Provide a clear, concise, and helpful answer based on the conversation context.
-
-Answer:
-"""
+                prompt = _CONV_TMPL.format_map({
+                    "conversation_history": conversation_history,
+                    "question": question,
+                })
             else:
-                prompt = f"""
-Answer the following question clearly and concisely.
-
-Question:
-{question}
-
-Answer:
-"""
+                prompt = _PLAIN_TMPL.format_map({"question": question})
+        
+        return prompt
+    
+    def generate_answer(
+        self,
+        question: str,
+        retrieved_docs: Optional[List[str]] = None,
+        conversation_history: Optional[str] = None
+    ) -> str:
+        """
+        Generate an answer using LLM with optional RAG context.
+        
+        Args:
+            question: User's question
+            retrieved_docs: Retrieved document chunks from RAG
+            conversation_history: Formatted conversation history
+            
+        Returns:
+            Generated answer
+        """
+        prompt = self.build_prompt(question, retrieved_docs, conversation_history)
+        if prompt is None:
+            return "No valid question could be determined."
         
         # Generate response
         response = self.llm.invoke(prompt)
         return response.content.strip()
     
+    async def agenerate_answer(
+        self,
+        question: str,
+        retrieved_docs: Optional[List[str]] = None,
+        conversation_history: Optional[str] = None
+    ) -> str:
+        """Async variant of generate_answer (non-blocking LLM call)."""
+        prompt = self.build_prompt(question, retrieved_docs, conversation_history)
+        if prompt is None:
+            return "No valid question could be determined."
+        
+        response = await self.llm.ainvoke(prompt)
+        return response.content.strip()
+    
     def answer_question(
         self,
         question: str,
@@ -194,4 +270,21 @@ Answer:
             conversation_history=conversation_history
         )
         
-        return answer
\ No newline at end of file
+        return answer
+    
+    async def aanswer_question(
+        self,
+        question: str,
+        retrieved_docs: Optional[List[str]] = None,
+        chat_history: Optional[List[dict]] = None
+    ) -> str:
+        """Async variant of answer_question for use from request handlers."""
+        conversation_history = None
+        if chat_history:
+            conversation_history = self.build_conversation_history(chat_history)
+        
+        return await self.agenerate_answer(
+            question=question,
+            retrieved_docs=retrieved_docs,
+            conversation_history=conversation_history
+        )
\ No newline at end of file
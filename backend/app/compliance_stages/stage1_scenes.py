@@ -1,8 +1,17 @@
-import json
+import orjson
+from functools import lru_cache
 from string import Template
 
 from app.paths import PROMPTS_DIR, OUTPUTS_DIR
 from app.utils.llm import call_llm
+from app.utils.json_safe import extract_first_json_object
+
+
+@lru_cache(maxsize=1)
+def _load_scene_planner_template() -> Template:
+    """Read and compile the compliance scene planner prompt once per process."""
+    prompt_path = PROMPTS_DIR / "compliance_prompts" / "scene_planner.txt"
+    return Template(prompt_path.read_text(encoding="utf-8"))
 
 
 def generate_scenes(
@@ -16,8 +25,7 @@ def generate_scenes(
 ) -> dict:
     """Plan pharma/compliance video scenes."""
 
-    prompt_path = PROMPTS_DIR / "compliance_prompts" / "scene_planner.txt"
-    template = Template(prompt_path.read_text(encoding="utf-8"))
+    template = _load_scene_planner_template()
 
     prompt = template.substitute(
         video_type=video_type,
@@ -33,16 +41,13 @@ def generate_scenes(
     output = call_llm(prompt)
 
     try:
-        data = json.loads(output)
-    except json.JSONDecodeError:
-        start = output.find("{")
-        end = output.rfind("}") + 1
-        data = json.loads(output[start:end])
+        data = orjson.loads(output)
+    except orjson.JSONDecodeError:
+        data = orjson.loads(extract_first_json_object(output))
 
     OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
-    (OUTPUTS_DIR / "scenes.json").write_text(
-        json.dumps(data, indent=2),
-        encoding="utf-8",
+    (OUTPUTS_DIR / "scenes.json").write_bytes(
+        orjson.dumps(data, option=orjson.OPT_INDENT_2)
     )
 
     return data
@@ -1,4 +1,4 @@
-import json
+import orjson
 import logging
 from app.paths import OUTPUTS_DIR
 from app.utils.file_utils import sanitize_filename
@@ -19,6 +19,14 @@ def run_compliance_stage2(
     logo = assets.get("logo")
     images = assets.get("images", [])
 
+    # Set membership and one sanitize per distinct asset, not per scene
+    images_set = set(images)
+    srcs = {
+        name: f"{base}/{sanitize_filename(name)}"
+        for name in images_set | ({logo} if logo else set())
+    }
+    logo_src = srcs[logo] if logo else None
+
     for s in scenes:
         s["image"] = None
         hint = s.get("asset_hint")
@@ -26,9 +34,8 @@ def run_compliance_stage2(
 
         # Logo scene
         if hint == "logo" and logo:
-            clean_logo = sanitize_filename(logo)
             s["image"] = {
-                "src": f"{base}/{clean_logo}",
+                "src": logo_src,
                 "alt": "Brand logo",
             }
 
@@ -36,15 +43,14 @@ def run_compliance_stage2(
         elif hint == "uploaded_image":
             filename = None
 
-            if preferred and preferred in images:
+            if preferred and preferred in images_set:
                 filename = preferred
             elif images:
                 filename = images[0]
 
             if filename:
-                clean_filename = sanitize_filename(filename)
                 s["image"] = {
-                    "src": f"{base}/{clean_filename}",
+                    "src": srcs[filename],
                     "alt": s.get("concept", ""),
                 }
 
@@ -55,9 +61,8 @@ def run_compliance_stage2(
     }
 
     OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
-    (OUTPUTS_DIR / "compliance_scenes_with_media.json").write_text(
-        json.dumps(enriched, indent=2),
-        encoding="utf-8",
+    (OUTPUTS_DIR / "compliance_scenes_with_media.json").write_bytes(
+        orjson.dumps(enriched, option=orjson.OPT_INDENT_2)
     )
 
     logger.info("Compliance Stage 2 complete (assets mapped)")
@@ -1,4 +1,5 @@
 import json
+import orjson
 import subprocess
 from pathlib import Path
 
@@ -21,8 +22,8 @@ def render_compliance_video(video_id: str) -> Path:
     if not script_path.exists():
         raise FileNotFoundError("Run script generation first")
 
-    scenes_data = json.loads(scenes_path.read_text(encoding="utf-8"))
-    script_data = json.loads(script_path.read_text(encoding="utf-8"))
+    scenes_data = orjson.loads(scenes_path.read_bytes())
+    script_data = orjson.loads(script_path.read_bytes())
 
     script_map = {s["scene_id"]: s["script"] for s in script_data}
 
@@ -6,8 +6,10 @@ with ability to accept or regenerate each stage.
 
 Architecture:
 - One WebSocket connection per session
-- In-memory state only (no persistence)
-- Sequential stage execution with manual progression
+- In-memory state, checkpointed to the sessions table after each stage
+  so a dropped connection can "resume" instead of starting over
+- Sequential stage execution with manual progression; cheap LLM stages
+  (PREFETCH_STAGES) are started early while the user reviews the last one
 - Reuses all existing pipeline functions
 
 Stages:
@@ -18,12 +20,19 @@ Stages:
 5. render - Produce final video
 """
 
-import json
 import logging
-import traceback
-from typing import Dict, Any, Optional, List
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from functools import partial
+from hashlib import blake2b
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 import asyncio
+import jsonpatch
+import orjson
 from fastapi import WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 
@@ -53,23 +62,163 @@ from app.social_media.stage3_sm_pexels_fetch import run_stage3_sm_pexels
 from app.social_media.stage5_sm_render import render_sm_video
 
 from app.paths import OUTPUTS_DIR
+from app import db
 
 logger = logging.getLogger(__name__)
 
+# Executors: LLM/network/TTS stages share a wide I/O pool; renders (which
+# drive CPU-heavy Manim/Remotion/ffmpeg subprocesses) are capped at one per
+# core so concurrent sessions don't oversubscribe the machine
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "32"))
+io_pool = ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix="creator-io")
+_render_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="creator-render")
+
+# Global worker budgets shared by all sessions. Each stage call fans out to
+# at most *_STAGE_WORKERS threads, and the semaphores admit only as many
+# concurrent stage calls as fit in the budget, so N sessions never multiply
+# the load by N.
+MAX_MANIM_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MANIM_STAGE_WORKERS = min(3, MAX_MANIM_WORKERS)
+MAX_TTS_WORKERS = 8
+TTS_STAGE_WORKERS = 4
+_MANIM_SLOTS = asyncio.Semaphore(max(1, MAX_MANIM_WORKERS // MANIM_STAGE_WORKERS))
+_TTS_SLOTS = asyncio.Semaphore(max(1, MAX_TTS_WORKERS // TTS_STAGE_WORKERS))
+
+# In-process LLM response cache (backed by the llm_cache table). Values are
+# kept serialized so later stages can mutate their copy freely.
+MAX_CACHED_RESPONSES = 256
+_response_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
 # ---------------------------------------------------------------------
 # In-Memory Session State
 # ---------------------------------------------------------------------
 
+# Stage progression per video type (shared, immutable)
+_DEFAULT_STAGE_ORDER = ("scenes", "script", "visuals", "tts", "render")
+_REMOTION_STAGE_ORDER = ("scenes", "script", "visuals", "animations", "tts", "render")
+_STAGE_ORDERS = {
+    "product_ad": _REMOTION_STAGE_ORDER,
+    "compliance_video": _REMOTION_STAGE_ORDER,
+    # Manim-based pipelines
+    "moa": _DEFAULT_STAGE_ORDER,
+    "doctor_ad": _DEFAULT_STAGE_ORDER,
+    "social_media": _DEFAULT_STAGE_ORDER,
+}
+
+
+# ---------------------------------------------------------------------
+# Stage Arguments
+# ---------------------------------------------------------------------
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class StageArgs:
+    """Payload options shared by every video type."""
+    persona: str = "professional narrator"
+    tone: str = "clear and engaging"
+    reference_docs: Optional[str] = None
+    region: Optional[str] = None
+    quality: str = "low"
+    prefetch: bool = True
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class ProductAdArgs(StageArgs):
+    topic: str
+    brand_name: str = ""
+    assets: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class ComplianceArgs(StageArgs):
+    prompt: str
+    brand_name: str = ""
+    assets: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class MoAArgs(StageArgs):
+    drug_name: str
+    condition: str
+    target_audience: str = "healthcare professionals"
+    logo_path: Optional[str] = None
+    image_paths: Optional[List[str]] = None
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class DoctorAdArgs(StageArgs):
+    drug_name: str
+    indication: str
+    moa_summary: str = ""
+    clinical_data: str = ""
+    logo_path: Optional[str] = None
+    product_image_path: Optional[str] = None
+    image_paths: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class SocialMediaArgs(StageArgs):
+    drug_name: str
+    indication: str
+    key_benefit: str = ""
+    target_audience: str = "patients"
+
+
+STAGE_ARGS = {
+    "product_ad": ProductAdArgs,
+    "compliance_video": ComplianceArgs,
+    "moa": MoAArgs,
+    "doctor_ad": DoctorAdArgs,
+    "social_media": SocialMediaArgs,
+}
+
+
+def parse_stage_args(video_type: str, payload: Dict[str, Any]) -> StageArgs:
+    """
+    Validate a start payload once into the args object the stages read.
+    
+    Unknown payload keys are ignored.
+    
+    Raises:
+        ValueError: Unsupported video_type or a required field is missing
+    """
+    args_cls = STAGE_ARGS.get(video_type)
+    if args_cls is None:
+        raise ValueError(f"Unsupported video_type: {video_type}")
+    
+    known = {f.name for f in fields(args_cls)}
+    try:
+        return args_cls(**{k: v for k, v in payload.items() if k in known})
+    except TypeError as e:
+        raise ValueError(f"Invalid payload for {video_type}: {e}") from None
+
+
+class SessionLogAdapter(logging.LoggerAdapter):
+    """
+    Creator Mode logger bound to one session.
+    
+    Messages are prefixed with the video_id and carry video_id/video_type
+    as record attributes for structured handlers. Use %-style arguments:
+    formatting is deferred until a handler actually emits the record.
+    """
+    
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+        return f"[Creator Mode] [{self.extra['video_id']}] {msg}", kwargs
+
+
 class CreatorSession:
     """
     Holds state for a single Creator Mode session.
-    Lives only in memory, per WebSocket connection.
+    Lives in memory per WebSocket connection; see to_state()/from_state()
+    for the checkpoint persisted in sessions.metadata.
     """
     
     def __init__(self, video_id: str, video_type: str, payload: Dict[str, Any]):
         self.video_id = video_id
         self.video_type = video_type
         self.payload = payload
+        self.args = parse_stage_args(video_type, payload)
+        self.log = SessionLogAdapter(logger, {"video_id": video_id, "video_type": video_type})
         
         # Pipeline state
         self.current_stage: Optional[str] = None
@@ -81,19 +230,20 @@ class CreatorSession:
         self.stage_order = self._get_stage_order()
         self.stage_index = 0
         
+        # Opt-in JSON Patch responses on regenerate: stage -> last sent data
+        self.use_patches = False
+        self.last_sent: Dict[str, bytes] = {}
+        
+        # Speculatively prefetched next stage (see _start_prefetch)
+        self.speculative_stage: Optional[str] = None
+        self.speculative_task: Optional[asyncio.Task] = None
+        
         # Tracking
         self.is_active = True
         
-    def _get_stage_order(self) -> List[str]:
+    def _get_stage_order(self) -> Tuple[str, ...]:
         """Define stage progression based on video type."""
-        if self.video_type in ["product_ad", "compliance_video"]:
-            return ["scenes", "script", "visuals", "animations", "tts", "render"]
-        elif self.video_type in ["moa", "doctor_ad", "social_media"]:
-            # Manim-based pipelines
-            return ["scenes", "script", "visuals", "tts", "render"]
-        else:
-            # Default fallback
-            return ["scenes", "script", "visuals", "tts", "render"]
+        return _STAGE_ORDERS.get(self.video_type, _DEFAULT_STAGE_ORDER)
     
     def get_current_stage(self) -> Optional[str]:
         """Return current stage name or None if complete."""
@@ -110,24 +260,146 @@ class CreatorSession:
     def increment_version(self, stage: str):
         """Track regeneration attempts."""
         self.stage_versions[stage] = self.stage_versions.get(stage, 0) + 1
+    
+    def take_speculative(self, stage: str) -> Optional[asyncio.Task]:
+        """Hand over the prefetch task if it was started for this stage."""
+        if self.speculative_stage != stage:
+            self.cancel_speculative()
+            return None
+        task = self.speculative_task
+        self.speculative_task = None
+        self.speculative_stage = None
+        return task
+    
+    def cancel_speculative(self):
+        """Drop any prefetch in flight (its result is discarded)."""
+        task = self.speculative_task
+        self.speculative_task = None
+        self.speculative_stage = None
+        if task is None:
+            return
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()  # mark a failed prefetch as retrieved
+    
+    def to_state(self) -> Dict[str, Any]:
+        """Small checkpoint fields (stage outputs are persisted separately)."""
+        return {
+            "video_type": self.video_type,
+            "stage_index": self.stage_index,
+            "stage_versions": self.stage_versions,
+        }
+    
+    @classmethod
+    def from_state(cls, video_id: str, state: Dict[str, Any]) -> "CreatorSession":
+        """Rebuild a session from a persisted checkpoint."""
+        session = cls(video_id, state["video_type"], state.get("payload", {}))
+        session.stage_outputs = state.get("stage_outputs", {})
+        session.stage_versions = state.get("stage_versions", {})
+        session.stage_index = state.get("stage_index", 0)
+        session.current_stage = session.get_current_stage()
+        return session
+
+
+# Stages that may be started while the user is still reviewing the previous
+# one. Only side-effect-free LLM stages qualify: a cancelled prefetch cannot
+# stop its worker thread, so stages that write media must not run early.
+PREFETCH_STAGES = {"script"}
+
+# Session outputs written (or annotated in place) by each stage
+STAGE_OUTPUT_KEYS = {
+    "scenes": ("scenes",),
+    "script": ("script",),
+    "visuals": ("scenes",),
+    "render": ("final_video",),
+}
+
+
+# ---------------------------------------------------------------------
+# LLM Response Cache
+# ---------------------------------------------------------------------
+
+def _cache_key(fn, args: tuple, feedback: Optional[str]) -> str:
+    """Hash a stage function and its inputs into a cache key."""
+    raw = orjson.dumps(
+        [fn.__qualname__, args, feedback or ""],
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        default=str,
+    )
+    return blake2b(raw).hexdigest()
+
+
+def _remember_response(key: str, value: Any):
+    """Store a response in the in-process LRU."""
+    _response_cache[key] = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    _response_cache.move_to_end(key)
+    if len(_response_cache) > MAX_CACHED_RESPONSES:
+        _response_cache.popitem(last=False)
+
+
+def _is_regenerate(session: CreatorSession) -> bool:
+    """Whether the current stage is being re-run at the user's request."""
+    return session.stage_versions.get(session.current_stage, 0) > 1
+
+
+async def _cached_call(session: CreatorSession, fn, *args) -> Any:
+    """
+    Run an LLM-backed stage function, reusing earlier results for identical inputs.
+    
+    The first run of a stage may be served from cache; an explicit regenerate
+    always calls the LLM again and replaces the cached entry. The database
+    layer is optional: if it is unavailable only the in-process cache is used.
+    """
+    key = _cache_key(fn, args, session.user_feedback)
+    is_regenerate = _is_regenerate(session)
+    
+    if not is_regenerate:
+        if key in _response_cache:
+            _response_cache.move_to_end(key)
+            session.log.info("Cache hit (memory): %s", fn.__qualname__)
+            return orjson.loads(_response_cache[key])
+        
+        try:
+            cached = await db.get_cached_response(key)
+        except Exception as e:
+            session.log.warning("Response cache lookup failed: %s", e)
+            cached = None
+        if cached is not None:
+            session.log.info("Cache hit (db): %s", fn.__qualname__)
+            _remember_response(key, cached)
+            return cached
+    
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(io_pool, fn, *args)
+    
+    _remember_response(key, result)
+    try:
+        await db.save_cached_response(key, result)
+    except Exception as e:
+        session.log.warning("Response cache write failed: %s", e)
+    
+    return result
 
 
 # ---------------------------------------------------------------------
 # Stage Execution Logic
 # ---------------------------------------------------------------------
 
-async def execute_stage(session: CreatorSession, websocket: WebSocket) -> Dict[str, Any]:
+async def execute_stage(
+    session: CreatorSession,
+    websocket: WebSocket,
+    stage: Optional[str] = None,
+) -> Dict[str, Any]:
     """
-    Execute the current stage using existing pipeline functions.
+    Execute the current stage (or the given one) using existing pipeline functions.
     
     Returns stage output dict or raises exception on error.
     """
-    stage = session.current_stage
+    stage = stage or session.current_stage
     video_type = session.video_type
-    payload = session.payload
-    video_id = session.video_id
     
-    logger.info(f"[Creator Mode] Executing stage: {stage} (video_type={video_type}, video_id={video_id})")
+    session.log.info("Executing stage: %s", stage)
     
     try:
         if stage == "scenes":
@@ -151,81 +423,78 @@ async def execute_stage(session: CreatorSession, websocket: WebSocket) -> Dict[s
             return await _execute_tts_stage(session)
         
         elif stage == "render":
-            return await _execute_render_stage(session)
+            return await _execute_render_stage(session, websocket)
         
         else:
             raise ValueError(f"Unknown stage: {stage}")
     
     except Exception as e:
-        logger.error(f"[Creator Mode] Stage {stage} failed: {e}")
-        logger.error(traceback.format_exc())
+        session.log.error("Stage %s failed: %s", stage, e, exc_info=True)
         raise
 
 
 async def _execute_scenes_stage(session: CreatorSession) -> Dict[str, Any]:
     """Stage 1: Generate scene structure."""
     video_type = session.video_type
-    payload = session.payload
-    
-    # Run in thread pool to avoid blocking event loop
-    loop = asyncio.get_event_loop()
+    args = session.args
     
+    # Run in thread pool to avoid blocking event loop (cached on inputs)
     if video_type == "product_ad":
-        scenes_data = await loop.run_in_executor(
-            None,
+        scenes_data = await _cached_call(
+            session,
             generate_scenes,
-            payload.get("topic"),
+            args.topic,
             video_type,
-            payload.get("brand_name", ""),
-            payload.get("reference_docs", ""),
-            payload.get("region"),
+            args.brand_name,
+            args.reference_docs or "",
+            args.region,
         )
     
     elif video_type == "compliance_video":
-        scenes_data = await loop.run_in_executor(
-            None,
+        scenes_data = await _cached_call(
+            session,
             generate_scenes,
-            payload.get("prompt"),
+            args.prompt,
             video_type,
-            payload.get("brand_name", ""),
-            payload.get("reference_docs", ""),
+            args.brand_name,
+            args.reference_docs or "",
             None,  # region
         )
     
     elif video_type == "moa":
-        scenes_data = await loop.run_in_executor(
-            None,
+        scenes_data = await _cached_call(
+            session,
             generate_moa_scenes,
-            payload.get("drug_name"),
-            payload.get("condition"),
-            payload.get("target_audience", "healthcare professionals"),
-            payload.get("logo_path"),
-            payload.get("image_paths"),
-            payload.get("reference_docs"),
+            args.drug_name,
+            args.condition,
+            args.target_audience,
+            args.logo_path,
+            args.image_paths,
+            args.reference_docs,
         )
     
     elif video_type == "doctor_ad":
-        scenes_data = await loop.run_in_executor(
-            None,
+        scenes_data = await _cached_call(
+            session,
             generate_doctor_scenes,
-            payload.get("drug_name"),
-            payload.get("indication"),
-            payload.get("moa_summary", ""),
-            payload.get("clinical_data", ""),
-            payload.get("logo_path"),
-            payload.get("product_image_path"),
-            payload.get("image_paths", []),
-            payload.get("reference_docs"),
+            args.drug_name,
+            args.indication,
+            args.moa_summary,
+            args.clinical_data,
+            args.logo_path,
+            args.product_image_path,
+            args.image_paths,
+            args.reference_docs,
         )
     
     elif video_type == "social_media":
-        scenes_data = await loop.run_in_executor(
-            None,
+        scenes_data = await _cached_call(
+            session,
             generate_sm_scenes,
-            payload.get("drug_name"),
-            payload.get("indication"),
-            payload.get("key_benefit", ""),
-            payload.get("target_audience", "patients"),
+            args.drug_name,
+            args.indication,
+            args.key_benefit,
+            args.target_audience,
         )
     
     else:
@@ -247,17 +516,17 @@ async def _execute_script_stage(session: CreatorSession) -> Dict[str, Any]:
         raise ValueError("Scenes not found in session state")
     
     scenes = scenes_data.get("scenes", [])
-    payload = session.payload
+    args = session.args
     
     # Run in thread pool
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
     script = await loop.run_in_executor(
-        None,
+        io_pool,
         generate_script,
         scenes,
-        payload.get("persona", "professional narrator"),
-        payload.get("tone", "clear and engaging"),
-        payload.get("reference_docs"),
+        args.persona,
+        args.tone,
+        args.reference_docs,
     )
     
     # Store script for next stage
@@ -269,6 +538,41 @@ async def _execute_script_stage(session: CreatorSession) -> Dict[str, Any]:
     }
 
 
+def _stage_workers(limit: int, scenes_data: Dict[str, Any]) -> int:
+    """Per-stage fan-out: the configured limit, but no more than one per scene."""
+    return max(1, min(limit, len(scenes_data.get("scenes", []))))
+
+
+def _inject_doctor_media(scenes: List[Dict[str, Any]], scene_info: Dict[Any, Dict], drug_name: str):
+    """Merge fetched product/logo media into doctor ad scenes, in place."""
+    for scene in scenes:
+        scene_type = scene.get("type")
+        if scene_type not in ("product", "logo"):
+            continue
+        info = scene_info.get(scene["scene_id"], {})
+        
+        if scene_type == "product":
+            if info.get("product_image_path"):
+                scene["product_image_path"] = info["product_image_path"]
+            scene["product_name"] = info.get("product_name", drug_name)
+        else:
+            if info.get("logo_path"):
+                scene["logo_path"] = info["logo_path"]
+            scene["tagline"] = info.get("tagline", "")
+
+
+def _inject_sm_media(scenes: List[Dict[str, Any]], pexels_media: Dict[Any, Dict]):
+    """Point social media scenes at their downloaded Pexels images, in place."""
+    for scene in scenes:
+        media = pexels_media.get(scene.get("scene_id"))
+        if not media:
+            continue
+        image_path = media.get("image", {}).get("local_path")
+        if image_path:
+            scene["pexels_image_path"] = image_path
+            scene["type"] = "manim"
+
+
 async def _execute_visuals_stage(session: CreatorSession) -> Dict[str, Any]:
     """Stage 3: Generate animations/compositions."""
     scenes_data = session.stage_outputs.get("scenes")
@@ -279,111 +583,111 @@ async def _execute_visuals_stage(session: CreatorSession) -> Dict[str, Any]:
     
     video_type = session.video_type
     video_id = session.video_id
-    payload = session.payload
+    args = session.args
+    
+    loop = asyncio.get_running_loop()
     
-    loop = asyncio.get_event_loop()
+    # A regenerate bypasses the Manim code cache/checkpoint and the Pexels
+    # search cache, like _cached_call does for LLM stages
+    refresh = _is_regenerate(session)
     
     if video_type == "product_ad":
         await loop.run_in_executor(
-            None,
+            io_pool,
             run_stage2,
             scenes_data,
             script,
             video_id,
-            payload.get("assets", {}),
-            payload.get("region"),
+            args.assets,
+            args.region,
         )
         return {"status": "complete", "message": "Remotion compositions generated"}
     
     elif video_type == "compliance_video":
         await loop.run_in_executor(
-            None,
+            io_pool,
             run_stage2,
             scenes_data,
             script,
             video_id,
-            payload.get("assets", {}),
+            args.assets,
             None,  # region
         )
         return {"status": "complete", "message": "Compliance compositions generated"}
     
     elif video_type == "moa":
-        await loop.run_in_executor(
-            None,
-            run_stage2_moa,
-            scenes_data,
-            script,
-            video_id,
-            3,  # max_workers
-        )
+        async with _MANIM_SLOTS:
+            await loop.run_in_executor(
+                io_pool,
+                run_stage2_moa,
+                scenes_data,
+                script,
+                video_id,
+                _stage_workers(MANIM_STAGE_WORKERS, scenes_data),
+            )
         return {"status": "complete", "message": "MoA Manim animations generated"}
     
     elif video_type == "doctor_ad":
         # First fetch Pexels media
         scene_info = await loop.run_in_executor(
-            None,
+            io_pool,
             run_stage3_pexels,
             scenes_data,
             video_id,
-            payload.get("logo_path"),
-            payload.get("product_image_path"),
+            args.logo_path,
+            args.product_image_path,
         )
         
-        # Inject paths into scenes
-        scenes = scenes_data.get("scenes", [])
-        for scene in scenes:
-            scene_id = scene["scene_id"]
-            info = scene_info.get(scene_id, {})
-            
-            if scene.get("type") == "product":
-                if info.get("product_image_path"):
-                    scene["product_image_path"] = info["product_image_path"]
-                scene["product_name"] = info.get("product_name", payload.get("drug_name", ""))
-            
-            elif scene.get("type") == "logo":
-                if info.get("logo_path"):
-                    scene["logo_path"] = info["logo_path"]
-                scene["tagline"] = info.get("tagline", "")
-        
+        # Inject paths into scenes (off the event loop)
         await loop.run_in_executor(
-            None,
-            run_stage2_doctor,
-            scenes_data,
-            script,
-            video_id,
-            3,  # max_workers
+            io_pool,
+            _inject_doctor_media,
+            scenes_data.get("scenes", []),
+            scene_info,
+            args.drug_name,
         )
+        
+        async with _MANIM_SLOTS:
+            await loop.run_in_executor(
+                io_pool,
+                partial(
+                    run_stage2_doctor,
+                    scenes_data,
+                    script,
+                    video_id,
+                    _stage_workers(MANIM_STAGE_WORKERS, scenes_data),
+                    refresh=refresh,
+                ),
+            )
         return {"status": "complete", "message": "Doctor ad Manim animations generated"}
     
     elif video_type == "social_media":
         # Fetch Pexels media first
         pexels_media = await loop.run_in_executor(
-            None,
+            io_pool,
             run_stage3_sm_pexels,
             scenes_data,
             video_id,
+            refresh,
         )
         
-        # Inject Pexels media paths into scenes
-        scenes = scenes_data.get("scenes", [])
-        for scene in scenes:
-            scene_id = scene.get("scene_id")
-            if scene_id is None:
-                continue
-            media = pexels_media.get(scene_id, {})
-            image_path = media.get("image", {}).get("local_path")
-            if image_path:
-                scene["pexels_image_path"] = image_path
-                scene["type"] = "manim"
-        
+        # Inject Pexels media paths into scenes (off the event loop)
         await loop.run_in_executor(
-            None,
-            run_stage2_sm,
-            scenes_data,
-            script,
-            video_id,
-            3,  # max_workers
+            io_pool,
+            _inject_sm_media,
+            scenes_data.get("scenes", []),
+            pexels_media,
         )
+        
+        async with _MANIM_SLOTS:
+            await loop.run_in_executor(
+                io_pool,
+                run_stage2_sm,
+                scenes_data,
+                script,
+                video_id,
+                _stage_workers(MANIM_STAGE_WORKERS, scenes_data),
+            )
         return {"status": "complete", "message": "Social media Manim animations generated"}
     
     else:
@@ -394,17 +698,17 @@ async def _execute_animations_stage(session: CreatorSession) -> Dict[str, Any]:
     """Stage 3.5: Generate additional animations (Remotion only)."""
     video_id = session.video_id
     
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
     
     try:
         await loop.run_in_executor(
-            None,
+            io_pool,
             generate_animations,
             video_id,
         )
         return {"status": "complete", "message": "Additional animations generated"}
     except Exception as e:
-        logger.warning(f"[Creator Mode] Animations failed (non-critical): {e}")
+        session.log.warning("Animations failed (non-critical): %s", e)
         return {"status": "skipped", "message": f"Animations skipped: {e}"}
 
 
@@ -419,20 +723,19 @@ async def _execute_tts_stage(session: CreatorSession) -> Dict[str, Any]:
     video_id = session.video_id
     scenes = scenes_data.get("scenes", [])
     scene_ids = [s["scene_id"] for s in scenes]
+    region = session.args.region
     
-    payload = session.payload
-    region = payload.get("region")
-    
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(
-        None,
-        tts_generate,
-        script,
-        video_id,
-        scene_ids,
-        5,  # max_workers
-        region,
-    )
+    loop = asyncio.get_running_loop()
+    async with _TTS_SLOTS:
+        await loop.run_in_executor(
+            io_pool,
+            tts_generate,
+            script,
+            video_id,
+            scene_ids,
+            _stage_workers(TTS_STAGE_WORKERS, scenes_data),
+            region,
+        )
     
     return {
         "status": "complete",
@@ -441,50 +744,67 @@ async def _execute_tts_stage(session: CreatorSession) -> Dict[str, Any]:
     }
 
 
-async def _execute_render_stage(session: CreatorSession) -> Dict[str, Any]:
-    """Stage 5: Render final video."""
+async def _run_with_progress(websocket: WebSocket, stage: str, fn, *args) -> Any:
+    """
+    Run a blocking render on the render pool, relaying its progress events.
+    
+    fn is called with progress_cb=...; each event it reports is sent to the
+    client as {"status": "progress", "stage": ..., **event}. If the client
+    goes away (or this coroutine is cancelled) the callback starts raising,
+    which aborts the render at its next scene boundary.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+    
+    def progress_cb(event: Dict[str, Any]):
+        if cancelled.is_set():
+            raise RuntimeError("Render cancelled")
+        loop.call_soon_threadsafe(events.put_nowait, event)
+    
+    task = loop.run_in_executor(_render_pool, partial(fn, *args, progress_cb=progress_cb))
+    try:
+        while True:
+            getter = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                await _send_json(websocket, {"status": "progress", "stage": stage, **getter.result()})
+                continue
+            getter.cancel()
+            return await task
+    except BaseException:
+        cancelled.set()
+        raise
+
+
+async def _execute_render_stage(session: CreatorSession, websocket: WebSocket) -> Dict[str, Any]:
+    """Stage 5: Render final video (streams per-scene progress to the client)."""
     scenes_data = session.stage_outputs.get("scenes")
     if not scenes_data:
         raise ValueError("Scenes not found in session state")
     
     video_id = session.video_id
     video_type = session.video_type
-    payload = session.payload
-    
-    loop = asyncio.get_event_loop()
+    quality = session.args.quality
     
     if video_type in ["product_ad", "compliance_video"]:
-        final_path = await loop.run_in_executor(
-            None,
-            render_remotion,
-            video_id,
+        final_path = await _run_with_progress(
+            websocket, "render", render_remotion, video_id,
         )
     
     elif video_type == "moa":
-        final_path = await loop.run_in_executor(
-            None,
-            render_moa_video,
-            video_id,
-            scenes_data,
-            payload.get("quality", "low"),
+        final_path = await _run_with_progress(
+            websocket, "render", render_moa_video, video_id, quality,
         )
     
     elif video_type == "doctor_ad":
-        final_path = await loop.run_in_executor(
-            None,
-            render_doctor_video,
-            video_id,
-            scenes_data,
-            payload.get("quality", "low"),
+        final_path = await _run_with_progress(
+            websocket, "render", render_doctor_video, video_id, scenes_data, quality,
         )
     
     elif video_type == "social_media":
-        final_path = await loop.run_in_executor(
-            None,
-            render_sm_video,
-            video_id,
-            scenes_data,
-            payload.get("quality", "low"),
+        final_path = await _run_with_progress(
+            websocket, "render", render_sm_video, video_id, scenes_data, quality,
         )
     
     else:
@@ -505,6 +825,175 @@ async def _execute_render_stage(session: CreatorSession) -> Dict[str, Any]:
 # WebSocket Handler
 # ---------------------------------------------------------------------
 
+async def _send_json(websocket: WebSocket, data: Dict[str, Any]):
+    """Send a JSON text frame, serialized with orjson instead of send_json."""
+    await websocket.send_text(
+        orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    )
+
+
+async def _handle_start(data: Dict[str, Any], session: Optional[CreatorSession], websocket: WebSocket) -> CreatorSession:
+    """ACTION: start - create a new session and run its first stage."""
+    video_id = generate_video_id()
+    video_type = data.get("video_type", "product_ad")
+    payload = data.get("payload", {})
+    
+    # Initialize session (payload problems are reported before any stage runs)
+    try:
+        new_session = CreatorSession(video_id, video_type, payload)
+    except ValueError as e:
+        await _send_json(websocket, {
+            "status": "error",
+            "error": str(e)
+        })
+        return session
+    
+    if session:
+        session.cancel_speculative()
+    session = new_session
+    session.current_stage = session.get_current_stage()
+    session.use_patches = bool(data.get("patches", False))
+    
+    # DB setup (checkpoints for "resume")
+    try:
+        await db.bootstrap_session(
+            data.get("user_id"), video_id, status="processing",
+            metadata={**session.to_state(), "payload": payload, "stage_outputs": {}},
+        )
+    except Exception as e:
+        session.log.warning("DB record creation failed: %s", e)
+    
+    session.log.info("Started session (type=%s)", video_type)
+    
+    await _send_json(websocket, {
+        "status": "session_started",
+        "video_id": video_id,
+        "video_type": video_type,
+        "stage_order": session.stage_order,
+        "current_stage": session.current_stage,
+    })
+    
+    # Immediately execute first stage
+    await _execute_and_respond(session, websocket)
+    return session
+
+
+async def _handle_resume(data: Dict[str, Any], session: Optional[CreatorSession], websocket: WebSocket) -> Optional[CreatorSession]:
+    """ACTION: resume - rebuild a session from its last checkpoint."""
+    video_id = data.get("video_id")
+    try:
+        state = await db.get_creator_state(video_id) if video_id else None
+    except Exception as e:
+        logger.warning("[Creator Mode] Failed to load session state: %s", e)
+        state = None
+    
+    if not state or "stage_index" not in state:
+        await _send_json(websocket, {
+            "status": "error",
+            "error": f"No saved session for video_id: {video_id}"
+        })
+        return session
+    
+    try:
+        resumed = CreatorSession.from_state(video_id, state)
+    except (KeyError, ValueError) as e:
+        await _send_json(websocket, {
+            "status": "error",
+            "error": f"Saved session for video_id {video_id} is unusable: {e}"
+        })
+        return session
+    
+    if session:
+        session.cancel_speculative()
+    session = resumed
+    # Checkpoints are only written after a stage succeeds
+    completed = session.current_stage in session.stage_versions
+    
+    session.log.info("Resumed session at stage: %s", session.current_stage)
+    
+    await _send_json(websocket, {
+        "status": "session_resumed",
+        "video_id": video_id,
+        "video_type": session.video_type,
+        "stage_order": session.stage_order,
+        "current_stage": session.current_stage,
+        "stage_versions": session.stage_versions,
+        "next_actions": ["accept", "regenerate"] if completed else ["regenerate"],
+    })
+    return session
+
+
+async def _handle_accept(data: Dict[str, Any], session: CreatorSession, websocket: WebSocket) -> CreatorSession:
+    """ACTION: accept - advance to (and run) the next stage."""
+    session.log.info("User accepted stage: %s", session.current_stage)
+    
+    # Move to next stage
+    session.advance_stage()
+    
+    if session.current_stage is None:
+        # Pipeline complete
+        final_video = session.stage_outputs.get("final_video")
+        await _send_json(websocket, {
+            "status": "pipeline_complete",
+            "video_id": session.video_id,
+            "video_path": final_video,
+            "message": "All stages complete! Video is ready."
+        })
+        session.is_active = False
+        return session
+    
+    # Execute next stage
+    await _execute_and_respond(session, websocket)
+    return session
+
+
+async def _handle_regenerate(data: Dict[str, Any], session: CreatorSession, websocket: WebSocket) -> CreatorSession:
+    """ACTION: regenerate - re-run the current stage, optionally with feedback."""
+    # Optional user feedback
+    feedback = data.get("feedback")
+    if feedback:
+        session.user_feedback = feedback
+        session.log.info("Regenerating with feedback: %s", feedback)
+    else:
+        session.log.info("Regenerating stage: %s", session.current_stage)
+    
+    # Outputs of the stage being redone invalidate any prefetch
+    session.cancel_speculative()
+    
+    # Increment version counter
+    session.increment_version(session.current_stage)
+    
+    # Re-execute current stage
+    await _execute_and_respond(session, websocket)
+    return session
+
+
+async def _handle_stop(data: Dict[str, Any], session: Optional[CreatorSession], websocket: WebSocket) -> Optional[CreatorSession]:
+    """ACTION: stop - end the session (the connection is closed afterwards)."""
+    logger.info("[Creator Mode] User requested stop")
+    if session:
+        session.is_active = False
+        session.cancel_speculative()
+    await _send_json(websocket, {
+        "status": "stopped",
+        "message": "Session terminated by user"
+    })
+    return session
+
+
+# Action -> handler(data, session, websocket) returning the current session
+ACTION_HANDLERS = {
+    "start": _handle_start,
+    "resume": _handle_resume,
+    "accept": _handle_accept,
+    "regenerate": _handle_regenerate,
+    "stop": _handle_stop,
+}
+
+# Actions that need an active session
+SESSION_ACTIONS = {"accept", "regenerate"}
+
+
 async def handle_creator_websocket(websocket: WebSocket):
     """
     Main WebSocket handler for Creator Mode.
@@ -514,6 +1003,7 @@ async def handle_creator_websocket(websocket: WebSocket):
     - Server executes one stage, pauses
     - Client sends "accept" or "regenerate"
     - Repeat until pipeline complete
+    - After a disconnect, client sends "resume" with the video_id
     """
     await websocket.accept()
     logger.info("[Creator Mode] WebSocket connected")
@@ -524,119 +1014,38 @@ async def handle_creator_websocket(websocket: WebSocket):
         while True:
             # Wait for client message
             message = await websocket.receive_text()
-            data = json.loads(message)
+            data = orjson.loads(message)
             action = data.get("action")
             
-            logger.info(f"[Creator Mode] Received action: {action}")
+            logger.info("[Creator Mode] Received action: %s", action)
             
-            # ─────────────────────────────────────────────
-            # ACTION: start
-            # ─────────────────────────────────────────────
-            if action == "start":
-                video_id = generate_video_id()
-                video_type = data.get("video_type", "product_ad")
-                payload = data.get("payload", {})
-                
-                # Initialize session
-                session = CreatorSession(video_id, video_type, payload)
-                session.current_stage = session.get_current_stage()
-                
-                logger.info(f"[Creator Mode] Started session: video_id={video_id}, type={video_type}")
-                
-                await websocket.send_json({
-                    "status": "session_started",
-                    "video_id": video_id,
-                    "video_type": video_type,
-                    "stage_order": session.stage_order,
-                    "current_stage": session.current_stage,
+            handler = ACTION_HANDLERS.get(action)
+            if handler is None:
+                await _send_json(websocket, {
+                    "status": "error",
+                    "error": f"Unknown action: {action}"
                 })
-                
-                # Immediately execute first stage
-                await _execute_and_respond(session, websocket)
+                continue
             
-            # ─────────────────────────────────────────────
-            # ACTION: accept
-            # ─────────────────────────────────────────────
-            elif action == "accept":
-                if not session or not session.is_active:
-                    await websocket.send_json({
-                        "status": "error",
-                        "error": "No active session"
-                    })
-                    continue
-                
-                logger.info(f"[Creator Mode] User accepted stage: {session.current_stage}")
-                
-                # Move to next stage
-                session.advance_stage()
-                
-                if session.current_stage is None:
-                    # Pipeline complete
-                    final_video = session.stage_outputs.get("final_video")
-                    await websocket.send_json({
-                        "status": "pipeline_complete",
-                        "video_id": session.video_id,
-                        "video_path": final_video,
-                        "message": "All stages complete! Video is ready."
-                    })
-                    session.is_active = False
-                    continue
-                
-                # Execute next stage
-                await _execute_and_respond(session, websocket)
+            if action in SESSION_ACTIONS and (not session or not session.is_active):
+                await _send_json(websocket, {
+                    "status": "error",
+                    "error": "No active session"
+                })
+                continue
             
-            # ─────────────────────────────────────────────
-            # ACTION: regenerate
-            # ─────────────────────────────────────────────
-            elif action == "regenerate":
-                if not session or not session.is_active:
-                    await websocket.send_json({
-                        "status": "error",
-                        "error": "No active session"
-                    })
-                    continue
-                
-                # Optional user feedback
-                feedback = data.get("feedback")
-                if feedback:
-                    session.user_feedback = feedback
-                    logger.info(f"[Creator Mode] Regenerating with feedback: {feedback}")
-                else:
-                    logger.info(f"[Creator Mode] Regenerating stage: {session.current_stage}")
-                
-                # Increment version counter
-                session.increment_version(session.current_stage)
-                
-                # Re-execute current stage
-                await _execute_and_respond(session, websocket)
+            session = await handler(data, session, websocket)
             
-            # ─────────────────────────────────────────────
-            # ACTION: stop
-            # ─────────────────────────────────────────────
-            elif action == "stop":
-                logger.info("[Creator Mode] User requested stop")
-                if session:
-                    session.is_active = False
-                await websocket.send_json({
-                    "status": "stopped",
-                    "message": "Session terminated by user"
-                })
+            if action == "stop":
                 break
-            
-            else:
-                await websocket.send_json({
-                    "status": "error",
-                    "error": f"Unknown action: {action}"
-                })
     
     except WebSocketDisconnect:
         logger.info("[Creator Mode] WebSocket disconnected")
     
     except Exception as e:
-        logger.error(f"[Creator Mode] Unexpected error: {e}")
-        logger.error(traceback.format_exc())
+        logger.error("[Creator Mode] Unexpected error: %s", e, exc_info=True)
         try:
-            await websocket.send_json({
+            await _send_json(websocket, {
                 "status": "error",
                 "error": str(e)
             })
@@ -644,6 +1053,8 @@ async def handle_creator_websocket(websocket: WebSocket):
             pass
     
     finally:
+        if session:
+            session.cancel_speculative()
         logger.info("[Creator Mode] Session ended")
 
 
@@ -658,36 +1069,50 @@ async def _execute_and_respond(session: CreatorSession, websocket: WebSocket):
     
     try:
         # Execute stage
-        await websocket.send_json({
+        await _send_json(websocket, {
             "status": "stage_running",
             "stage": stage,
             "version": version,
             "message": f"Executing {stage}..."
         })
         
-        result = await execute_stage(session, websocket)
+        result = await _run_current_stage(session, websocket)
         
-        # Success response
-        await websocket.send_json({
+        # Success response (a patch against the last version when opted in)
+        response = {
             "stage": stage,
             "version": version,
             "status": "completed",
-            "data": result,
             "next_actions": ["accept", "regenerate"],
             "progress": {
                 "current": session.stage_index + 1,
                 "total": len(session.stage_order),
             }
-        })
+        }
+        response.update(_stage_payload(session, stage, result))
+        await _send_json(websocket, response)
+        
+        # Checkpoint so a reconnect can resume from here
+        try:
+            outputs = {
+                key: session.stage_outputs[key]
+                for key in STAGE_OUTPUT_KEYS.get(stage, ())
+                if key in session.stage_outputs
+            }
+            await db.save_creator_state(session.video_id, session.to_state(), outputs)
+        except Exception as e:
+            session.log.warning("Failed to checkpoint session: %s", e)
+        
+        # Start the next stage while the user reviews this one
+        _start_prefetch(session, websocket)
     
     except Exception as e:
         # Error response
         error_msg = str(e)
-        logger.error(f"[Creator Mode] Stage {stage} error: {error_msg}")
-        logger.error(traceback.format_exc())
+        session.log.error("Stage %s error: %s", stage, error_msg, exc_info=True)
         
         try:
-            await websocket.send_json({
+            await _send_json(websocket, {
                 "stage": stage,
                 "version": version,
                 "status": "error",
@@ -695,4 +1120,66 @@ async def _execute_and_respond(session: CreatorSession, websocket: WebSocket):
                 "next_actions": ["regenerate", "stop"],
             })
         except Exception as send_error:
-            logger.error(f"[Creator Mode] Failed to send error response: {send_error}")
+            session.log.error("Failed to send error response: %s", send_error)
+
+
+def _stage_payload(session: CreatorSession, stage: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the data part of a "completed" frame.
+    
+    With patches enabled, a regenerated stage is sent as an RFC 6902 JSON
+    Patch against the version the client already has ({"patch": [...]}),
+    otherwise the full result is sent ({"data": {...}}). The sent version
+    is kept serialized since later stages mutate the live scene dicts.
+    """
+    if not session.use_patches:
+        return {"data": result}
+    
+    sent = orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS)
+    previous = session.last_sent.get(stage)
+    session.last_sent[stage] = sent
+    
+    if previous is None:
+        return {"data": result}
+    return {"patch": jsonpatch.make_patch(orjson.loads(previous), orjson.loads(sent)).patch}
+
+
+async def _run_current_stage(session: CreatorSession, websocket: WebSocket) -> Dict[str, Any]:
+    """Use the prefetched result for the current stage if there is one, else execute it."""
+    task = session.take_speculative(session.current_stage)
+    if task is not None:
+        try:
+            result = await task
+            session.log.info("Using prefetched stage: %s", session.current_stage)
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            session.log.warning("Prefetch of %s failed, re-running: %s", session.current_stage, e)
+    
+    return await execute_stage(session, websocket)
+
+
+def _start_prefetch(session: CreatorSession, websocket: WebSocket):
+    """
+    Speculatively start the next stage if it is safe to run early.
+    
+    Disabled per session with payload {"prefetch": false}.
+    """
+    if not session.args.prefetch:
+        return
+    
+    next_index = session.stage_index + 1
+    if next_index >= len(session.stage_order):
+        return
+    
+    next_stage = session.stage_order[next_index]
+    if next_stage not in PREFETCH_STAGES:
+        return
+    
+    session.cancel_speculative()
+    session.speculative_stage = next_stage
+    session.speculative_task = asyncio.create_task(
+        execute_stage(session, websocket, next_stage)
+    )
+    session.log.info("Prefetching stage: %s", next_stage)
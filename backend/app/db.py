@@ -1,17 +1,72 @@
 import os
+import time
 import uuid
+import hashlib
 import asyncio
-import json
-from typing import Optional, List, Dict
-from datetime import datetime
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional, List, Dict
+from datetime import datetime, timezone
 
 import asyncpg
+import orjson
+
+logger = logging.getLogger(__name__)
 
 
 DATABASE_URL_ENV = "DATABASE_URL"
 
 pool: Optional[asyncpg.pool.Pool] = None
 
+# Set once the schema is known to be current (init_db may be called again)
+_schema_ready = False
+
+# Sized for bursty Creator Mode start/stop traffic: warm connections absorb
+# a burst without a reconnect storm (override per deployment)
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN", max(4, os.cpu_count() or 1)))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX", max(16, (os.cpu_count() or 1) * 4)))
+
+# Behind PgBouncer in transaction mode, server-side prepared statements and
+# most startup parameters are unavailable
+PGBOUNCER = os.getenv("PGBOUNCER") == "1"
+
+# Prepared statements: keep every fixed statement below cached for the life
+# of the connection (no time-based eviction)
+STATEMENT_CACHE_SIZE = 0 if PGBOUNCER else 1024
+MAX_CACHED_STATEMENT_LIFETIME = 0
+MAX_CACHEABLE_STATEMENT_SIZE = 100 * 1024
+
+# Every query here is small OLTP: JIT compilation only adds latency
+SERVER_SETTINGS = {"application_name": "prismMotion"} if PGBOUNCER else {
+    "jit": "off",
+    "application_name": "prismMotion",
+    "statement_timeout": "30s",
+}
+
+
+# JSONB binary wire format: a version byte (1) followed by the JSON text
+_JSONB_VERSION = b"\x01"
+
+
+def _encode_jsonb(value) -> bytes:
+    return _JSONB_VERSION + orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _decode_jsonb(data: bytes):
+    return orjson.loads(data[1:])
+
+
+async def _init_connection(conn):
+    """Per-connection setup: JSONB values travel as Python objects via orjson."""
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=_encode_jsonb,
+        decoder=_decode_jsonb,
+        schema="pg_catalog",
+        format="binary",
+    )
+
 
 async def init_db(dsn: Optional[str] = None):
     global pool
@@ -22,7 +77,21 @@ async def init_db(dsn: Optional[str] = None):
     if not dsn:
         raise RuntimeError("DATABASE_URL not set in environment")
 
-    pool = await asyncpg.create_pool(dsn, min_size=5, max_size=20)
+    # Large per-connection statement cache: every helper below uses fixed SQL
+    # text, so each statement is parsed/planned once per connection
+    pool = await asyncpg.create_pool(
+        dsn,
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        statement_cache_size=STATEMENT_CACHE_SIZE,
+        max_cached_statement_lifetime=MAX_CACHED_STATEMENT_LIFETIME,
+        max_cacheable_statement_size=MAX_CACHEABLE_STATEMENT_SIZE,
+        max_inactive_connection_lifetime=300,
+        max_queries=50000,
+        command_timeout=30,
+        server_settings=SERVER_SETTINGS,
+        init=_init_connection,
+    )
 
     # Create tables
     create_sql = """
@@ -43,7 +112,7 @@ async def init_db(dsn: Optional[str] = None):
     CREATE TABLE IF NOT EXISTS videos (
         id UUID PRIMARY KEY,
         session_id UUID REFERENCES sessions(id) ON DELETE CASCADE,
-        path TEXT,
+        path TEXT COLLATE "C",
         state TEXT,
         created_at TIMESTAMPTZ DEFAULT now()
     );
@@ -64,42 +133,326 @@ async def init_db(dsn: Optional[str] = None):
         uploaded_at TIMESTAMPTZ DEFAULT now()
     );
 
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        value JSONB NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT now()
+    );
+
     CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
+    CREATE INDEX IF NOT EXISTS idx_sessions_video_id ON sessions(video_id);
     CREATE INDEX IF NOT EXISTS idx_videos_session_id ON videos(session_id);
+    -- Partial indexes: only in-flight rows are ever looked up by status
+    CREATE INDEX IF NOT EXISTS idx_videos_state_processing ON videos(session_id) WHERE state = 'processing';
+    CREATE INDEX IF NOT EXISTS idx_sessions_status_processing ON sessions(user_id, created_at DESC) WHERE status = 'processing';
     CREATE INDEX IF NOT EXISTS idx_chat_messages_user_id ON chat_messages(user_id);
     CREATE INDEX IF NOT EXISTS idx_chat_messages_created_at ON chat_messages(created_at);
     CREATE INDEX IF NOT EXISTS idx_chat_messages_user_created ON chat_messages(user_id, created_at DESC);
     CREATE INDEX IF NOT EXISTS idx_user_documents_user_id ON user_documents(user_id);
+
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version TEXT PRIMARY KEY,
+        applied_at TIMESTAMPTZ DEFAULT now()
+    );
     """
 
+    global _schema_ready
+    if not _schema_ready:
+        # Any edit to the DDL above yields a new version and re-applies it
+        version = hashlib.sha256(create_sql.encode("utf-8")).hexdigest()[:16]
+        async with pool.acquire() as conn:
+            # Workers booting together serialize here; all but the first
+            # find the version recorded and skip the DDL
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('prismmotion_schema'))")
+                applied = await conn.fetchval("SELECT to_regclass('schema_version') IS NOT NULL")
+                if applied:
+                    applied = await conn.fetchval(
+                        "SELECT EXISTS(SELECT 1 FROM schema_version WHERE version = $1)",
+                        version,
+                    )
+                if not applied:
+                    # run as a single batch
+                    await conn.execute(create_sql)
+                    await conn.execute(
+                        "INSERT INTO schema_version (version) VALUES ($1) ON CONFLICT DO NOTHING",
+                        version,
+                    )
+        _schema_ready = True
+
+    _start_chat_writer()
+
+
+# UI-facing counts stop here instead of scanning every row of a heavy user
+COUNT_CAP = 10000
+
+# Batches at least this large are written with COPY instead of executemany
+COPY_BATCH_THRESHOLD = 500
+
+# Background chat writes: queued messages are flushed in batches of up to
+# CHAT_WRITE_BATCH, waiting at most CHAT_WRITE_WINDOW seconds to fill one
+CHAT_WRITE_QUEUE_SIZE = 10000
+CHAT_WRITE_BATCH = 500
+CHAT_WRITE_WINDOW = 0.05
+
+# A batch that hits a connection-level error is retried with exponential
+# backoff (CHAT_WRITE_BACKOFF, x2 per attempt) before falling back to row-by-row
+CHAT_WRITE_RETRIES = 3
+CHAT_WRITE_BACKOFF = 0.5
+_TRANSIENT_DB_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    asyncpg.TooManyConnectionsError,
+    asyncpg.CannotConnectNowError,
+)
+
+_write_queue: Optional[asyncio.Queue] = None
+_writer_task: Optional[asyncio.Task] = None
+
+# Fixed SQL text for the hot helpers. asyncpg keeps a per-connection LRU of
+# prepared statements keyed by query text (statement_cache_size above), so
+# each of these is parsed and planned once per connection and every later
+# call is a single Bind/Execute round trip.
+_INSERT_USER = "INSERT INTO users (id) VALUES ($1) ON CONFLICT (id) DO NOTHING"
+_INSERT_SESSION = "INSERT INTO sessions (id, user_id, video_id, status, metadata) VALUES ($1,$2,$3,$4,$5)"
+_INSERT_VIDEO = "INSERT INTO videos (id, session_id, path, state) VALUES ($1,$2,$3,$4) ON CONFLICT (id) DO NOTHING"
+_INSERT_CHAT_MESSAGE = "INSERT INTO chat_messages (id, user_id, role, content) VALUES ($1, $2, $3, $4)"
+_INSERT_CHAT_MESSAGE_AT = "INSERT INTO chat_messages (id, user_id, role, content, created_at) VALUES ($1, $2, $3, $4, $5)"
+_COUNT_CHAT_MESSAGES = "SELECT COUNT(*) FROM chat_messages WHERE user_id = $1"
+_DELETE_CHAT_MESSAGES = "WITH d AS (DELETE FROM chat_messages WHERE user_id = $1 RETURNING 1) SELECT COUNT(*) FROM d"
+_DELETE_CHAT_MESSAGES_BEFORE = "WITH d AS (DELETE FROM chat_messages WHERE user_id = $1 AND created_at < $2 RETURNING 1) SELECT COUNT(*) FROM d"
+_INSERT_USER_DOCUMENT = "INSERT INTO user_documents (id, user_id, document_id, filename) VALUES ($1, $2, $3, $4)"
+_COUNT_USER_DOCUMENTS = "SELECT COUNT(*) FROM user_documents WHERE user_id = $1"
+_HAS_USER_DOCUMENTS = "SELECT EXISTS(SELECT 1 FROM user_documents WHERE user_id = $1 LIMIT 1)"
+_HAS_CHAT_MESSAGES = "SELECT EXISTS(SELECT 1 FROM chat_messages WHERE user_id = $1 LIMIT 1)"
+_COUNT_CHAT_MESSAGES_CAPPED = "SELECT COUNT(*) FROM (SELECT 1 FROM chat_messages WHERE user_id = $1 LIMIT $2) s"
+_DELETE_USER_DOCUMENTS = "WITH d AS (DELETE FROM user_documents WHERE user_id = $1 RETURNING 1) SELECT COUNT(*) FROM d"
+_DELETE_USER_DOCUMENT = "WITH d AS (DELETE FROM user_documents WHERE user_id = $1 AND document_id = $2 RETURNING 1) SELECT EXISTS(SELECT 1 FROM d)"
+_SELECT_CHAT_AFTER = """
+    SELECT role, content, created_at FROM chat_messages
+    WHERE user_id = $1 AND created_at > $2
+    ORDER BY created_at ASC
+    LIMIT $3
+"""
+_SELECT_CHAT_BEFORE = """
+    SELECT role, content, created_at FROM chat_messages
+    WHERE user_id = $1 AND created_at < $2
+    ORDER BY created_at DESC
+    LIMIT $3
+"""
+_SELECT_ALL_CHAT = """
+    SELECT role, content, created_at FROM chat_messages
+    WHERE user_id = $1
+    ORDER BY created_at ASC
+"""
+_SELECT_RECENT_CHAT = """
+    SELECT role, content, created_at FROM chat_messages
+    WHERE user_id = $1
+    ORDER BY created_at DESC
+    LIMIT $2
+"""
+_SELECT_USER_OVERVIEW = """
+    SELECT
+        (SELECT COUNT(*) FROM (
+            SELECT 1 FROM chat_messages WHERE user_id = $1 LIMIT $3
+        ) m) AS message_count,
+        (SELECT COUNT(*) FROM (
+            SELECT 1 FROM user_documents WHERE user_id = $1 LIMIT $3
+        ) d) AS document_count,
+        (
+            SELECT COALESCE(
+                jsonb_agg(
+                    jsonb_build_object('role', role, 'content', content, 'created_at', created_at)
+                    ORDER BY created_at ASC
+                ),
+                '[]'::jsonb
+            )
+            FROM (
+                SELECT role, content, created_at FROM chat_messages
+                WHERE user_id = $1
+                ORDER BY created_at DESC
+                LIMIT $2
+            ) recent
+        ) AS recent_messages
+"""
+_SELECT_USER_DOCUMENTS = """
+    SELECT document_id, filename, uploaded_at FROM user_documents
+    WHERE user_id = $1
+    ORDER BY uploaded_at DESC
+    LIMIT $2
+"""
+
+
+# Connection bound by shared_connection() for the current task/request
+_current_conn: ContextVar[Optional[asyncpg.Connection]] = ContextVar("db_conn", default=None)
+
+
+@asynccontextmanager
+async def db_conn():
+    """Connection for one helper call: the bound shared one, else a pool checkout."""
+    conn = _current_conn.get()
+    if conn is not None:
+        yield conn
+        return
+
     async with pool.acquire() as conn:
-        # run as a single batch
-        await conn.execute(create_sql)
+        yield conn
+
+
+@asynccontextmanager
+async def shared_connection():
+    """
+    Run several helpers on one pooled connection.
+    
+    Inside the block every helper reuses the same connection (and its
+    prepared statements) instead of checking one out per call. The
+    connection is held for the whole block, so keep LLM calls and other long
+    awaits outside it, and don't run helpers concurrently inside it.
+    """
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    if _current_conn.get() is not None:
+        yield
+        return
+
+    async with pool.acquire() as conn:
+        token = _current_conn.set(conn)
+        try:
+            yield
+        finally:
+            _current_conn.reset(token)
+
+
+def _batch_uuids(n: int) -> List[uuid.UUID]:
+    """
+    Generate n time-ordered (version 7) UUIDs from one urandom call.
+    
+    The 48-bit millisecond timestamp prefix keeps new chat_messages keys at
+    the right edge of the primary-key index instead of scattering them.
+    """
+    ts = (time.time_ns() // 1_000_000) << 80
+    buf = os.urandom(10 * n)
+    ids = []
+    for i in range(n):
+        rand = int.from_bytes(buf[i * 10:(i + 1) * 10], "big")
+        # 12 random bits, then the variant bits and 62 random bits
+        value = ts | (0x7 << 76) | ((rand >> 68) << 64) | (0b10 << 62) | (rand & ((1 << 62) - 1))
+        ids.append(uuid.UUID(int=value))
+    return ids
 
 
 async def close_db():
     global pool
+    await _stop_chat_writer()
     if pool:
         await pool.close()
         pool = None
 
 
+def _start_chat_writer():
+    global _write_queue, _writer_task
+    if _writer_task is None:
+        _write_queue = asyncio.Queue(maxsize=CHAT_WRITE_QUEUE_SIZE)
+        _writer_task = asyncio.create_task(_chat_writer())
+
+
+async def _stop_chat_writer():
+    """Flush queued chat messages, then stop the writer."""
+    global _write_queue, _writer_task
+    if _writer_task is None:
+        return
+    try:
+        await asyncio.wait_for(_write_queue.join(), timeout=10)
+    except asyncio.TimeoutError:
+        logger.warning(f"Dropping {_write_queue.qsize()} unsaved chat messages on shutdown")
+    _writer_task.cancel()
+    _writer_task = None
+    _write_queue = None
+
+
+async def _chat_writer():
+    """Drain the chat write queue, inserting each batch with one executemany."""
+    loop = asyncio.get_running_loop()
+    queue = _write_queue
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + CHAT_WRITE_WINDOW
+        while len(batch) < CHAT_WRITE_BATCH:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            await _write_chat_batch(batch)
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+async def _write_chat_batch(batch: list):
+    """
+    Insert a batch of queued chat messages.
+    
+    The batch goes in with one executemany (atomic: all rows or none),
+    retried on transient connection errors. If it still fails, rows are
+    inserted one at a time so a bad row (e.g. its user was deleted) only
+    loses itself.
+    """
+    for attempt in range(CHAT_WRITE_RETRIES):
+        try:
+            async with pool.acquire() as conn:
+                await conn.executemany(_INSERT_CHAT_MESSAGE_AT, batch)
+            return
+        except _TRANSIENT_DB_ERRORS as e:
+            if attempt + 1 == CHAT_WRITE_RETRIES:
+                logger.warning(f"Chat batch of {len(batch)} still failing after {CHAT_WRITE_RETRIES} attempts ({e}), saving rows one at a time")
+                break
+            logger.warning(f"Chat batch of {len(batch)} failed ({e}), retrying...")
+            await asyncio.sleep(CHAT_WRITE_BACKOFF * 2 ** attempt)
+        except Exception as e:
+            logger.warning(f"Chat batch of {len(batch)} rejected ({e}), saving rows one at a time")
+            break
+    
+    done = 0
+    try:
+        async with pool.acquire() as conn:
+            for row in batch:
+                try:
+                    await conn.execute(_INSERT_CHAT_MESSAGE_AT, *row)
+                except asyncpg.UniqueViolationError:
+                    # Already written by a batch attempt whose reply was lost
+                    pass
+                except _TRANSIENT_DB_ERRORS:
+                    raise
+                except Exception as e:
+                    logger.error(f"Lost chat message {row[0]} for user {row[1]}: {e}")
+                done += 1
+    except Exception as e:
+        lost = batch[done:]
+        logger.error(f"Lost {len(lost)} chat messages (first: {lost[0][0]}): {e}")
+
+
 async def ensure_user(user_id: Optional[str] = None) -> str:
     """Ensure a user exists. If user_id is None, generate and return new UUID."""
     global pool
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    if not user_id:
-        user_id = str(uuid.uuid4())
-
-    uid = user_id
-    async with pool.acquire() as conn:
+    uid = uuid.UUID(user_id) if user_id else uuid.uuid4()
+    async with db_conn() as conn:
         await conn.execute(
-            "INSERT INTO users (id) VALUES ($1) ON CONFLICT (id) DO NOTHING",
+            _INSERT_USER,
             uid,
         )
-    return uid
+    return user_id or str(uid)
 
 
 async def create_session(user_id: str, video_id: str, status: str = "processing", metadata: Optional[dict] = None) -> str:
@@ -107,18 +460,17 @@ async def create_session(user_id: str, video_id: str, status: str = "processing"
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    sid = str(uuid.uuid4())
-    meta = json.dumps(metadata) if metadata is not None else None
-    async with pool.acquire() as conn:
+    sid = uuid.uuid4()
+    async with db_conn() as conn:
         await conn.execute(
-            "INSERT INTO sessions (id, user_id, video_id, status, metadata) VALUES ($1,$2,$3,$4,$5)",
+            _INSERT_SESSION,
             sid,
-            user_id,
-            video_id,
+            uuid.UUID(user_id),
+            uuid.UUID(video_id),
             status,
-            meta,
+            metadata,
         )
-    return sid
+    return str(sid)
 
 
 async def create_video_record(video_id: str, session_id: str, path: Optional[str] = None, state: str = "processing") -> str:
@@ -127,65 +479,222 @@ async def create_video_record(video_id: str, session_id: str, path: Optional[str
         raise RuntimeError("DB pool is not initialized")
 
     vid = video_id
-    async with pool.acquire() as conn:
+    async with db_conn() as conn:
         await conn.execute(
-            "INSERT INTO videos (id, session_id, path, state) VALUES ($1,$2,$3,$4) ON CONFLICT (id) DO NOTHING",
-            vid,
-            session_id,
+            _INSERT_VIDEO,
+            uuid.UUID(vid),
+            uuid.UUID(session_id),
             path,
             state,
         )
     return vid
 
 
+async def bootstrap_session(
+    user_id: Optional[str],
+    video_id: str,
+    status: str = "processing",
+    metadata: Optional[dict] = None,
+    path: Optional[str] = None,
+) -> tuple[str, str]:
+    """
+    Create (or reuse) the user and create the session and video rows in one round-trip.
+    
+    Equivalent to ensure_user + create_session + create_video_record, but
+    issued as a single CTE statement on one connection.
+    
+    Args:
+        user_id: User ID (a new one is generated when empty)
+        video_id: Video ID
+        status: Initial session/video state
+        metadata: Session metadata
+        path: Initial video path, if already known
+    
+    Returns:
+        Tuple of (session_id, video_id)
+    """
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    uid = uuid.UUID(user_id) if user_id else uuid.uuid4()
+    sid = uuid.uuid4()
+    async with db_conn() as conn:
+        # Data-modifying CTEs always run, whether or not they are referenced
+        await conn.execute(
+            """
+            WITH u AS (
+                INSERT INTO users (id) VALUES ($1) ON CONFLICT (id) DO NOTHING
+            ),
+            s AS (
+                INSERT INTO sessions (id, user_id, video_id, status, metadata)
+                VALUES ($2, $1, $3, $4, $5)
+            )
+            INSERT INTO videos (id, session_id, path, state)
+            VALUES ($3, $2, $6, $4)
+            ON CONFLICT (id) DO NOTHING
+            """,
+            uid,
+            sid,
+            uuid.UUID(video_id),
+            status,
+            metadata,
+            path,
+        )
+    return str(sid), video_id
+
+
+_UPDATE_VIDEO_STATE_AND_PATH = "UPDATE videos SET state = $1, path = $2 WHERE id = $3"
+_UPDATE_VIDEO_STATE = "UPDATE videos SET state = $1 WHERE id = $2"
+_UPDATE_VIDEO_PATH = "UPDATE videos SET path = $1 WHERE id = $2"
+
+
 async def update_video_state(video_id: str, state: Optional[str] = None, path: Optional[str] = None):
     global pool
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    parts = []
-    args = []
-    idx = 1
-    if state is not None:
-        parts.append(f"state = ${idx}")
-        args.append(state)
-        idx += 1
-    if path is not None:
-        parts.append(f"path = ${idx}")
-        args.append(path)
-        idx += 1
-
-    if not parts:
+    # One fixed statement per combination so each keeps its cached plan
+    if state is not None and path is not None:
+        sql, args = _UPDATE_VIDEO_STATE_AND_PATH, (state, path)
+    elif state is not None:
+        sql, args = _UPDATE_VIDEO_STATE, (state,)
+    elif path is not None:
+        sql, args = _UPDATE_VIDEO_PATH, (path,)
+    else:
         return
 
-    sql = "UPDATE videos SET " + ",".join(parts) + f" WHERE id = ${idx}"
-    args.append(video_id)
+    async with db_conn() as conn:
+        await conn.execute(sql, *args, uuid.UUID(video_id))
 
-    async with pool.acquire() as conn:
-        await conn.execute(sql, *args)
+
+# ==================== CREATOR MODE STATE ====================
+
+async def save_creator_state(video_id: str, state: dict, outputs: Optional[dict] = None) -> None:
+    """
+    Checkpoint Creator Mode progress into sessions.metadata.
+    
+    Small fields are merged into the top level; stage outputs are merged
+    into metadata.stage_outputs with jsonb_set, so earlier (large) outputs
+    are never re-sent.
+    
+    Args:
+        video_id: Video ID of the Creator Mode session
+        state: Top-level fields to merge (stage_index, stage_versions, ...)
+        outputs: Stage outputs produced since the last checkpoint
+    """
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    async with db_conn() as conn:
+        await conn.execute(
+            """
+            UPDATE sessions
+            SET metadata = jsonb_set(
+                COALESCE(metadata, '{}'::jsonb) || $2::jsonb,
+                '{stage_outputs}',
+                COALESCE(metadata->'stage_outputs', '{}'::jsonb) || $3::jsonb
+            )
+            WHERE video_id = $1
+            """,
+            video_id,
+            state,
+            outputs or {},
+        )
+
+
+async def get_creator_state(video_id: str) -> Optional[dict]:
+    """Load the last Creator Mode checkpoint for a video, if any."""
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    async with db_conn() as conn:
+        return await conn.fetchval(
+            "SELECT metadata FROM sessions WHERE video_id = $1 ORDER BY created_at DESC LIMIT 1",
+            video_id,
+        )
+
+
+# ==================== LLM RESPONSE CACHE ====================
+
+async def get_cached_response(key: str):
+    """
+    Look up a cached LLM stage result.
+    
+    Args:
+        key: Hash of the stage function and its inputs
+    
+    Returns:
+        The decoded cached value, or None on a miss
+    """
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    async with db_conn() as conn:
+        return await conn.fetchval("SELECT value FROM llm_cache WHERE key = $1", key)
+
+
+async def save_cached_response(key: str, value) -> None:
+    """Store (or replace) a cached LLM stage result."""
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    async with db_conn() as conn:
+        await conn.execute(
+            """
+            INSERT INTO llm_cache (key, value) VALUES ($1, $2)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, created_at = now()
+            """,
+            key,
+            value,
+        )
 
 
 # ==================== OPTIMIZED CHAT FUNCTIONS ====================
 
 async def save_chat_message(user_id: str, role: str, content: str) -> str:
     """
-    Save a chat message to the database.
+    Queue a chat message for the background writer.
+    
+    Returns the message ID immediately; the row is inserted within about
+    CHAT_WRITE_WINDOW seconds. created_at is taken now, so messages keep
+    their order even when they land in the same batch. Use
+    save_chat_message_sync when the row must exist before returning.
+    """
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+    if _write_queue is None:
+        return await save_chat_message_sync(user_id, role, content)
+
+    msg_id = _batch_uuids(1)[0]
+    await _write_queue.put((msg_id, uuid.UUID(user_id), role, content, datetime.now(timezone.utc)))
+    return str(msg_id)
+
+
+async def save_chat_message_sync(user_id: str, role: str, content: str) -> str:
+    """
+    Save a chat message to the database before returning.
     Returns the message ID immediately without fetching.
     """
     global pool
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    msg_id = str(uuid.uuid4())
-    async with pool.acquire() as conn:
+    msg_id = _batch_uuids(1)[0]
+    async with db_conn() as conn:
         await conn.execute(
-            "INSERT INTO chat_messages (id, user_id, role, content) VALUES ($1, $2, $3, $4)",
+            _INSERT_CHAT_MESSAGE,
             msg_id,
             user_id,
             role,
             content,
         )
-    return msg_id
+    return str(msg_id)
 
 
 async def save_chat_messages_batch(user_id: str, messages: List[Dict[str, str]]) -> List[str]:
@@ -203,87 +712,91 @@ async def save_chat_messages_batch(user_id: str, messages: List[Dict[str, str]])
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    msg_ids = [str(uuid.uuid4()) for _ in messages]
+    msg_ids = _batch_uuids(len(messages))
+    uid = uuid.UUID(user_id)
+    rows = [
+        (msg_id, uid, msg["role"], msg["content"])
+        for msg_id, msg in zip(msg_ids, messages)
+    ]
     
-    async with pool.acquire() as conn:
+    async with db_conn() as conn:
         async with conn.transaction():
-            for msg_id, msg in zip(msg_ids, messages):
-                await conn.execute(
-                    "INSERT INTO chat_messages (id, user_id, role, content) VALUES ($1, $2, $3, $4)",
-                    msg_id,
-                    user_id,
-                    msg["role"],
-                    msg["content"],
+            if len(rows) >= COPY_BATCH_THRESHOLD:
+                await conn.copy_records_to_table(
+                    "chat_messages",
+                    records=rows,
+                    columns=["id", "user_id", "role", "content"],
                 )
+            else:
+                await conn.executemany(_INSERT_CHAT_MESSAGE, rows)
     
-    return msg_ids
+    return [str(msg_id) for msg_id in msg_ids]
 
 
 async def get_chat_history(
     user_id: str, 
     limit: int = 50, 
-    offset: int = 0,
-    after_timestamp: Optional[datetime] = None
+    before: Optional[datetime] = None,
+    after: Optional[datetime] = None
 ) -> List[dict]:
     """
-    Retrieve chat history for a user with pagination and optional filtering.
+    Retrieve chat history for a user with keyset pagination.
+    
+    Pages walk idx_chat_messages_user_created from a created_at cursor, so
+    deep pages cost the same as the first one. To fetch the page before a
+    result, pass its first (oldest) message's created_at as before.
     
     Args:
         user_id: User ID
         limit: Maximum number of messages to retrieve
-        offset: Number of messages to skip (for pagination)
-        after_timestamp: Only fetch messages after this timestamp
+        before: Only fetch the latest messages older than this timestamp
+        after: Only fetch the earliest messages newer than this timestamp
     
     Returns:
-        List of message dicts in chronological order
+        List of message dicts (created_at as datetime) in chronological order
     """
     global pool
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    if after_timestamp:
-        sql = """
-            SELECT role, content, created_at 
-            FROM chat_messages 
-            WHERE user_id = $1 AND created_at > $2
-            ORDER BY created_at ASC 
-            LIMIT $3
-        """
-        args = [user_id, after_timestamp, limit]
-    else:
-        sql = """
-            SELECT role, content, created_at 
-            FROM chat_messages 
-            WHERE user_id = $1 
-            ORDER BY created_at DESC 
-            LIMIT $2 OFFSET $3
-        """
-        args = [user_id, limit, offset]
+    async with db_conn() as conn:
+        if after:
+            rows = await conn.fetch(_SELECT_CHAT_AFTER, user_id, after, limit)
+        elif before:
+            rows = await conn.fetch(_SELECT_CHAT_BEFORE, user_id, before, limit)
+        else:
+            rows = await conn.fetch(_SELECT_RECENT_CHAT, user_id, limit)
+    
+    # Return in chronological order (oldest first); datetimes are left for
+    # the response encoder (orjson) to format
+    if after:
+        return [dict(row) for row in rows]
+    return [dict(row) for row in reversed(rows)]
 
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(sql, *args)
+
+async def iter_chat_history(user_id: str, chunk: int = 200) -> AsyncIterator[dict]:
+    """
+    Stream a user's full chat history through a server-side cursor.
     
-    # Return in chronological order (oldest first)
-    if after_timestamp:
-        messages = [
-            {
-                "role": row["role"],
-                "content": row["content"],
-                "created_at": row["created_at"].isoformat(),
-            }
-            for row in rows
-        ]
-    else:
-        messages = [
-            {
-                "role": row["role"],
-                "content": row["content"],
-                "created_at": row["created_at"].isoformat(),
-            }
-            for row in reversed(rows)
-        ]
+    Meant for exports and other unbounded reads: rows arrive chunk at a time
+    in chronological order, so memory stays flat however long the history
+    is. The connection is held until the iteration finishes.
+    
+    Args:
+        user_id: User ID
+        chunk: Rows fetched per cursor round-trip
     
-    return messages
+    Yields:
+        Message dicts (created_at as datetime), oldest first
+    """
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    async with db_conn() as conn:
+        async with conn.transaction():
+            async for row in conn.cursor(_SELECT_ALL_CHAT, user_id, prefetch=chunk):
+                yield dict(row)
 
 
 async def get_recent_chat_messages(user_id: str, count: int = 6) -> List[dict]:
@@ -302,29 +815,88 @@ async def get_recent_chat_messages(user_id: str, count: int = 6) -> List[dict]:
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    async with pool.acquire() as conn:
+    async with db_conn() as conn:
         rows = await conn.fetch(
-            """
-            SELECT role, content, created_at 
-            FROM chat_messages 
-            WHERE user_id = $1 
-            ORDER BY created_at DESC 
-            LIMIT $2
-            """,
+            _SELECT_RECENT_CHAT,
             user_id,
             count,
         )
     
     # Return in chronological order (oldest first)
-    messages = [
-        {
-            "role": row["role"],
-            "content": row["content"],
-            "created_at": row["created_at"].isoformat(),
-        }
-        for row in reversed(rows)
-    ]
-    return messages
+    return [dict(row) for row in reversed(rows)]
+
+
+async def get_user_overview(user_id: str, recent_count: int = 6) -> dict:
+    """
+    Fetch a user's chat/document summary in a single round-trip.
+    
+    Equivalent to get_chat_message_count_approx + get_recent_chat_messages +
+    get_user_document_count + has_user_documents, computed as scalar
+    subqueries of one statement. Counts are capped at COUNT_CAP.
+    
+    Args:
+        user_id: User ID
+        recent_count: Number of recent messages to include
+    
+    Returns:
+        Dict with message_count, recent_messages (chronological),
+        document_count and has_documents
+    """
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    async with db_conn() as conn:
+        row = await conn.fetchrow(_SELECT_USER_OVERVIEW, user_id, recent_count, COUNT_CAP)
+    
+    return {
+        "message_count": row["message_count"],
+        "recent_messages": row["recent_messages"],
+        "document_count": row["document_count"],
+        "has_documents": row["document_count"] > 0,
+    }
+
+
+async def has_chat_messages(user_id: str) -> bool:
+    """
+    Check if user has any chat messages (optimized EXISTS query).
+    
+    Args:
+        user_id: User ID
+    
+    Returns:
+        True if user has chat history
+    """
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    async with db_conn() as conn:
+        exists = await conn.fetchval(_HAS_CHAT_MESSAGES, user_id)
+    return exists or False
+
+
+async def get_chat_message_count_approx(user_id: str, cap: int = COUNT_CAP) -> int:
+    """
+    Count a user's messages, stopping at cap (bounded index scan).
+    
+    Use this for UI display; get_chat_message_count stays exact for
+    admin/export paths.
+    
+    Args:
+        user_id: User ID
+        cap: Maximum value returned
+    
+    Returns:
+        min(message count, cap)
+    """
+    global pool
+    if not pool:
+        raise RuntimeError("DB pool is not initialized")
+
+    async with db_conn() as conn:
+        count = await conn.fetchval(_COUNT_CHAT_MESSAGES_CAPPED, user_id, cap)
+    return count or 0
 
 
 async def get_chat_message_count(user_id: str) -> int:
@@ -341,9 +913,9 @@ async def get_chat_message_count(user_id: str) -> int:
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    async with pool.acquire() as conn:
+    async with db_conn() as conn:
         count = await conn.fetchval(
-            "SELECT COUNT(*) FROM chat_messages WHERE user_id = $1",
+            _COUNT_CHAT_MESSAGES,
             user_id,
         )
     return count or 0
@@ -358,14 +930,11 @@ async def clear_chat_history(user_id: str) -> int:
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    async with pool.acquire() as conn:
-        result = await conn.execute(
-            "DELETE FROM chat_messages WHERE user_id = $1",
+    async with db_conn() as conn:
+        deleted_count = await conn.fetchval(
+            _DELETE_CHAT_MESSAGES,
             user_id,
         )
-    
-    # Extract count from result string "DELETE N"
-    deleted_count = int(result.split()[-1]) if result else 0
     return deleted_count
 
 
@@ -385,14 +954,12 @@ async def delete_chat_messages_before(user_id: str, before_timestamp: datetime)
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    async with pool.acquire() as conn:
-        result = await conn.execute(
-            "DELETE FROM chat_messages WHERE user_id = $1 AND created_at < $2",
+    async with db_conn() as conn:
+        deleted_count = await conn.fetchval(
+            _DELETE_CHAT_MESSAGES_BEFORE,
             user_id,
             before_timestamp,
         )
-    
-    deleted_count = int(result.split()[-1]) if result else 0
     return deleted_count
 
 
@@ -404,16 +971,16 @@ async def save_user_document(user_id: str, document_id: str, filename: str) -> s
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    doc_id = str(uuid.uuid4())
-    async with pool.acquire() as conn:
+    doc_id = uuid.uuid4()
+    async with db_conn() as conn:
         await conn.execute(
-            "INSERT INTO user_documents (id, user_id, document_id, filename) VALUES ($1, $2, $3, $4)",
+            _INSERT_USER_DOCUMENT,
             doc_id,
             user_id,
             document_id,
             filename,
         )
-    return doc_id
+    return str(doc_id)
 
 
 async def get_user_documents(user_id: str, limit: int = 100) -> List[dict]:
@@ -425,34 +992,20 @@ async def get_user_documents(user_id: str, limit: int = 100) -> List[dict]:
         limit: Maximum number of documents to retrieve
     
     Returns:
-        List of document dicts
+        List of document dicts (uploaded_at as datetime)
     """
     global pool
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    async with pool.acquire() as conn:
+    async with db_conn() as conn:
         rows = await conn.fetch(
-            """
-            SELECT document_id, filename, uploaded_at 
-            FROM user_documents 
-            WHERE user_id = $1 
-            ORDER BY uploaded_at DESC
-            LIMIT $2
-            """,
+            _SELECT_USER_DOCUMENTS,
             user_id,
             limit,
         )
     
-    documents = [
-        {
-            "document_id": row["document_id"],
-            "filename": row["filename"],
-            "uploaded_at": row["uploaded_at"].isoformat(),
-        }
-        for row in rows
-    ]
-    return documents
+    return [dict(row) for row in rows]
 
 
 async def get_user_document_count(user_id: str) -> int:
@@ -469,9 +1022,9 @@ async def get_user_document_count(user_id: str) -> int:
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    async with pool.acquire() as conn:
+    async with db_conn() as conn:
         count = await conn.fetchval(
-            "SELECT COUNT(*) FROM user_documents WHERE user_id = $1",
+            _COUNT_USER_DOCUMENTS,
             user_id,
         )
     return count or 0
@@ -491,9 +1044,9 @@ async def has_user_documents(user_id: str) -> bool:
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    async with pool.acquire() as conn:
+    async with db_conn() as conn:
         exists = await conn.fetchval(
-            "SELECT EXISTS(SELECT 1 FROM user_documents WHERE user_id = $1 LIMIT 1)",
+            _HAS_USER_DOCUMENTS,
             user_id,
         )
     return exists or False
@@ -508,13 +1061,11 @@ async def delete_user_documents(user_id: str) -> int:
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    async with pool.acquire() as conn:
-        result = await conn.execute(
-            "DELETE FROM user_documents WHERE user_id = $1",
+    async with db_conn() as conn:
+        deleted_count = await conn.fetchval(
+            _DELETE_USER_DOCUMENTS,
             user_id,
         )
-    
-    deleted_count = int(result.split()[-1]) if result else 0
     return deleted_count
 
 
@@ -533,12 +1084,10 @@ async def delete_user_document_by_id(user_id: str, document_id: str) -> bool:
     if not pool:
         raise RuntimeError("DB pool is not initialized")
 
-    async with pool.acquire() as conn:
-        result = await conn.execute(
-            "DELETE FROM user_documents WHERE user_id = $1 AND document_id = $2",
+    async with db_conn() as conn:
+        deleted = await conn.fetchval(
+            _DELETE_USER_DOCUMENT,
             user_id,
             document_id,
         )
-    
-    deleted_count = int(result.split()[-1]) if result else 0
-    return deleted_count > 0
\ No newline at end of file
+    return deleted
\ No newline at end of file
@@ -2,7 +2,10 @@
 Stage 1 Doctor Ad: Plan scenes for HCP-focused promotional video.
 Mix of Manim (scientific) + Product image + Logo (closing branding).
 """
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
+from string import Template
 from app.utils.llm import call_llm
 from app.utils.json_safe import extract_json
 from app.paths import PROMPTS_DIR
@@ -11,6 +14,73 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def _load_scene_planner_template() -> Template:
+    """Read and compile the doctor ad scene planner prompt once per process."""
+    prompt_path = PROMPTS_DIR / "scene_planner_doctor.txt"
+    
+    if not prompt_path.exists():
+        raise FileNotFoundError(f"Prompt not found: {prompt_path}")
+    
+    return Template(prompt_path.read_text(encoding="utf-8"))
+
+
+# Closing scenes every doctor ad ends with, in order
+CLOSING_SCENE_TYPES = ("product", "logo")
+
+
+def _closing_scene(scene_type: str, drug_name: str) -> dict:
+    """Default closing scene of the given type (scene_id is set by the caller)."""
+    if scene_type == "product":
+        return {
+            "type": "product",
+            "duration_sec": 7,
+            "concept": "Product showcase",
+            "product_name": drug_name,
+            "narration_key_points": [
+                f"{drug_name} - Available for your patients",
+                "Contact your medical representative"
+            ]
+        }
+    return {
+        "type": "logo",
+        "duration_sec": 6,
+        "concept": "Company branding closure",
+        "tagline": "Innovating Healthcare Solutions",
+        "narration_key_points": [
+            "Full prescribing information available"
+        ]
+    }
+
+
+def _add_missing_closers(scenes: list[dict], drug_name: str):
+    """
+    Insert any missing closing scene, in place.
+    
+    A missing closer goes before the first later closer that is present
+    (product before logo), otherwise at the end.
+    """
+    types = {s.get("type") for s in scenes}
+    
+    for i, scene_type in enumerate(CLOSING_SCENE_TYPES):
+        if scene_type in types:
+            continue
+        logger.warning(f"No {scene_type.capitalize()} scene found, adding {scene_type} scene")
+        
+        later = CLOSING_SCENE_TYPES[i + 1:]
+        idx = next((j for j, s in enumerate(scenes) if s.get("type") in later), len(scenes))
+        scene = _closing_scene(scene_type, drug_name)
+        scenes.insert(idx, scene)
+        types.add(scene_type)
+        
+        if idx == len(scenes) - 1:
+            scene["scene_id"] = len(scenes)
+        else:
+            # Renumber scenes
+            for n, s in enumerate(scenes, 1):
+                s["scene_id"] = n
+
+
 def generate_doctor_scenes(
     drug_name: str,
     indication: str,
@@ -46,34 +116,30 @@ def generate_doctor_scenes(
             ]
         }
     """
-    prompt_path = PROMPTS_DIR / "scene_planner_doctor.txt"
-    
-    if not prompt_path.exists():
-        raise FileNotFoundError(f"Prompt not found: {prompt_path}")
-    
-    prompt_template = prompt_path.read_text(encoding="utf-8")
+    # Truncated once, used for both the prompt and the stored scenes data
+    reference_docs = reference_docs[:6000] if reference_docs else reference_docs
     
     # Build context string
-    context = f"Drug: {drug_name}\nIndication: {indication}"
+    parts = [f"Drug: {drug_name}", f"Indication: {indication}"]
     if moa_summary:
-        context += f"\nMechanism: {moa_summary}"
+        parts.append(f"Mechanism: {moa_summary}")
     if clinical_data:
-        context += f"\nClinical Data: {clinical_data}"
+        parts.append(f"Clinical Data: {clinical_data}")
     if reference_docs:
-        context += f"\nReference Docs: {reference_docs[:6000]}"  # Truncate for prompt
+        parts.append(f"Reference Docs: {reference_docs}")
     if logo_path:
-        context += f"\nLogo: {logo_path}"
+        parts.append(f"Logo: {logo_path}")
     if product_image_path:
-        context += f"\nProduct Image: {product_image_path}"
+        parts.append(f"Product Image: {product_image_path}")
     if image_paths:
-        context += f"\nImages: {', '.join(image_paths)}"
-    if context:
-        prompt_template += f"\n\nCONTEXT:\n{context}"
+        parts.append(f"Images: {', '.join(image_paths)}")
+    context = "\n".join(parts)
     
-    prompt = prompt_template.replace("{drug_name}", drug_name) \
-                           .replace("{indication}", indication)
-    
-
+    # Placeholders live in the template only, so the context is appended after
+    prompt = _load_scene_planner_template().safe_substitute(
+        drug_name=drug_name,
+        indication=indication,
+    ) + f"\n\nCONTEXT:\n{context}"
     
     logger.info(f"Generating doctor ad scenes for {drug_name}...")
     
@@ -95,63 +161,15 @@ def generate_doctor_scenes(
     if image_paths:
         scenes_data["image_paths"] = image_paths
     if reference_docs:
-        scenes_data["reference_docs"] = reference_docs[:6000]  # Store a truncated version for reference
+        scenes_data["reference_docs"] = reference_docs  # Truncated version, for reference
     
 
     # Ensure correct scene order: Manim scenes → Product → Logo
     scenes = scenes_data["scenes"]
-    has_product = any(s.get("type") == "product" for s in scenes)
-    has_logo = any(s.get("type") == "logo" for s in scenes)
-    
-    # Add missing product scene before logo if needed
-    if not has_product and scenes:
-        logger.warning("No Product scene found, adding product scene")
-        # Insert product scene before logo (or at the end if no logo)
-        if has_logo:
-            # Find logo scene and insert product before it
-            logo_idx = next(i for i, s in enumerate(scenes) if s.get("type") == "logo")
-            scenes.insert(logo_idx, {
-                "scene_id": len(scenes) + 1,
-                "type": "product",
-                "duration_sec": 7,
-                "concept": "Product showcase",
-                "product_name": drug_name,
-                "narration_key_points": [
-                    f"{drug_name} - Available for your patients",
-                    "Contact your medical representative"
-                ]
-            })
-            # Renumber scenes
-            for i, scene in enumerate(scenes, 1):
-                scene["scene_id"] = i
-        else:
-            # Add at end
-            scenes.append({
-                "scene_id": len(scenes) + 1,
-                "type": "product",
-                "duration_sec": 7,
-                "concept": "Product showcase",
-                "product_name": drug_name,
-                "narration_key_points": [
-                    f"{drug_name} - Available for your patients",
-                    "Contact your medical representative"
-                ]
-            })
-    
-    # Add missing logo scene at the end if needed
-    if not has_logo and scenes:
-        logger.warning("No Logo scene found, adding closing scene")
-        scenes.append({
-            "scene_id": len(scenes) + 1,
-            "type": "logo",
-            "duration_sec": 6,
-            "concept": "Company branding closure",
-            "tagline": "Innovating Healthcare Solutions",
-            "narration_key_points": [
-                "Full prescribing information available"
-            ]
-        })
+    if scenes:
+        _add_missing_closers(scenes, drug_name)
     
-    logger.info(f"Generated {len(scenes)} scenes ({len([s for s in scenes if s['type']=='manim'])} Manim, {len([s for s in scenes if s['type']=='product'])} Product, {len([s for s in scenes if s['type']=='logo'])} Logo)")
+    counts = Counter(s.get("type") for s in scenes)
+    logger.info(f"Generated {len(scenes)} scenes ({counts['manim']} Manim, {counts['product']} Product, {counts['logo']} Logo)")
     
     return scenes_data
\ No newline at end of file
@@ -1,12 +1,17 @@
 """
 Stage 2 Doctor Ad: Generate Manim code for all scenes (including product and logo closing scenes).
 """
-import json
+import os
+import asyncio
+import orjson
+from operator import itemgetter
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from app.utils.llm import call_llm
+from typing import Callable
+from app.utils.llm import call_llm, acall_llm_batch
+from app.utils.manim_prompt import build_manim_prompt
+from app.utils.artifact_cache import artifact_key, fetch_text, store_text
 from app.utils.json_safe import extract_json
-from app.paths import PROMPTS_DIR, OUTPUTS_DIR
+from app.paths import OUTPUTS_DIR
 from app.utils.logging_config import StageLogger
 
 import logging
@@ -22,15 +27,8 @@ except ImportError:
     validate_manim_code = None
 
 
-def generate_logo_scene_code(scene: dict) -> str:
-    """
-    Generate Manim code for logo scene with optional tagline.
-    """
-    scene_id = scene.get("scene_id", 1)
-    logo_path = scene.get("logo_path", "")
-    tagline = scene.get("tagline", "")
-    
-    code = f'''from manim import *
+# Shared by the template-built (logo/product) scenes
+_SCENE_HEADER = '''from manim import *
 from manim import config
 from pathlib import Path
 
@@ -43,19 +41,38 @@ class Scene{scene_id}(Scene):
         medical_blue = "#2E86AB"
         
 '''
+
+_SCENE_FOOTER = '''        self.wait(0.3)
+'''
+
+
+def _literal(value) -> str:
+    """Python string literal for value (quotes/backslashes in user text can't break the code)."""
+    return repr(str(value))
+
+
+def generate_logo_scene_code(scene: dict) -> str:
+    """
+    Generate Manim code for logo scene with optional tagline.
+    """
+    scene_id = scene.get("scene_id", 1)
+    logo_path = scene.get("logo_path", "")
+    tagline = scene.get("tagline", "")
+    
+    parts = [_SCENE_HEADER.format(scene_id=scene_id)]
     
     if logo_path:
-        code += f'''        # Load company logo
+        parts.append(f'''        # Load company logo
         try:
-            logo = ImageMobject("{logo_path}")
+            logo = ImageMobject({_literal(logo_path)})
             logo.height = config.frame_height * 0.4
             logo.move_to(ORIGIN)
             
-'''
+''')
         
         if tagline:
-            code += f'''            # Add tagline
-            tagline = Text("{tagline}", font="Sans", font_size=32, color=BLACK)
+            parts.append(f'''            # Add tagline
+            tagline = Text({_literal(tagline)}, font="Sans", font_size=32, color=BLACK)
             tagline.next_to(logo, DOWN, buff=0.8)
             
             self.play(FadeIn(logo, scale=0.9), run_time=1)
@@ -63,29 +80,29 @@ class Scene{scene_id}(Scene):
             self.play(Write(tagline), run_time=0.8)
             self.wait(2)
             self.play(FadeOut(logo), FadeOut(tagline), run_time=1)
-'''
+''')
         else:
-            code += f'''            self.play(FadeIn(logo, scale=0.9), run_time=1)
+            parts.append('''            self.play(FadeIn(logo, scale=0.9), run_time=1)
             self.wait(3)
             self.play(FadeOut(logo), run_time=1)
-'''
+''')
         
-        code += f'''        except Exception as e:
+        parts.append('''        except Exception as e:
             # Fallback: Show text if logo fails
             text = Text("Thank You", font="Sans", font_size=56, color=BLACK)
             text.move_to(ORIGIN)
             self.play(Write(text), run_time=1)
             self.wait(3)
             self.play(FadeOut(text), run_time=1)
-'''
+''')
     else:
         # No logo provided - show thank you text
-        code += f'''        text = Text("Thank You", font="Sans", font_size=56, color=BLACK)
+        parts.append('''        text = Text("Thank You", font="Sans", font_size=56, color=BLACK)
         text.move_to(ORIGIN)
-'''
+''')
         
         if tagline:
-            code += f'''        tagline = Text("{tagline}", font="Sans", font_size=32, color=BLACK)
+            parts.append(f'''        tagline = Text({_literal(tagline)}, font="Sans", font_size=32, color=BLACK)
         tagline.next_to(text, DOWN, buff=0.8)
         
         self.play(Write(text), run_time=1)
@@ -93,18 +110,17 @@ class Scene{scene_id}(Scene):
         self.play(Write(tagline), run_time=0.8)
         self.wait(2)
         self.play(FadeOut(text), FadeOut(tagline), run_time=1)
-'''
+''')
         else:
-            code += f'''        
+            parts.append('''        
         self.play(Write(text), run_time=1)
         self.wait(3)
         self.play(FadeOut(text), run_time=1)
-'''
+''')
     
-    code += '''        self.wait(0.3)
-'''
+    parts.append(_SCENE_FOOTER)
     
-    return code
+    return "".join(parts)
 
 
 def generate_product_scene_code(scene: dict) -> str:
@@ -113,31 +129,19 @@ def generate_product_scene_code(scene: dict) -> str:
     """
     scene_id = scene.get("scene_id", 1)
     product_image_path = scene.get("product_image_path", "")
-    product_name = scene.get("product_name", "Product")
+    product_name = _literal(scene.get("product_name", "Product"))
     
-    code = f'''from manim import *
-from manim import config
-from pathlib import Path
-
-class Scene{scene_id}(Scene):
-    def construct(self):
-        # Set white background
-        self.camera.background_color = WHITE
-        
-        # Define custom colors
-        medical_blue = "#2E86AB"
-        
-'''
+    parts = [_SCENE_HEADER.format(scene_id=scene_id)]
     
     if product_image_path:
-        code += f'''        # Load product image
+        parts.append(f'''        # Load product image
         try:
-            product = ImageMobject("{product_image_path}")
+            product = ImageMobject({_literal(product_image_path)})
             product.height = config.frame_height * 0.5
             product.move_to(ORIGIN)
             
             # Add product name
-            product_text = Text("{product_name}", font="Sans", font_size=40, color=BLACK)
+            product_text = Text({product_name}, font="Sans", font_size=40, color=BLACK)
             product_text.to_edge(UP, buff=0.5)
             
             self.play(Write(product_text), run_time=0.8)
@@ -148,7 +152,7 @@ class Scene{scene_id}(Scene):
             
         except Exception as e:
             # Fallback: Show text if image fails
-            text = Text("{product_name}", font="Sans", font_size=48, color=BLACK)
+            text = Text({product_name}, font="Sans", font_size=48, color=BLACK)
             text.move_to(ORIGIN)
             subtext = Text("Available Now", font="Sans", font_size=32, color=medical_blue)
             subtext.next_to(text, DOWN, buff=0.8)
@@ -158,10 +162,10 @@ class Scene{scene_id}(Scene):
             self.play(Write(subtext), run_time=0.8)
             self.wait(2)
             self.play(FadeOut(text), FadeOut(subtext), run_time=1)
-'''
+''')
     else:
         # No product image provided - show product name text
-        code += f'''        text = Text("{product_name}", font="Sans", font_size=48, color=BLACK)
+        parts.append(f'''        text = Text({product_name}, font="Sans", font_size=48, color=BLACK)
         text.move_to(ORIGIN)
         subtext = Text("Available Now", font="Sans", font_size=32, color=medical_blue)
         subtext.next_to(text, DOWN, buff=0.8)
@@ -171,15 +175,14 @@ class Scene{scene_id}(Scene):
         self.play(Write(subtext), run_time=0.8)
         self.wait(2)
         self.play(FadeOut(text), FadeOut(subtext), run_time=1)
-'''
+''')
     
-    code += '''        self.wait(0.3)
-'''
+    parts.append(_SCENE_FOOTER)
     
-    return code
+    return "".join(parts)
 
 
-def generate_manim_scene(scene: dict, retry_count: int = 0, max_retries: int = 2) -> tuple[int, str]:
+def generate_manim_scene(scene: dict, narration: str = "", retry_count: int = 0, max_retries: int = 2) -> tuple[int, str]:
     """
     Generate Manim code with syntax validation only (runtime deferred to render).
     
@@ -208,52 +211,236 @@ def generate_manim_scene(scene: dict, retry_count: int = 0, max_retries: int = 2
         return (scene_id, manim_code)
     
     # Regular manim scene generation
-    prompt_path = PROMPTS_DIR / "manim_generator.txt"
-    prompt_template = prompt_path.read_text(encoding="utf-8")
+    system, prompt = _scene_prompt(scene, narration)
+    
+    # Only validated code is cached, so a hit skips the LLM and validation
+    key = _code_key(system, prompt)
+    cached = fetch_text(key)
+    if cached is not None:
+        logger.info(f"Scene {scene_id}: Code cache hit ✓", extra={'progress': True})
+        return (scene_id, cached)
     
+    for attempt in range(retry_count, max_retries + 1):
+        logger.info(f"Scene {scene_id}: Generating code (attempt {attempt + 1})", extra={'progress': True})
+        
+        output = call_llm(prompt, temperature=0, system=system)
+        manim_code, error_msg = _extract_manim_code(scene_id, output)
+        
+        # Step 1: Syntax validation (optional)
+        if not error_msg:
+            break
+        
+        logger.warning(f"Scene {scene_id}: Syntax validation failed - {error_msg[:100]}", extra={'progress': True})
+        
+        if attempt == max_retries:
+            raise ValueError(f"Syntax validation failed: {error_msg}")
+    
+    store_text(key, manim_code)
+    logger.info(f"Scene {scene_id}: Code generated ✓", extra={'progress': True})
+    return (scene_id, manim_code)
+
+
+def _code_key(system: str, prompt: str) -> str:
+    """Cache key for the code generated from a prompt (always temperature 0 here)."""
+    return artifact_key("manim_code", system, prompt, 0)
+
+
+def _scene_prompt(scene: dict, narration: str = "") -> tuple[str, str]:
+    """(system, user) generator prompt for a regular Manim scene."""
     scene_id = scene.get("scene_id", 1)
     duration = scene.get("duration_sec", 10)
     visual_elements = scene.get("visual_elements", [])
     
-    prompt = prompt_template.replace("{scene_json}", json.dumps(scene, indent=2)) \
-                           .replace("{duration}", str(duration)) \
-                           .replace("{visual_elements}", ", ".join(visual_elements)) \
-                           .replace("{scene_id}", str(scene_id))
-    
-    logger.info(f"Scene {scene_id}: Generating code (attempt {retry_count + 1})", extra={'progress': True})
+    # Narration joins the prompt's copy of the scene; the scene itself is not touched
+    return build_manim_prompt({**scene, "narration": narration}, scene_id, duration, ", ".join(visual_elements))
+
+
+def _extract_manim_code(scene_id: int, output: str) -> tuple[str, str | None]:
+    """
+    Pull the Manim code out of an LLM response and syntax-check it.
     
-    output = call_llm(prompt, temperature=0)
+    Returns:
+        (manim_code, error) - error is None when validation passed or is unavailable
+    """
     result = extract_json(output)
     
     manim_code = result.get("manim_code", "")
     if not manim_code:
         raise ValueError(f"No code returned for scene {scene_id}")
     
-    # Step 1: Syntax validation (optional)
     if validate_manim_code:
         is_valid, error_msg = validate_manim_code(manim_code, scene_id)
-        
         if not is_valid:
-            logger.warning(f"Scene {scene_id}: Syntax validation failed - {error_msg[:100]}", extra={'progress': True})
+            return manim_code, error_msg
+    
+    return manim_code, None
+
+
+async def generate_manim_scenes_batch(
+    scenes: list[dict],
+    narrations: dict | None = None,
+    max_retries: int = 2,
+    max_inflight: int | None = None,
+    on_ready: Callable[[int, str], None] | None = None,
+    refresh: bool = False
+) -> dict:
+    """
+    Generate code for regular Manim scenes with one batched LLM request per attempt.
+    
+    Scenes whose prompt already produced validated code are served from the
+    cache; only the scenes that fail syntax validation are re-batched on the
+    next attempt. Each scene is handled as soon as its response arrives.
+    
+    Args:
+        scenes: Scenes to generate (no logo/product scenes), in priority order
+        narrations: scene_id -> narration script
+        max_retries: Re-batch attempts for scenes failing validation
+        max_inflight: Cap on concurrent LLM requests (default: llm.MAX_INFLIGHT)
+        on_ready: Optional callback(scene_id, manim_code) for each validated scene
+        refresh: Skip the code cache and call the LLM for every scene (the new
+            code replaces the cached entry)
+    
+    Returns:
+        dict of scene_id -> manim_code, or the exception that failed the scene
+    """
+    results = {}
+    pending = scenes
+    narrations = narrations or {}
+    
+    def _ready(scene_id: int, manim_code: str):
+        results[scene_id] = manim_code
+        if on_ready:
+            on_ready(scene_id, manim_code)
+    
+    for attempt in range(max_retries + 1):
+        # The system prompt depends on the scene's fields, so each prompt
+        # carries its own
+        systems = []
+        prompts = []
+        keys = []
+        misses = []
+        for scene in pending:
+            scene_id = scene.get("scene_id", 1)
+            system, prompt = _scene_prompt(scene, narrations.get(scene_id, ""))
+            key = _code_key(system, prompt)
+            
+            cached = None if refresh else fetch_text(key)
+            if cached is not None:
+                logger.info(f"Scene {scene_id}: Code cache hit ✓", extra={'progress': True})
+                _ready(scene_id, cached)
+                continue
+            
+            systems.append(system)
+            prompts.append(prompt)
+            keys.append(key)
+            misses.append(scene)
+        
+        pending = misses
+        if not pending:
+            break
+        
+        retry = []
+        
+        def _handle(i: int, output):
+            scene_id = pending[i].get("scene_id", 1)
+            
+            if isinstance(output, Exception):
+                results[scene_id] = output
+                return
+            
+            try:
+                manim_code, error_msg = _extract_manim_code(scene_id, output)
+            except Exception as e:
+                results[scene_id] = e
+                return
             
-            if retry_count < max_retries:
-                return generate_manim_scene(scene, retry_count + 1, max_retries)
+            if error_msg is None:
+                store_text(keys[i], manim_code)
+                logger.info(f"Scene {scene_id}: Code generated ✓", extra={'progress': True})
+                _ready(scene_id, manim_code)
+            elif attempt < max_retries:
+                logger.warning(f"Scene {scene_id}: Syntax validation failed - {error_msg[:100]}", extra={'progress': True})
+                retry.append(pending[i])
             else:
-                raise ValueError(f"Syntax validation failed: {error_msg}")
+                results[scene_id] = ValueError(f"Syntax validation failed: {error_msg}")
+        
+        logger.info(f"Generating code for {len(pending)} scenes in one batch (attempt {attempt + 1})", extra={'progress': True})
+        await acall_llm_batch(prompts, temperature=0, system=systems, max_inflight=max_inflight, on_result=_handle)
+        
+        # Keep priority order for the re-batch
+        retry.sort(key=lambda s: s.get("scene_id", 1))
+        pending = retry
     
-    logger.info(f"Scene {scene_id}: Code generated ✓", extra={'progress': True})
-    return (scene_id, manim_code)
+    return results
+
+
+def _load_checkpoint(progress_file: Path) -> dict:
+    """scene_id -> prompt hash of every scene a previous run saved successfully."""
+    done = {}
+    try:
+        lines = progress_file.read_bytes().splitlines()
+    except FileNotFoundError:
+        return done
+    
+    for line in lines:
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            continue  # Torn last line from a crash
+        if record.get("status") == "ok":
+            done[record["scene_id"]] = record["hash"]
+        else:
+            done.pop(record["scene_id"], None)
+    return done
+
+
+def _append_progress(progress_file: Path, record: dict):
+    """Append one record to the progress log (a single O_APPEND write per line)."""
+    fd = os.open(progress_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, orjson.dumps(record) + b"\n")
+    finally:
+        os.close(fd)
 
 
-def run_stage2_doctor(scenes_data: dict, script: list[dict], video_id: str, max_workers: int = 3) -> Path:
+def run_stage2_doctor(
+    scenes_data: dict,
+    script: list[dict],
+    video_id: str,
+    max_workers: int | None = None,
+    on_scene_ready: Callable[[int, Path], None] | None = None,
+    refresh: bool = False
+) -> Path:
+    """Sync entry point for worker threads; see arun_stage2_doctor."""
+    return asyncio.run(arun_stage2_doctor(scenes_data, script, video_id, max_workers, on_scene_ready, refresh))
+
+
+async def arun_stage2_doctor(
+    scenes_data: dict,
+    script: list[dict],
+    video_id: str,
+    max_workers: int | None = None,
+    on_scene_ready: Callable[[int, Path], None] | None = None,
+    refresh: bool = False
+) -> Path:
     """
     Generate Manim code for ALL scenes (no type filter).
     
+    Scenes are dispatched in scene_id order and each file is saved as soon as
+    its code is ready, so a consumer can start on scene 1 while later scenes
+    are still being generated.
+    
+    Saves are logged to stage2.jsonl; a re-run skips every scene whose file a
+    previous run saved from the same prompt (unless refresh is set).
+    
     Args:
         scenes_data: Scene planning output
         script: Narration scripts
         video_id: Video ID
-        max_workers: Parallel workers
+        max_workers: Cap on concurrent LLM requests (default: llm.MAX_INFLIGHT)
+        on_scene_ready: Optional callback(scene_id, scene_file) after each save
+        refresh: Regenerate every LLM scene, bypassing both the checkpoint
+            and the code cache (an explicit regenerate)
     
     Returns:
         Path to Manim scenes directory
@@ -270,35 +457,77 @@ def run_stage2_doctor(scenes_data: dict, script: list[dict], video_id: str, max_
     manim_scenes_dir = MANIM_DIR / video_id / "scenes"
     manim_scenes_dir.mkdir(parents=True, exist_ok=True)
     
-    # Add narration
     script_map = {s["scene_id"]: s["script"] for s in script}
-    for scene in scenes:
-        scene["narration"] = script_map.get(scene["scene_id"], "")
     
-    stage_logger.progress(f"Generating {len(scenes)} Manim scenes (parallel, workers={max_workers})...")
+    stage_logger.progress(f"Generating {len(scenes)} Manim scenes (batched)...")
     
     scene_files = []
     failed_scenes = []
     completed = 0
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_scene = {executor.submit(generate_manim_scene, scene): scene for scene in scenes}
-        
-        for future in as_completed(future_to_scene):
-            scene = future_to_scene[future]
-            scene_id = scene["scene_id"]
-            
+    saves = {}
+    template_errors = {}
+    
+    progress_file = manim_scenes_dir / "stage2.jsonl"
+    checkpoint = {} if refresh else _load_checkpoint(progress_file)
+    prompt_hashes = {}
+    
+    async def _save(scene_id: int, manim_code: str | None) -> Path:
+        nonlocal completed
+        scene_file = manim_scenes_dir / f"scene_{scene_id}.py"
+        if manim_code is not None:
+            await asyncio.to_thread(scene_file.write_bytes, manim_code.encode("utf-8"))
+            if scene_id in prompt_hashes:
+                _append_progress(progress_file, {"scene_id": scene_id, "hash": prompt_hashes[scene_id], "status": "ok"})
+        completed += 1
+        stage_logger.progress(f"Scene {scene_id}: Saved ✓ ({completed}/{len(scenes)})")
+        if on_scene_ready:
+            on_scene_ready(scene_id, scene_file)
+        return scene_file
+    
+    def _ready(scene_id: int, manim_code: str | None):
+        # Written off the event loop while the remaining LLM calls are in flight
+        saves[scene_id] = asyncio.ensure_future(_save(scene_id, manim_code))
+    
+    # Logo/product scenes come from templates; the rest go out as one LLM batch
+    llm_scenes = []
+    for scene in sorted(scenes, key=itemgetter("scene_id")):
+        if scene.get("type", "manim") in ("logo", "product"):
             try:
-                scene_id, manim_code = future.result()
-                scene_file = manim_scenes_dir / f"scene_{scene_id}.py"
-                scene_file.write_text(manim_code, encoding="utf-8")
-                scene_files.append(scene_file)
-                completed += 1
-                stage_logger.progress(f"Scene {scene_id}: Saved ✓ ({completed}/{len(scenes)})")
+                scene_id, manim_code = generate_manim_scene(scene)
             except Exception as e:
-                logger.error(f"Scene {scene_id}: Failed - {str(e)[:150]}", extra={'progress': True})
-                failed_scenes.append({"scene_id": scene_id, "error": str(e)[:500]})
-                completed += 1
+                template_errors[scene["scene_id"]] = e
+                continue
+            _ready(scene_id, manim_code)
+            continue
+        
+        scene_id = scene["scene_id"]
+        prompt_hashes[scene_id] = _code_key(*_scene_prompt(scene, script_map.get(scene_id, "")))
+        if checkpoint.get(scene_id) == prompt_hashes[scene_id] and (manim_scenes_dir / f"scene_{scene_id}.py").exists():
+            logger.info(f"Scene {scene_id}: Saved by a previous run, skipping ✓", extra={'progress': True})
+            _ready(scene_id, None)
+        else:
+            llm_scenes.append(scene)
+    
+    codes = await generate_manim_scenes_batch(
+        llm_scenes, script_map, max_inflight=max_workers, on_ready=_ready, refresh=refresh
+    )
+    
+    await asyncio.gather(*saves.values(), return_exceptions=True)
+    
+    for scene in scenes:
+        scene_id = scene["scene_id"]
+        save = saves.get(scene_id)
+        error = save.exception() if save else codes.get(scene_id) or template_errors.get(scene_id)
+        
+        if save and error is None:
+            scene_files.append(save.result())
+            continue
+        
+        error = error or RuntimeError("No code generated")
+        logger.error(f"Scene {scene_id}: Failed - {str(error)[:150]}", extra={'progress': True})
+        failed_scenes.append({"scene_id": scene_id, "error": str(error)[:500]})
+        if scene_id in prompt_hashes:
+            _append_progress(progress_file, {"scene_id": scene_id, "hash": prompt_hashes[scene_id], "status": "failed"})
     
     # Save metadata
     metadata = {
@@ -308,7 +537,9 @@ def run_stage2_doctor(scenes_data: dict, script: list[dict], video_id: str, max_
         "failed_scenes": failed_scenes,
         "scenes_data": scenes_data
     }
-    (manim_scenes_dir / "scenes_data.json").write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    await asyncio.to_thread(
+        (manim_scenes_dir / "scenes_data.json").write_bytes, orjson.dumps(metadata, option=orjson.OPT_INDENT_2)
+    )
     
     if not scene_files:
         stage_logger.error("All Manim scenes failed")
@@ -319,4 +550,4 @@ def run_stage2_doctor(scenes_data: dict, script: list[dict], video_id: str, max_
     else:
         stage_logger.complete(f"All {len(scene_files)} Manim scenes generated")
     
-    return manim_scenes_dir
\ No newline at end of file
+    return manim_scenes_dir
@@ -3,7 +3,7 @@ Stage 3 Doctor Ad: Handle product and logo scenes.
 Product and logo will be handled in rendering stage using uploaded images.
 """
 from pathlib import Path
-from app.utils.pexels_client import get_media_for_scene, download_media
+from app.utils.pexels_client import aget_media_for_scene, adownload_scene_media
 from app.paths import OUTPUTS_DIR
 
 import logging
@@ -12,11 +12,12 @@ logger = logging.getLogger(__name__)
 VIDEOS_DIR = OUTPUTS_DIR / "videos"
 
 
-def fetch_pexels_closing(pexels_query: str, video_id: str, scene_id: int) -> dict:
+async def fetch_pexels_closing(client, pexels_query: str, video_id: str, scene_id: int) -> dict:
     """
     Fetch and download 1 Pexels asset for closing scene (prefer image for Manim integration).
     
     Args:
+        client: Shared httpx.AsyncClient (see pexels_client.async_client)
         pexels_query: Search query (e.g., "doctor consultation")
         video_id: Video ID
         scene_id: Scene ID
@@ -35,36 +36,9 @@ def fetch_pexels_closing(pexels_query: str, video_id: str, scene_id: int) -> dic
     pexels_dir.mkdir(parents=True, exist_ok=True)
     
     # Get media from Pexels (prefer image for easy Manim integration)
-    media = get_media_for_scene([pexels_query], prefer_video=False)
+    media = await aget_media_for_scene(client, [pexels_query], prefer_video=False)
     
-    result = {"image": None, "video": None}
-    
-    # Download image (preferred)
-    image = media.get("image")
-    if image and image.get("src"):
-        image_path = pexels_dir / f"scene_{scene_id}_image.jpg"
-        if download_media(image["src"], image_path):
-            result["image"] = {
-                "local_path": str(image_path),
-                "src": image["src"],
-                "alt": image.get("alt", "")
-            }
-            logger.info(f"Downloaded Pexels image: {image_path.name}")
-        else:
-            logger.warning(f"Image download failed for scene {scene_id}")
-    
-    # Download video only as fallback
-    video = media.get("video")
-    if video and video.get("src") and not result["image"]:
-        video_path = pexels_dir / f"scene_{scene_id}_video.mp4"
-        if download_media(video["src"], video_path):
-            result["video"] = {
-                "local_path": str(video_path),
-                "src": video["src"]
-            }
-            logger.info(f"Downloaded Pexels video: {video_path.name}")
-        else:
-            logger.warning(f"Video download failed for scene {scene_id}")
+    result = await adownload_scene_media(client, media, pexels_dir, f"scene_{scene_id}", f"Scene {scene_id}")
     
     if not result["image"] and not result["video"]:
         raise RuntimeError(f"Failed to download any Pexels media for query: {pexels_query}")
@@ -1,14 +1,23 @@
 """
 Stage 5 Doctor Ad: Render all Manim scenes (including closing with Pexels image), combine with audio.
 """
+import hashlib
+import os
 import subprocess
-import json
+import threading
+import orjson
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from operator import itemgetter
 from pathlib import Path
+from typing import Callable, Optional
 from app.paths import OUTPUTS_DIR
 from app.utils.logging_config import StageLogger
+from app.utils.artifact_cache import artifact_key, fetch_artifact, store_artifact, clear_destination, fetch_text, store_text
 from app.utils.llm import call_llm  # Assuming this is available
 from app.utils.json_safe import extract_json
-from app.paths import PROMPTS_DIR
+from app.utils.manim_prompt import build_runtime_fix_prompt
 import logging
 logger = logging.getLogger(__name__)
 
@@ -16,6 +25,44 @@ MANIM_DIR = OUTPUTS_DIR / "manim"
 VIDEOS_DIR = OUTPUTS_DIR / "videos"
 AUDIO_DIR = OUTPUTS_DIR / "audio"
 
+# Manim quality flag per quality name, and the output subdirectory it renders into
+QUALITY_FLAGS = {"low": "-ql", "medium": "-qm", "high": "-qh", "production": "-qk"}
+QUALITY_DIRS = {"low": "480p15", "medium": "720p30", "high": "1080p60", "production": "2160p60"}
+
+# Scenes render concurrently, one manim subprocess per core. The slots are
+# shared by every render in the process (Creator Mode sessions and the HTTP
+# endpoint alike), so concurrent videos queue instead of multiplying the load
+MAX_RENDER_WORKERS = os.cpu_count() or 1
+_MANIM_SLOTS = threading.BoundedSemaphore(MAX_RENDER_WORKERS)
+
+# Each render already has a core to itself; keep manim's numeric libraries
+# from spawning thread pools on top of that
+MANIM_ENV = {**os.environ, "OMP_NUM_THREADS": "1"}
+
+# Quality used to check LLM-fixed scene code before the real render
+DRAFT_QUALITY_FLAG = "-ql"
+
+# Manim can log megabytes; only the last STDERR_TAIL_CHUNKS reads of its
+# stderr are kept, and only the last MAX_ERROR_CHARS of that are reported
+# (the traceback is at the end)
+STDERR_CHUNK_SIZE = 64 * 1024
+STDERR_TAIL_CHUNKS = 16
+MAX_ERROR_CHARS = 4000
+
+# Appended to a copy of the scene code to bake the narration into the render.
+# The scene is held on its last frame until the narration ends, like the
+# tpad/apad combine does.
+NARRATED_SCENE = """
+
+class {scene_class}Narrated({scene_class}):
+    def construct(self):
+        self.add_sound({audio_path!r})
+        super().construct()
+        remaining = {audio_duration} - self.renderer.time
+        if remaining > 0:
+            self.wait(remaining)
+"""
+
 def auto_fix_runtime_error_with_llm(
     broken_code: str,
     runtime_error: str,
@@ -37,15 +84,9 @@ def auto_fix_runtime_error_with_llm(
     """
     logger.info(f"🔧 Asking LLM to fix runtime error (attempt {attempt})...", extra={'progress': True})
     
-    # Load runtime fix prompt (assume it exists)
-    fix_prompt_path = PROMPTS_DIR / "manim_runtime_fix.txt"
+    fix_prompt = build_runtime_fix_prompt(broken_code, runtime_error, scene_data)
     
-    if fix_prompt_path.exists():
-        fix_template = fix_prompt_path.read_text(encoding="utf-8")
-        fix_prompt = fix_template.replace("{runtime_error}", runtime_error) \
-                                  .replace("{broken_code}", broken_code) \
-                                  .replace("{scene_json}", json.dumps(scene_data, indent=2))
-    else:
+    if fix_prompt is None:
         # Fallback
         fix_prompt = f"""Fix this Manim code that has a RUNTIME ERROR.
 
@@ -57,6 +98,13 @@ BROKEN CODE:
 
 Return ONLY JSON: {{"manim_code": "<fixed code>"}}"""
     
+    # The same code failing with the same traceback gets the same fix
+    cache_key = artifact_key("manim_fix", fix_prompt, 0.3)
+    cached = fetch_text(cache_key)
+    if cached:
+        logger.info(f"✓ Reused cached fix ({len(cached)} chars)", extra={'progress': True})
+        return cached
+    
     output = call_llm(fix_prompt, temperature=0.3)
     
     try:
@@ -67,6 +115,7 @@ Return ONLY JSON: {{"manim_code": "<fixed code>"}}"""
             raise ValueError("LLM returned empty manim_code")
         
         logger.info(f"✓ LLM returned fixed code ({len(fixed_code)} chars)", extra={'progress': True})
+        store_text(cache_key, fixed_code)
         return fixed_code
         
     except Exception as e:
@@ -91,40 +140,121 @@ def get_duration(file_path: Path) -> float:
         return 0.0
 
 
-def render_manim_scene(scene_file: Path, output_dir: Path, scene_data: dict, quality: str = "high", max_retries: int = 2) -> Path:
-    """Render single Manim scene with retry on error."""
-    quality_flags = {"low": "-ql", "medium": "-qm", "high": "-qh", "production": "-qk"}
-    quality_dirs = {"low": "480p15", "medium": "720p30", "high": "1080p60", "production": "2160p60"}
+def run_with_stderr_tail(cmd: list[str], timeout: float, env: Optional[dict] = None):
+    """
+    Run cmd, keeping only the tail of its stderr in memory.
+    
+    Raises:
+        subprocess.CalledProcessError / subprocess.TimeoutExpired, with the
+        decoded stderr tail as .stderr
+    """
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env)
+    tail = deque(maxlen=STDERR_TAIL_CHUNKS)
     
-    flag = quality_flags.get(quality, "-qh")
-    quality_dir = quality_dirs.get(quality, "1080p60")
+    def _drain():
+        for chunk in iter(partial(process.stderr.read, STDERR_CHUNK_SIZE), b""):
+            tail.append(chunk)
+    
+    reader = threading.Thread(target=_drain, daemon=True)
+    reader.start()
+    
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        reader.join()
+        raise subprocess.TimeoutExpired(cmd, timeout, stderr=b"".join(tail).decode("utf-8", "replace")[-MAX_ERROR_CHARS:])
+    
+    reader.join()
+    process.stderr.close()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, cmd, stderr=b"".join(tail).decode("utf-8", "replace")[-MAX_ERROR_CHARS:]
+        )
+
+
+def render_manim_scene(
+    scene_file: Path,
+    output_dir: Path,
+    scene_data: dict,
+    quality: str = "high",
+    max_retries: int = 2,
+    audio_file: Optional[Path] = None,
+    audio_duration: float = 0.0,
+) -> Path:
+    """
+    Render single Manim scene with retry on error.
+    
+    With audio_file (and its duration) the narration is added by Manim itself
+    via add_sound, so the rendered video needs no separate ffmpeg mux.
+    """
+    flag = QUALITY_FLAGS.get(quality, "-qh")
+    quality_dir = QUALITY_DIRS.get(quality, "1080p60")
     
     scene_id = scene_file.stem.replace("scene_", "")
     scene_class = f"Scene{scene_id}"
+    render_file = scene_file
+    audio_digest = None
     
-    for attempt in range(max_retries + 1):
-        logger.info(f"Scene {scene_id}: Rendering Manim ({quality}) - attempt {attempt + 1}...", extra={'progress': True})
-        
+    if audio_file:
+        # Rendered from a sibling file so the scene code itself stays untouched
+        render_file = scene_file.with_name(f"{scene_file.stem}_narrated.py")
+        audio_digest = hashlib.sha256(audio_file.read_bytes()).hexdigest()
+    
+    rendered_video = output_dir / "videos" / render_file.stem / quality_dir / f"{scene_file.stem}.mp4"
+    
+    # Identical scene code (and narration) at the same quality renders to the same video
+    cache_key = artifact_key("manim", scene_file.read_text(encoding="utf-8"), flag, audio_digest, audio_duration)
+    if fetch_artifact(cache_key, rendered_video):
+        logger.info(f"Scene {scene_id}: Reused cached render ✓", extra={'progress': True})
+        return rendered_video
+    
+    def _manim(file: Path, cls: str, render_flag: str):
+        # Manim's partial movie cache stays on: a retry after an LLM fix only
+        # re-renders the animations that changed
         cmd = [
-            "manim", flag, str(scene_file), scene_class,
+            "manim", render_flag, str(file), cls,
             "-o", f"{scene_file.stem}.mp4",
             "--media_dir", str(output_dir),
-            "--disable_caching"
         ]
-        
+        with _MANIM_SLOTS:
+            run_with_stderr_tail(cmd, timeout=300, env=MANIM_ENV)
+    
+    fixed = False
+    for attempt in range(max_retries + 1):
         try:
-            process = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=300)
-            rendered_video = output_dir / "videos" / scene_file.stem / quality_dir / f"{scene_file.stem}.mp4"
+            if fixed and flag != DRAFT_QUALITY_FLAG:
+                # LLM-fixed code is checked with a cheap draft render before
+                # paying for the full-quality one
+                logger.info(f"Scene {scene_id}: Checking fix with a draft render - attempt {attempt + 1}...", extra={'progress': True})
+                _manim(scene_file, scene_class, DRAFT_QUALITY_FLAG)
+            
+            logger.info(f"Scene {scene_id}: Rendering Manim ({quality}) - attempt {attempt + 1}...", extra={'progress': True})
+            
+            if audio_file:
+                render_file.write_text(
+                    scene_file.read_text(encoding="utf-8") + NARRATED_SCENE.format(
+                        scene_class=scene_class,
+                        audio_path=str(audio_file.absolute()),
+                        audio_duration=audio_duration,
+                    ),
+                    encoding="utf-8",
+                )
+            
+            clear_destination(rendered_video)
+            _manim(render_file, f"{scene_class}Narrated" if audio_file else scene_class, flag)
             
             if not rendered_video.exists():
                 raise FileNotFoundError(f"Rendered video not found: {rendered_video}")
             
+            store_artifact(cache_key, rendered_video)
             logger.info(f"Scene {scene_id}: Rendered ✓", extra={'progress': True})
             return rendered_video
             
         except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-            runtime_error = e.stderr if hasattr(e, 'stderr') else str(e)
-            logger.warning(f"Scene {scene_id}: Render failed - {runtime_error[:200]}...", extra={'progress': True})
+            runtime_error = e.stderr or str(e)
+            logger.warning(f"Scene {scene_id}: Render failed - ...{runtime_error[-200:]}", extra={'progress': True})
             
             if attempt < max_retries:
                 # Fix with LLM
@@ -137,18 +267,22 @@ def render_manim_scene(scene_file: Path, output_dir: Path, scene_data: dict, qua
                 )
                 # Overwrite the scene file with fixed code
                 scene_file.write_text(fixed_code, encoding="utf-8")
+                fixed = True
                 logger.info(f"Scene {scene_id}: Code fixed, retrying render...", extra={'progress': True})
             else:
-                raise RuntimeError(f"Manim render failed after {max_retries} retries: {runtime_error[:200]}")
+                raise RuntimeError(f"Manim render failed after {max_retries} retries: {runtime_error[-200:]}")
 
 
-def combine_video_audio(video_path: Path, audio_path: Path, output_path: Path):
+def start_combine_video_audio(video_path: Path, audio_path: Path, output_path: Path) -> subprocess.Popen:
     """
-    Combine video with audio using ffmpeg.
+    Start combining video with audio using ffmpeg, without waiting for it.
     
     Duration handling:
     - Audio > Video: Freeze last video frame until audio completes
     - Video > Audio: Pad audio with silence to match video length
+    
+    Returns:
+        The running ffmpeg process; pass it to wait_combine_video_audio
     """
     video_duration = get_duration(video_path)
     audio_duration = get_duration(audio_path)
@@ -162,7 +296,7 @@ def combine_video_audio(video_path: Path, audio_path: Path, output_path: Path):
         # Fallback if duration detection fails
         logger.warning("Could not determine durations, using basic combine")
         cmd = [
-            "ffmpeg",
+            "ffmpeg", "-v", "error",
             "-i", str(video_path),
             "-i", str(audio_path),
             "-c:v", "copy",
@@ -174,7 +308,7 @@ def combine_video_audio(video_path: Path, audio_path: Path, output_path: Path):
     else:
         # Smart duration matching
         cmd = [
-            "ffmpeg",
+            "ffmpeg", "-v", "error",
             "-i", str(video_path),
             "-i", str(audio_path),
             "-filter_complex",
@@ -192,38 +326,66 @@ def combine_video_audio(video_path: Path, audio_path: Path, output_path: Path):
             str(output_path)
         ]
     
+    # -v error keeps stderr small enough that the pipe never fills while
+    # nobody is reading it
+    return subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+
+def wait_combine_video_audio(process: subprocess.Popen, output_path: Path, timeout: float = 180):
+    """Wait for a combine started by start_combine_video_audio and check its result."""
     try:
-        subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=180)
-        result_duration = get_duration(output_path)
-        logger.info(f"Combined video duration: {result_duration:.1f}s")
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"FFmpeg audio combine failed: {e.stderr[:300]}")
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise RuntimeError(f"FFmpeg audio combine timed out after {timeout}s")
+    
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg audio combine failed: {stderr[:300]}")
+    
+    result_duration = get_duration(output_path)
+    logger.info(f"Combined video duration: {result_duration:.1f}s")
+
+
+def combine_video_audio(video_path: Path, audio_path: Path, output_path: Path):
+    """Combine video with audio using ffmpeg (see start_combine_video_audio)."""
+    wait_combine_video_audio(start_combine_video_audio(video_path, audio_path, output_path), output_path)
 
 
 def concatenate_videos(video_paths: list[Path], output_path: Path):
     """Concatenate multiple videos."""
+    # The output may be hard-linked to a scene video (and so to a render
+    # cache entry); detach it before ffmpeg rewrites it in place
+    clear_destination(output_path)
+    
     if len(video_paths) == 1:
-        import shutil
-        shutil.copy(video_paths[0], output_path)
+        # Nothing to join: link the scene video instead of copying its bytes
+        try:
+            os.link(video_paths[0], output_path)
+        except OSError:
+            import shutil
+            shutil.copyfile(video_paths[0], output_path)
         return
     
-    concat_file = output_path.parent / "concat_list.txt"
-    
-    with open(concat_file, "w") as f:
-        for vp in video_paths:
-            f.write(f"file '{vp.absolute()}'\n")
-    
-    cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", str(concat_file), "-c", "copy", "-y", str(output_path)]
+    # The concat list is piped over stdin rather than written to a temp file
+    concat_list = "".join(f"file '{vp.absolute()}'\n" for vp in video_paths)
+    cmd = [
+        "ffmpeg", "-f", "concat", "-safe", "0", "-protocol_whitelist", "pipe,file",
+        "-i", "-", "-c", "copy", "-y", str(output_path)
+    ]
     
     try:
-        subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=120)
-        concat_file.unlink()
+        subprocess.run(cmd, input=concat_list, capture_output=True, text=True, check=True, timeout=120)
     except Exception as e:
-        concat_file.unlink(missing_ok=True)
         raise RuntimeError(f"Concatenation failed: {str(e)[:200]}")
 
 
-def render_doctor_video(video_id: str, scenes_data: dict, quality: str = "high") -> Path:
+def render_doctor_video(
+    video_id: str,
+    scenes_data: dict,
+    quality: str = "high",
+    progress_cb: Optional[Callable[[dict], None]] = None,
+) -> Path:
     """
     Complete doctor ad rendering: All scenes as Manim + Audio.
     
@@ -231,6 +393,8 @@ def render_doctor_video(video_id: str, scenes_data: dict, quality: str = "high")
         video_id: Video ID
         scenes_data: Full scenes data (with pexels_image_path injected if applicable)
         quality: Manim quality
+        progress_cb: Called as each scene finishes with {"scene_id", "current", "total"};
+            an exception it raises aborts the render
     
     Returns:
         Path to final video
@@ -244,46 +408,102 @@ def render_doctor_video(video_id: str, scenes_data: dict, quality: str = "high")
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Load scene data
-    scenes = sorted(scenes_data.get("scenes", []), key=lambda s: s["scene_id"])
+    scenes = sorted(scenes_data.get("scenes", []), key=itemgetter("scene_id"))
     
     stage_logger.progress(f"Rendering {len(scenes)} Manim scenes...")
     
-    final_videos = []
+    rendered = {}
+    pending_muxes: list[tuple[subprocess.Popen, Path, int]] = []
     failed_scenes = []
     completed = 0
     
-    for scene in scenes:
+    def _render_one(scene: dict) -> tuple[Path, Optional[subprocess.Popen]]:
+        """
+        Render one scene with its narration.
+        
+        Manim embeds the narration itself when its duration is known. Otherwise
+        the silent render is muxed with ffmpeg in the background so this worker
+        can move on; returns the scene's final video and the mux process, if any.
+        """
         scene_id = scene["scene_id"]
+        scene_file = manim_scenes_dir / f"scene_{scene_id}.py"
         audio_file = audio_scenes_dir / f"scene_{scene_id}.wav"
         
+        # Each scene gets its own media dir: scenes render in parallel and
+        # Manim's Tex/ cache would otherwise race on identical MathTex files
+        media_dir = MANIM_DIR / video_id / "media" / f"scene_{scene_id}"
+        
+        if not audio_file.exists():
+            logger.warning(f"Scene {scene_id}: No audio, using silent", extra={'progress': True})
+            return render_manim_scene(scene_file, media_dir, scene, quality), None
+        
+        audio_duration = get_duration(audio_file)
+        if audio_duration > 0:
+            rendered_video = render_manim_scene(
+                scene_file, media_dir, scene, quality,
+                audio_file=audio_file, audio_duration=audio_duration,
+            )
+            logger.info(f"Scene {scene_id}: Manim + audio ✓", extra={'progress': True})
+            return rendered_video, None
+        
+        # Fallback: combine with audio
+        rendered_video = render_manim_scene(scene_file, media_dir, scene, quality)
+        final_video = output_dir / f"scene_{scene_id}_final.mp4"
+        return final_video, start_combine_video_audio(rendered_video, audio_file, final_video)
+    
+    to_render = []
+    for scene in scenes:
+        scene_id = scene["scene_id"]
+        if not (manim_scenes_dir / f"scene_{scene_id}.py").exists():
+            logger.warning(f"Scene {scene_id}: Manim file missing", extra={'progress': True})
+            failed_scenes.append({"scene_id": scene_id, "reason": "File missing"})
+        else:
+            to_render.append(scene)
+    
+    if to_render:
+        executor = ThreadPoolExecutor(max_workers=min(MAX_RENDER_WORKERS, len(to_render)))
         try:
-            # Render Manim scene (all scenes are now Manim)
-            scene_file = manim_scenes_dir / f"scene_{scene_id}.py"
-            
-            if not scene_file.exists():
-                logger.warning(f"Scene {scene_id}: Manim file missing", extra={'progress': True})
-                failed_scenes.append({"scene_id": scene_id, "reason": "File missing"})
-                continue
+            futures = {executor.submit(_render_one, scene): scene["scene_id"] for scene in to_render}
             
-            rendered_video = render_manim_scene(scene_file, MANIM_DIR / video_id, scene, quality)
+            for i, future in enumerate(as_completed(futures)):
+                scene_id = futures[future]
+                if progress_cb:
+                    progress_cb({"scene_id": scene_id, "current": i + 1, "total": len(scenes)})
+                
+                try:
+                    final_video, mux = future.result()
+                except Exception as e:
+                    logger.error(f"Scene {scene_id}: Failed - {str(e)[:150]}", extra={'progress': True})
+                    failed_scenes.append({"scene_id": scene_id, "reason": str(e)[:200]})
+                    continue
+                
+                if mux:
+                    pending_muxes.append((mux, final_video, scene_id))
+                else:
+                    rendered[scene_id] = final_video
+                    completed += 1
+                    stage_logger.progress(f"Scene {scene_id}: Complete ({completed}/{len(scenes)})")
+        finally:
+            # An aborted render (progress_cb raised) drops the scenes not yet started
+            executor.shutdown(wait=True, cancel_futures=True)
             
-            # Combine with audio
-            if audio_file.exists():
-                final_video = output_dir / f"scene_{scene_id}_final.mp4"
-                combine_video_audio(rendered_video, audio_file, final_video)
-                final_videos.append(final_video)
+            # Muxes overlapped with the renders; collect them now
+            for mux, final_video, scene_id in pending_muxes:
+                try:
+                    wait_combine_video_audio(mux, final_video)
+                except Exception as e:
+                    logger.error(f"Scene {scene_id}: Failed - {str(e)[:150]}", extra={'progress': True})
+                    failed_scenes.append({"scene_id": scene_id, "reason": str(e)[:200]})
+                    continue
+                
+                rendered[scene_id] = final_video
+                completed += 1
                 logger.info(f"Scene {scene_id}: Manim + audio ✓", extra={'progress': True})
-            else:
-                logger.warning(f"Scene {scene_id}: No audio, using silent", extra={'progress': True})
-                final_videos.append(rendered_video)
-            
-            completed += 1
-            stage_logger.progress(f"Scene {scene_id}: Complete ({completed}/{len(scenes)})")
-            
-        except Exception as e:
-            logger.error(f"Scene {scene_id}: Failed - {str(e)[:150]}", extra={'progress': True})
-            failed_scenes.append({"scene_id": scene_id, "reason": str(e)[:200]})
-            continue
+                stage_logger.progress(f"Scene {scene_id}: Complete ({completed}/{len(scenes)})")
+    
+    # Concatenation follows scene order, not completion order
+    final_videos = [rendered[sid] for sid in sorted(rendered)]
+    failed_scenes.sort(key=itemgetter("scene_id"))
     
     if not final_videos:
         stage_logger.error("All scenes failed")
@@ -302,7 +522,7 @@ def render_doctor_video(video_id: str, scenes_data: dict, quality: str = "high")
         "successful_scenes": len(final_videos),
         "failed_scenes": failed_scenes
     }
-    (output_dir / "render_report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    (output_dir / "render_report.json").write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
     
     if failed_scenes:
         stage_logger.complete(f"{len(final_videos)}/{len(scenes)} OK, {len(failed_scenes)} failed")
@@ -3,6 +3,8 @@ Pharma video generation pipeline with logging, timing,
 and company asset upload support.
 """
 import json
+import re
+import asyncio
 from pathlib import Path
 import time
 import os
@@ -39,12 +41,13 @@ import io
 # Logging setup
 from app.utils.logging_config import setup_logging, StageLogger
 from app.utils.video_utils import convert_to_portrait_9_16
+from app.utils.manim_warmup import warm_manim_caches
 
 # from app.utils.video_utils import convert_to_portrait_9_16
 # from app.utils.video_utils import convert_to_portrait_9_16
 
-from app.chat.routes import router as chat_router
-from app.creator_mode import handle_creator_websocket
+from app.chat.routes import router as chat_router, migrate_legacy_vectors
+from app.creator_mode import handle_creator_websocket, io_pool
 setup_logging(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -86,14 +89,91 @@ app.add_middleware(
 
 VIDEOS_DIR = OUTPUTS_DIR / "videos"
 
+# Served videos are read in 1 MiB chunks instead of Starlette's 64 KiB
+VIDEO_CHUNK_SIZE = 1 << 20
+
+# Final video names, in lookup order
+FINAL_VIDEO_NAMES = ("final.mp4", "final_moa.mp4", "final_doctor.mp4", "final_sm.mp4")
+
+# A player issues many Range requests per video; its resolved path and stat
+# are reused for this many seconds instead of probing the disk each time
+VIDEO_STAT_TTL = 5.0
+MAX_RESOLVED_VIDEOS = 1024
+_resolved_videos: dict[str, tuple[float, Path, os.stat_result]] = {}
+
+
+def _resolve_video(video_id: str) -> Optional[tuple[Path, os.stat_result]]:
+    """Find a video's final file and stat it, reusing a recent result."""
+    now = time.monotonic()
+    cached = _resolved_videos.get(video_id)
+    if cached and now - cached[0] < VIDEO_STAT_TTL:
+        return cached[1], cached[2]
+    
+    for filename in FINAL_VIDEO_NAMES:
+        video_path = VIDEOS_DIR / video_id / filename
+        try:
+            stat_result = video_path.stat()
+        except OSError:
+            continue
+        
+        if len(_resolved_videos) >= MAX_RESOLVED_VIDEOS:
+            _resolved_videos.clear()
+        _resolved_videos[video_id] = (now, video_path, stat_result)
+        return video_path, stat_result
+    
+    # Misses aren't cached: the video may still be rendering
+    _resolved_videos.pop(video_id, None)
+    return None
+
+
+# The first bytes of a requested range are prefetched into the page cache
+# (posix_fadvise WILLNEED) so the response's first read doesn't wait on disk
+VIDEO_PREFETCH_BYTES = 8 << 20
+_BYTE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def _prefetch_video_range(video_path: Path, size: int, range_header: Optional[str]):
+    """Start kernel readahead for the (first) requested byte range."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    
+    match = _BYTE_RANGE.match(range_header or "")
+    if match and not match.group(1) and match.group(2):
+        # Suffix range: the last N bytes
+        start = max(0, size - int(match.group(2)))
+        end = size
+    else:
+        start = int(match.group(1)) if match and match.group(1) else 0
+        end = int(match.group(2)) + 1 if match and match.group(2) else size
+    
+    length = min(end - start, VIDEO_PREFETCH_BYTES)
+    if length <= 0:
+        return
+    
+    try:
+        fd = os.open(video_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, start, length, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
 from fastapi.staticfiles import StaticFiles
 app.mount("/outputs", StaticFiles(directory=OUTPUTS_DIR), name="outputs")
 
 @app.on_event("startup")
 async def startup_event():
+    # Default executor for run_in_executor(None, ...) honours THREAD_POOL_SIZE
+    asyncio.get_running_loop().set_default_executor(io_pool)
+    # Build the system fontconfig/LaTeX caches in the background before the first render
+    asyncio.get_running_loop().run_in_executor(None, warm_manim_caches)
     try:
         await db.init_db()
         logger.info("Database initialized")
+        # Fold pre-shared per-user vector collections into the shared one
+        # before serving, so no upload or RAG query races the migration
+        await migrate_legacy_vectors()
     except Exception as e:
         logger.warning(f"DB init failed: {e}")
 
@@ -457,12 +537,10 @@ async def create_video(
     
     # DB setup
     try:
-        uid = await db.ensure_user(user_id)
-        session_id = await db.create_session(
-            uid, video_id, status="processing", 
+        await db.bootstrap_session(
+            user_id, video_id, status="processing", 
             metadata={"topic": topic, "video_type": video_type}
         )
-        await db.create_video_record(video_id, session_id, path=None, state="processing")
     except Exception as e:
         logger.warning(f"DB record creation failed: {e}")
 
@@ -670,7 +748,7 @@ async def create_doctor_video(
     images: Union[List[UploadFile], List[str], None] = File(None),  # ✅ Accept strings
 ):
     from app.doctor_ad_stages.stage1_doctor_scenes import generate_doctor_scenes
-    from app.doctor_ad_stages.stage2_doctor_manim import run_stage2_doctor
+    from app.doctor_ad_stages.stage2_doctor_manim import arun_stage2_doctor
     from app.doctor_ad_stages.stage3_pexels_fetch import run_stage3_pexels
     from app.doctor_ad_stages.stage5_doctor_render import render_doctor_video
 
@@ -703,16 +781,14 @@ async def create_doctor_video(
     logger.info(f"Doctor ad: {len(valid_docs)} docs, logo: {valid_logo is not None}, {len(valid_images)} images")
 
     try:
-        uid = await db.ensure_user(user_id)
-        session_id = await db.create_session(
-            uid, video_id, status="processing",
+        await db.bootstrap_session(
+            user_id, video_id, status="processing",
             metadata={
                 "drug_name": drug_name,
                 "indication": indication,
                 "video_type": "doctor_ad",
             }
         )
-        await db.create_video_record(video_id, session_id, path=None, state="processing")
     except Exception as e:
         logger.warning(f"DB record creation failed: {e}")
 
@@ -788,7 +864,7 @@ async def create_doctor_video(
     )
     stage_logger.complete(f"{len(script)} scripts generated")
 
-    run_stage2_doctor(scenes_data, script, video_id, max_workers=3)
+    await arun_stage2_doctor(scenes_data, script, video_id)
     scene_ids = [s["scene_id"] for s in scenes]
     tts_generate(script=script, video_id=video_id, scene_ids=scene_ids, max_workers=5)
     final_path = render_doctor_video(video_id, scenes_data, quality=quality)
@@ -825,7 +901,7 @@ async def create_sm_video(
     """
     from app.social_media.stage1_sm_scenes import generate_sm_scenes
     from app.social_media.stage2_sm_manim import run_stage2_sm
-    from app.social_media.stage3_sm_pexels_fetch import run_stage3_sm_pexels
+    from app.social_media.stage3_sm_pexels_fetch import arun_stage3_sm_pexels
     from app.social_media.stage5_sm_render import render_sm_video
     
     pipeline_start = time.time()
@@ -839,16 +915,14 @@ async def create_sm_video(
     try:
         # DB tracking
         try:
-            uid = await db.ensure_user(user_id)
-            session_id = await db.create_session(
-                uid, video_id, status="processing",
+            await db.bootstrap_session(
+                user_id, video_id, status="processing",
                 metadata={
                     "drug_name": drug_name,
                     "indication": indication,
                     "video_type": "social_media"
                 }
             )
-            await db.create_video_record(video_id, session_id, path=None, state="processing")
         except Exception as e:
             logger.warning(f"DB record creation failed: {e}")
         
@@ -870,7 +944,7 @@ async def create_sm_video(
             raise HTTPException(500, "No scenes generated")
         
         # Stage 3: Fetch Pexels media
-        pexels_media = run_stage3_sm_pexels(scenes_data, video_id)
+        pexels_media = await arun_stage3_sm_pexels(scenes_data, video_id)
 
         # Inject Pexels media paths into scenes
         for scene in scenes:
@@ -958,12 +1032,10 @@ async def create_sm_remotion_video(
 
     # DB setup
     try:
-        uid = await db.ensure_user(user_id)
-        session_id = await db.create_session(
-            uid, video_id, status="processing",
+        await db.bootstrap_session(
+            user_id, video_id, status="processing",
             metadata={"topic": topic, "video_type": "social_media_remotion"}
         )
-        await db.create_video_record(video_id, session_id, path=None, state="processing")
     except Exception as e:
         logger.warning(f"DB record creation failed: {e}")
 
@@ -1109,11 +1181,18 @@ async def create_sm_remotion_video(
 @app.get("/video/{video_id}")
 async def get_video(video_id: str, request: Request):
     """Stream final video with range request support."""
-    for filename in ["final.mp4", "final_moa.mp4", "final_doctor.mp4", "final_sm.mp4"]:
-        video_path = VIDEOS_DIR / video_id / filename
-        if video_path.exists():
-            return FileResponse(video_path, media_type="video/mp4")
-    raise HTTPException(404, "Video not found")
+    resolved = _resolve_video(video_id)
+    if not resolved:
+        raise HTTPException(404, "Video not found")
+    
+    # FileResponse answers Range requests itself; the stat is passed in so it
+    # doesn't stat the file again
+    video_path, stat_result = resolved
+    _prefetch_video_range(video_path, stat_result.st_size, request.headers.get("range"))
+    
+    response = FileResponse(video_path, media_type="video/mp4", stat_result=stat_result)
+    response.chunk_size = VIDEO_CHUNK_SIZE
+    return response
 
 
 @app.get("/generate-user-id")
@@ -2,12 +2,13 @@
 Stage 2 MoA: Generate Manim animation code for each scene.
 OPTIMIZED with parallel processing and detailed logging.
 """
-import json
+import orjson
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from app.utils.llm import call_llm
+from app.utils.manim_prompt import build_manim_prompt
 from app.utils.json_safe import extract_json
-from app.paths import PROMPTS_DIR, OUTPUTS_DIR
+from app.paths import OUTPUTS_DIR
 from app.utils.logging_config import StageLogger
 
 import logging
@@ -23,53 +24,48 @@ except ImportError:
     validate_manim_code = None
 
 
-def generate_manim_scene(scene: dict, retry_count: int = 0, max_retries: int = 2) -> tuple[int, str]:
+def generate_manim_scene(scene: dict, narration: str = "", retry_count: int = 0, max_retries: int = 2) -> tuple[int, str]:
     """Generate Manim code for a single scene with validation."""
-    prompt_path = PROMPTS_DIR / "manim_generator.txt"
-    prompt_template = prompt_path.read_text(encoding="utf-8")
-    
     scene_id = scene.get("scene_id", 1)
     duration = scene.get("duration_sec", 10)
     visual_elements = scene.get("visual_elements", [])
     
-    retry_context = ""
-    if retry_count > 0:
-        retry_context = f"\n\nIMPORTANT: Retry #{retry_count}. Fix: imports, no FRAME_WIDTH, no SVGMobject path_string, class=Scene{scene_id}\n"
-    
-    prompt = prompt_template.replace("{scene_json}", json.dumps(scene, indent=2)) \
-                           .replace("{duration}", str(duration)) \
-                           .replace("{visual_elements}", ", ".join(visual_elements)) \
-                           .replace("{scene_id}", str(scene_id)) + retry_context
-    
-    logger.info(f"Scene {scene_id}: Generating code (attempt {retry_count + 1})", extra={'progress': True})
+    system, base_prompt = build_manim_prompt({**scene, "narration": narration}, scene_id, duration, ", ".join(visual_elements))
     
-    output = call_llm(prompt, temperature=0.3 if retry_count > 0 else 0)
-    result = extract_json(output)
-    
-    manim_code = result.get("manim_code", "")
-    if not manim_code:
-        raise ValueError(f"No code returned for scene {scene_id}")
-    
-    # Validate
-    if validate_manim_code:
+    for attempt in range(retry_count, max_retries + 1):
+        prompt = base_prompt
+        if attempt > 0:
+            prompt += f"\n\nIMPORTANT: Retry #{attempt}. Fix: imports, no FRAME_WIDTH, no SVGMobject path_string, class=Scene{scene_id}\n"
+        
+        logger.info(f"Scene {scene_id}: Generating code (attempt {attempt + 1})", extra={'progress': True})
+        
+        output = call_llm(prompt, temperature=0.3 if attempt > 0 else 0, system=system)
+        result = extract_json(output)
+        
+        manim_code = result.get("manim_code", "")
+        if not manim_code:
+            raise ValueError(f"No code returned for scene {scene_id}")
+        
+        # Validate
+        if not validate_manim_code:
+            break
+        
         is_valid, error_msg = validate_manim_code(manim_code, scene_id)
+        if is_valid:
+            break
+        
+        logger.warning(f"Scene {scene_id}: Validation failed - {error_msg[:80]}", extra={'progress': True})
         
-        if not is_valid:
-            logger.warning(f"Scene {scene_id}: Validation failed - {error_msg[:80]}", extra={'progress': True})
+        if attempt == max_retries:
+            logger.warning(f"Scene {scene_id}: Auto-fixing...", extra={'progress': True})
+            fixed_code = auto_fix_common_issues(manim_code, scene_id)
+            
+            is_fixed_valid, _ = validate_manim_code(fixed_code, scene_id)
+            if is_fixed_valid:
+                logger.info(f"Scene {scene_id}: Auto-fix OK ✓", extra={'progress': True})
+                return (scene_id, fixed_code)
             
-            if retry_count < max_retries:
-                return generate_manim_scene(scene, retry_count + 1, max_retries)
-            else:
-                logger.warning(f"Scene {scene_id}: Auto-fixing...", extra={'progress': True})
-                fixed_code = auto_fix_common_issues(manim_code, scene_id)
-                
-                if validate_manim_code:
-                    is_fixed_valid, _ = validate_manim_code(fixed_code, scene_id)
-                    if is_fixed_valid:
-                        logger.info(f"Scene {scene_id}: Auto-fix OK ✓", extra={'progress': True})
-                        return (scene_id, fixed_code)
-                
-                raise ValueError(f"Scene {scene_id} validation failed after retries: {error_msg}")
+            raise ValueError(f"Scene {scene_id} validation failed after retries: {error_msg}")
     
     logger.info(f"Scene {scene_id}: Validated ✓", extra={'progress': True})
     return (scene_id, manim_code)
@@ -122,8 +118,6 @@ def run_stage2_moa(scenes_data: dict, script: list[dict], video_id: str, max_wor
     manim_scenes_dir.mkdir(parents=True, exist_ok=True)
     
     script_map = {s["scene_id"]: s["script"] for s in script}
-    for scene in scenes:
-        scene["narration"] = script_map.get(scene["scene_id"], "")
     
     stage_logger.progress(f"Generating {len(scenes)} scenes in parallel (workers={max_workers})...")
     
@@ -132,7 +126,10 @@ def run_stage2_moa(scenes_data: dict, script: list[dict], video_id: str, max_wor
     completed = 0
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_scene = {executor.submit(generate_manim_scene, scene): scene for scene in scenes}
+        future_to_scene = {
+            executor.submit(generate_manim_scene, scene, script_map.get(scene["scene_id"], "")): scene
+            for scene in scenes
+        }
         
         for future in as_completed(future_to_scene):
             scene = future_to_scene[future]
@@ -158,7 +155,7 @@ def run_stage2_moa(scenes_data: dict, script: list[dict], video_id: str, max_wor
         "failed_scenes": failed_scenes,
         "scenes_data": scenes_data
     }
-    (manim_scenes_dir / "scenes_data.json").write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    (manim_scenes_dir / "scenes_data.json").write_bytes(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
     
     if not scene_files:
         stage_logger.error(f"All {len(scenes)} scenes failed")
@@ -2,11 +2,16 @@
 Stage 5 MoA: Render Manim animations and combine with TTS audio.
 OPTIMIZED with detailed logging and progress tracking.
 """
+import os
 import subprocess
 import json
+import orjson
+from operator import itemgetter
 from pathlib import Path
+from typing import Callable, Optional
 from app.paths import OUTPUTS_DIR
 from app.utils.logging_config import StageLogger
+from app.utils.artifact_cache import artifact_key, fetch_artifact, store_artifact, clear_destination
 
 import logging
 logger = logging.getLogger(__name__)
@@ -15,14 +20,15 @@ MANIM_DIR = OUTPUTS_DIR / "manim"
 VIDEOS_DIR = OUTPUTS_DIR / "videos"
 AUDIO_DIR = OUTPUTS_DIR / "audio"
 
+# Manim quality flag per quality name, and the output subdirectory it renders into
+QUALITY_FLAGS = {"low": "-ql", "medium": "-qm", "high": "-qh", "production": "-qk"}
+QUALITY_DIRS = {"low": "480p15", "medium": "720p30", "high": "1080p60", "production": "2160p60"}
+
 
 def render_manim_scene(scene_file: Path, output_dir: Path, quality: str = "high") -> Path:
     """Render a single Manim scene to video."""
-    quality_flags = {"low": "-ql", "medium": "-qm", "high": "-qh", "production": "-qk"}
-    quality_dirs = {"low": "480p15", "medium": "720p30", "high": "1080p60", "production": "2160p60"}
-    
-    flag = quality_flags.get(quality, "-qh")
-    quality_dir = quality_dirs.get(quality, "1080p60")
+    flag = QUALITY_FLAGS.get(quality, "-qh")
+    quality_dir = QUALITY_DIRS.get(quality, "1080p60")
     
     scene_id = scene_file.stem.replace("scene_", "")
     scene_class = f"Scene{scene_id}"
@@ -34,16 +40,24 @@ def render_manim_scene(scene_file: Path, output_dir: Path, quality: str = "high"
         "--disable_caching"
     ]
     
+    rendered_video = output_dir / "videos" / scene_file.stem / quality_dir / f"{scene_file.stem}.mp4"
+    
+    # Identical scene code at the same quality renders to the same video
+    cache_key = artifact_key("manim", scene_file.read_text(encoding="utf-8"), flag)
+    if fetch_artifact(cache_key, rendered_video):
+        logger.info(f"Scene {scene_id}: Reused cached render ✓", extra={'progress': True})
+        return rendered_video
+    
     logger.info(f"Scene {scene_id}: Rendering with Manim ({quality})...", extra={'progress': True})
     
     try:
+        clear_destination(rendered_video)
         result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=300)
         
-        rendered_video = output_dir / "videos" / scene_file.stem / quality_dir / f"{scene_file.stem}.mp4"
-        
         if not rendered_video.exists():
             raise FileNotFoundError(f"Rendered video not found: {rendered_video}")
         
+        store_artifact(cache_key, rendered_video)
         logger.info(f"Scene {scene_id}: Rendered ✓", extra={'progress': True})
         return rendered_video
         
@@ -74,29 +88,43 @@ def concatenate_videos(video_paths: list[Path], output_path: Path):
     if not video_paths:
         raise ValueError("No videos to concatenate")
     
+    # The output may be hard-linked to a scene video (and so to a render
+    # cache entry); detach it before ffmpeg rewrites it in place
+    clear_destination(output_path)
+    
     if len(video_paths) == 1:
-        import shutil
-        shutil.copy(video_paths[0], output_path)
+        # Nothing to join: link the scene video instead of copying its bytes
+        try:
+            os.link(video_paths[0], output_path)
+        except OSError:
+            import shutil
+            shutil.copyfile(video_paths[0], output_path)
         return
     
-    concat_file = output_path.parent / "concat_list.txt"
-    
-    with open(concat_file, "w") as f:
-        for vp in video_paths:
-            f.write(f"file '{vp.absolute()}'\n")
-    
-    cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", str(concat_file), "-c", "copy", "-y", str(output_path)]
+    # The concat list is piped over stdin rather than written to a temp file
+    concat_list = "".join(f"file '{vp.absolute()}'\n" for vp in video_paths)
+    cmd = [
+        "ffmpeg", "-f", "concat", "-safe", "0", "-protocol_whitelist", "pipe,file",
+        "-i", "-", "-c", "copy", "-y", str(output_path)
+    ]
     
     try:
-        subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=120)
-        concat_file.unlink()
+        subprocess.run(cmd, input=concat_list, capture_output=True, text=True, check=True, timeout=120)
     except Exception as e:
-        concat_file.unlink(missing_ok=True)
         raise RuntimeError(f"Concatenation failed: {str(e)[:200]}")
 
 
-def render_moa_video(video_id: str, quality: str = "high") -> Path:
-    """Complete MoA video rendering pipeline with progress tracking."""
+def render_moa_video(
+    video_id: str,
+    quality: str = "high",
+    progress_cb: Optional[Callable[[dict], None]] = None,
+) -> Path:
+    """
+    Complete MoA video rendering pipeline with progress tracking.
+    
+    progress_cb, if given, is called before each scene with
+    {"scene_id", "current", "total"}; an exception it raises aborts the render.
+    """
     stage_logger = StageLogger("Manim Rendering")
     stage_logger.start()
     
@@ -112,7 +140,7 @@ def render_moa_video(video_id: str, quality: str = "high") -> Path:
     
     metadata = json.loads(scenes_data_file.read_text())
     scenes_data = metadata.get("scenes_data", metadata)
-    scenes = sorted(scenes_data.get("scenes", []), key=lambda s: s["scene_id"])
+    scenes = sorted(scenes_data.get("scenes", []), key=itemgetter("scene_id"))
     
     stage_logger.progress(f"Rendering {len(scenes)} scenes with quality={quality}...")
     
@@ -120,8 +148,10 @@ def render_moa_video(video_id: str, quality: str = "high") -> Path:
     failed_renders = []
     completed = 0
     
-    for scene in scenes:
+    for i, scene in enumerate(scenes):
         scene_id = scene["scene_id"]
+        if progress_cb:
+            progress_cb({"scene_id": scene_id, "current": i + 1, "total": len(scenes)})
         scene_file = manim_scenes_dir / f"scene_{scene_id}.py"
         audio_file = audio_scenes_dir / f"scene_{scene_id}.wav"
         
@@ -183,7 +213,7 @@ def render_moa_video(video_id: str, quality: str = "high") -> Path:
         "failed_scenes": failed_renders,
         "output_path": str(final_output)
     }
-    (output_dir / "render_report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    (output_dir / "render_report.json").write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
     
     if failed_renders:
         stage_logger.complete(f"{len(combined_videos)}/{len(scenes)} scenes OK, {len(failed_renders)} failed")
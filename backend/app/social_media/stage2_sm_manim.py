@@ -8,8 +8,9 @@ from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from app.utils.llm import call_llm
+from app.utils.manim_prompt import MANIM_PROMPT_PATH, build_manim_prompt
 from app.utils.json_safe import extract_json
-from app.paths import PROMPTS_DIR, OUTPUTS_DIR
+from app.paths import OUTPUTS_DIR
 from app.utils.logging_config import StageLogger
 
 import logging
@@ -93,70 +94,66 @@ def generate_manim_scene_sm(scene: dict, retry_count: int = 0, max_retries: int
     logger.info(f"Generating Manim code for scene {scene_id}")
 
     # Load prompt template
-    prompt_path = PROMPTS_DIR / "manim_generator.txt"
-    if not prompt_path.exists():
+    if not MANIM_PROMPT_PATH.exists():
         logger.warning("Manim generator prompt not found → using minimal fallback")
-        template = (
+        system = None
+        prompt = (
             "Create a short 5-12 second Manim animation for social media (Instagram Reels / TikTok).\n"
-            "Scene description: {scene_json}\n"
-            "Scene ID: {scene_id}\n"
+            f"Scene description: {json.dumps(scene, indent=2)}\n"
+            f"Scene ID: {scene_id}\n"
             "Duration: ~10 seconds\n"
             "Use simple, engaging animations with text, shapes, arrows.\n"
             "Return only the complete Python code."
         )
     else:
-        template = prompt_path.read_text(encoding="utf-8")
-
-    prompt = template.replace("{scene_json}", json.dumps(scene, indent=2))
-    prompt = prompt.replace("{scene_id}", str(scene_id))
-    prompt = prompt.replace("{duration}", "10")
-    prompt = prompt.replace("{visual_elements}", "Text, shapes, simple animations")
+        system, prompt = build_manim_prompt(scene, scene_id, 10, "Text, shapes, simple animations")
 
+    # Framing stays in the user message so the system prefix matches the other generators
     full_prompt = f"""You are an expert Manim animation programmer. Generate short, efficient Manim code for vertical social media videos (5-15 seconds max).
 
 {prompt}
 
 Return ONLY the complete, valid Python code (no explanations)."""
 
-    response = call_llm(full_prompt)
+    for attempt in range(retry_count, max_retries + 1):
+        response = call_llm(full_prompt, system=system)
 
-    # Extract code
-    try:
-        code_data = extract_json(response)
-        code = (
-            code_data.get("manim_code")
-            or code_data.get("code")
-            or response
+        # Extract code
+        try:
+            code_data = extract_json(response)
+            code = (
+                code_data.get("manim_code")
+                or code_data.get("code")
+                or response
+            )
+        except Exception:
+            code = response
+
+        code = str(code).strip()
+
+        # Shrink text & scale for portrait
+        original_len = len(code)
+        code = shrink_text_and_scale_for_portrait(code)
+        logger.info(
+            f"Scene {scene_id}: Post-processing applied "
+            f"({original_len} → {len(code)} chars)"
         )
-    except Exception:
-        code = response
 
-    code = str(code).strip()
-
-    # Shrink text & scale for portrait
-    original_len = len(code)
-    code = shrink_text_and_scale_for_portrait(code)
-    logger.info(
-        f"Scene {scene_id}: Post-processing applied "
-        f"({original_len} → {len(code)} chars)"
-    )
-
-    # Validate the adjusted code
-    if validate_manim_code is not None:
+        # Validate the adjusted code
+        if validate_manim_code is None:
+            break
         try:
             is_valid, error_msg = validate_manim_code(code, scene_id)
             if is_valid:
                 logger.info(f"Scene {scene_id}: Syntax valid ✓")
-            else:
-                logger.warning(f"Scene {scene_id}: Syntax error after shrink - {error_msg}")
-                if retry_count < max_retries:
-                    logger.info(f"Retrying scene {scene_id} (attempt {retry_count + 1})...")
-                    return generate_manim_scene_sm(scene, retry_count + 1, max_retries)
+                break
+            logger.warning(f"Scene {scene_id}: Syntax error after shrink - {error_msg}")
         except Exception as e:
             logger.warning(f"Scene {scene_id}: Validation error - {e}")
-            if retry_count < max_retries:
-                logger.info(f"Retrying scene {scene_id} (attempt {retry_count + 1})...")
-                return generate_manim_scene_sm(scene, retry_count + 1, max_retries)
+
+        # The last attempt's code is returned even if it is still invalid
+        if attempt < max_retries:
+            logger.info(f"Retrying scene {scene_id} (attempt {attempt + 1})...")
 
     return scene_id, code
 
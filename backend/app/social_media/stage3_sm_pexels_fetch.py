@@ -1,8 +1,10 @@
 """
 Stage 3 Social Media: Fetch Pexels assets for social media video.
 """
+import asyncio
+import hashlib
 from pathlib import Path
-from app.utils.pexels_client import get_media_for_scene, download_media
+from app.utils.pexels_client import aget_media_for_scene, adownload_scene_media, async_client
 from app.paths import OUTPUTS_DIR
 
 import logging
@@ -10,14 +12,23 @@ logger = logging.getLogger(__name__)
 
 VIDEOS_DIR = OUTPUTS_DIR / "videos"
 
+# Pending Pexels requests cost a socket, not a thread
+MAX_INFLIGHT = 64
 
-def run_stage3_sm_pexels(scenes_data: dict, video_id: str) -> dict:
+
+def run_stage3_sm_pexels(scenes_data: dict, video_id: str, refresh: bool = False) -> dict:
+    """Sync entry point for worker threads; see arun_stage3_sm_pexels."""
+    return asyncio.run(arun_stage3_sm_pexels(scenes_data, video_id, refresh))
+
+
+async def arun_stage3_sm_pexels(scenes_data: dict, video_id: str, refresh: bool = False) -> dict:
     """
-    Fetch Pexels media for each scene.
+    Fetch Pexels media for each scene, all scenes concurrently.
     
     Args:
         scenes_data: Dict with scenes list
         video_id: Video ID
+        refresh: Search Pexels again instead of reusing cached search results
     
     Returns:
         Dict mapping scene_id to media dict with local paths
@@ -30,64 +41,72 @@ def run_stage3_sm_pexels(scenes_data: dict, video_id: str) -> dict:
     media_dir = VIDEOS_DIR / video_id / "pexels"
     media_dir.mkdir(parents=True, exist_ok=True)
 
-    pexels_media = {}
-
+    # One fetch per distinct query; scenes sharing it share the downloaded file
+    groups = {}
     for scene in scenes:
-        scene_id = scene.get("scene_id", 0)
-        # Use per-scene search terms provided by the scene planner
-        search_terms = scene.get("pexels_search_terms") or []
-
-        # Fallback candidates: visual_description, concept
-        if not search_terms:
-            candidates = []
-            if scene.get("visual_description"):
-                candidates.append(scene.get("visual_description"))
-            if scene.get("concept"):
-                candidates.append(scene.get("concept"))
-            # make short human-friendly terms
-            search_terms = [c for c in candidates if c]
+        groups.setdefault(tuple(_search_terms(scene)), []).append(scene.get("scene_id", 0))
+
+    sem = asyncio.Semaphore(MAX_INFLIGHT)
+    async with async_client(MAX_INFLIGHT) as client:
+        results = await asyncio.gather(*[
+            _fetch_media(client, sem, list(terms), scene_ids, media_dir, refresh)
+            for terms, scene_ids in groups.items()
+        ])
+
+    pexels_media = {
+        scene_id: media
+        for scene_ids, media in zip(groups.values(), results)
+        for scene_id in scene_ids
+    }
+
+    logger.info(f"Pexels fetch complete: {len(pexels_media)} scenes")
+    return pexels_media
 
+
+def _search_terms(scene: dict) -> list[str]:
+    """Pexels search terms for a scene."""
+    # Use per-scene search terms provided by the scene planner
+    search_terms = scene.get("pexels_search_terms") or []
+
+    # Fallback candidates: visual_description, concept
+    if not search_terms:
+        candidates = []
+        if scene.get("visual_description"):
+            candidates.append(scene.get("visual_description"))
+        if scene.get("concept"):
+            candidates.append(scene.get("concept"))
+        # make short human-friendly terms
+        search_terms = [c for c in candidates if c]
+
+    return search_terms
+
+
+async def _fetch_media(
+    client,
+    sem: asyncio.Semaphore,
+    search_terms: list[str],
+    scene_ids: list,
+    media_dir: Path,
+    refresh: bool = False,
+) -> dict:
+    """Search and download the media for one query ({} if nothing was found)."""
+    label = ", ".join(f"Scene {i}" for i in scene_ids)
+    # Named by query, not scene, so one file serves every scene that asked for it
+    name = hashlib.sha1("\n".join(search_terms).encode("utf-8")).hexdigest()[:16]
+
+    async with sem:
         try:
-            logger.info(f"Scene {scene_id}: Fetching Pexels media for terms: {search_terms}")
+            logger.info(f"{label}: Fetching Pexels media for terms: {search_terms}")
 
             # Get media from Pexels API (function expects list[str])
-            media = get_media_for_scene(search_terms, prefer_video=False)
+            media = await aget_media_for_scene(client, search_terms, prefer_video=False, refresh=refresh)
 
             if not media or (not media.get("image") and not media.get("video")):
-                logger.warning(f"Scene {scene_id}: No Pexels media found for '{search_terms}'")
-                pexels_media[scene_id] = {}
-                continue
-
-            result = {"image": None, "video": None}
-
-            # Download image (preferred)
-            image = media.get("image")
-            if image and image.get("src"):
-                image_path = media_dir / f"scene_{scene_id}_image.jpg"
-                if download_media(image["src"], image_path):
-                    result["image"] = {
-                        "local_path": str(image_path),
-                        "src": image["src"],
-                        "alt": image.get("alt", "")
-                    }
-                    logger.info(f"Scene {scene_id}: Downloaded image")
-
-            # Download video as fallback
-            video = media.get("video")
-            if video and video.get("src") and not result["image"]:
-                video_path = media_dir / f"scene_{scene_id}_video.mp4"
-                if download_media(video["src"], video_path):
-                    result["video"] = {
-                        "local_path": str(video_path),
-                        "src": video["src"]
-                    }
-                    logger.info(f"Scene {scene_id}: Downloaded video")
-
-            pexels_media[scene_id] = result
+                logger.warning(f"{label}: No Pexels media found for '{search_terms}'")
+                return {}
 
-        except Exception as e:
-            logger.error(f"Scene {scene_id}: Pexels fetch failed - {e}")
-            pexels_media[scene_id] = {}
+            return await adownload_scene_media(client, media, media_dir, name, label)
 
-    logger.info(f"Pexels fetch complete: {len(pexels_media)} scenes")
-    return pexels_media
+        except Exception as e:
+            logger.error(f"{label}: Pexels fetch failed - {e}")
+            return {}
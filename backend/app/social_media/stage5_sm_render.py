@@ -6,11 +6,12 @@ import subprocess
 import time
 import json
 from pathlib import Path
+from typing import Callable, Optional
 from app.paths import OUTPUTS_DIR
 from app.utils.logging_config import StageLogger
 from app.utils.llm import call_llm
 from app.utils.json_safe import extract_json
-from app.paths import PROMPTS_DIR
+from app.utils.manim_prompt import build_runtime_fix_prompt
 import logging
 logger = logging.getLogger(__name__)
 
@@ -39,15 +40,9 @@ def auto_fix_runtime_error_with_llm_sm(
     """
     logger.info(f"🔧 Asking LLM to fix runtime error (attempt {attempt})...", extra={'progress': True})
     
-    # Load runtime fix prompt
-    fix_prompt_path = PROMPTS_DIR / "manim_runtime_fix.txt"
+    fix_prompt = build_runtime_fix_prompt(broken_code, runtime_error, scene_data)
     
-    if fix_prompt_path.exists():
-        fix_template = fix_prompt_path.read_text(encoding="utf-8")
-        fix_prompt = fix_template.replace("{runtime_error}", runtime_error) \
-                                  .replace("{broken_code}", broken_code) \
-                                  .replace("{scene_json}", json.dumps(scene_data, indent=2))
-    else:
+    if fix_prompt is None:
         fix_prompt = f"""Fix this Manim code that has a RUNTIME ERROR.
 Code:
 {broken_code}
@@ -290,35 +285,32 @@ def concatenate_videos_sm(video_paths: list[Path], output_path: Path) -> None:
     
     logger.info(f"Concatenating {len(video_paths)} portrait videos (9:16)...")
     
-    # Create concat file
-    concat_file = output_path.parent / "concat.txt"
-    with open(concat_file, "w") as f:
-        for path in video_paths:
-            if path.exists():
-                f.write(f"file '{path.resolve()}'\n")
+    # Concat list, piped over stdin rather than written to a temp file
+    concat_list = "".join(f"file '{path.resolve()}'\n" for path in video_paths if path.exists())
     
     # FFmpeg concatenate - maintains aspect ratio
     cmd = [
         "ffmpeg", "-f", "concat", "-safe", "0",
-        "-i", str(concat_file),
+        "-protocol_whitelist", "pipe,file",
+        "-i", "-",
         "-c", "copy",  # No re-encoding, preserves original format
         "-y",  # Overwrite
         str(output_path)
     ]
     
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = subprocess.run(cmd, input=concat_list, capture_output=True, text=True)
     
     if result.returncode != 0:
         raise RuntimeError(f"FFmpeg concat failed:\n{result.stderr}")
     
     logger.info(f"Portrait videos concatenated → {output_path}")
-    concat_file.unlink()  # Cleanup
 
 
 def render_sm_video(
     video_id: str,
     scenes_data: dict,
-    quality: str = "high"
+    quality: str = "high",
+    progress_cb: Optional[Callable[[dict], None]] = None,
 ) -> Path:
     """
     Main render function for social media videos in 9:16 portrait format.
@@ -328,6 +320,8 @@ def render_sm_video(
         video_id: Unique identifier for the video project
         scenes_data: Dictionary containing scene information
         quality: Render quality - "low" (480x854), "medium" (720x1280), or "high" (1080x1920)
+        progress_cb: Called before each scene with {"scene_id", "current", "total"};
+            an exception it raises aborts the render
     
     Returns:
         Path to final portrait video (9:16 aspect ratio)
@@ -349,6 +343,8 @@ def render_sm_video(
     # Render each Manim scene and combine with audio
     for i, scene in enumerate(scenes):
         scene_id = scene.get("scene_id", i)
+        if progress_cb:
+            progress_cb({"scene_id": scene_id, "current": i + 1, "total": len(scenes)})
         code_path = manim_code_dir / f"scene_{scene_id}.py"
         
         if not code_path.exists():
@@ -1,4 +1,5 @@
-import json
+import orjson
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
@@ -6,6 +7,12 @@ from app.paths import PROMPTS_DIR, OUTPUTS_DIR
 from app.utils.llm import call_llm
 
 
+@lru_cache(maxsize=1)
+def _load_scene_planner_prompt() -> str:
+    """Read the pharma scene planner prompt once per process."""
+    return (PROMPTS_DIR / "scene_planner_pharma.txt").read_text(encoding="utf-8")
+
+
 def generate_scenes(
     topic: str,
     video_type: str = "product_ad",
@@ -15,8 +22,6 @@ def generate_scenes(
 ) -> dict:
     """Plan pharma video scenes. video_type: brand_ad | patient_awareness | product_ad."""
 
-    prompt_path = PROMPTS_DIR / "scene_planner_pharma.txt"
-
     # Add region context to the prompt if provided
     region_note = ""
     if region:
@@ -24,7 +29,7 @@ def generate_scenes(
                      f"Please generate search terms that would fetch media featuring people " \
                      f"from {region}. Incorporate regional/demographic context naturally."
 
-    prompt = prompt_path.read_text(encoding="utf-8").format(
+    prompt = _load_scene_planner_prompt().format(
         video_type=video_type,
         brand_name=brand_name or "Our Brand",
         topic=topic,
@@ -32,9 +37,9 @@ def generate_scenes(
     ) + region_note
 
     output = call_llm(prompt)
-    data = json.loads(output)
+    data = orjson.loads(output)
 
     OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
-    (OUTPUTS_DIR / "scenes.json").write_text(json.dumps(data, indent=2))
+    (OUTPUTS_DIR / "scenes.json").write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
     return data
@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 
 from app.paths import OUTPUTS_DIR
 from app.utils.logging_config import StageLogger
+from app.utils.artifact_cache import artifact_key, fetch_artifact, store_artifact, clear_destination, prune_cache
 
 import logging
 logger = logging.getLogger(__name__)
@@ -137,6 +138,14 @@ def generate_tts_for_scene(
 
     output_file = output_dir / f"scene_{scene_id}.wav"
 
+    # Audio is deterministic per (voice, text): reuse an identical earlier take
+    voice_name = get_voice_for_language_and_region(language, region)
+    cache_key = artifact_key("tts", voice_name, text)
+    if fetch_artifact(cache_key, output_file):
+        logger.info(f"Scene {scene_id}: Audio reused from cache ✓",
+                    extra={'progress': True})
+        return (scene_id, output_file)
+
     try:
         logger.info(f"Scene {scene_id}: Generating audio ({len(text)} chars)...",
                     extra={'progress': True})
@@ -146,12 +155,12 @@ def generate_tts_for_scene(
             region=azure_region
         )
 
-        # Select voice based on language and region
-        voice_name = get_voice_for_language_and_region(language, region)
+        # Voice selected above from language and region
         speech_config.speech_synthesis_voice_name = voice_name
         
         logger.info(f"Scene {scene_id}: Using voice '{voice_name}'")
 
+        clear_destination(output_file)
         audio_config = speechsdk.audio.AudioOutputConfig(
             filename=str(output_file)
         )
@@ -166,6 +175,7 @@ def generate_tts_for_scene(
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
             logger.info(f"Scene {scene_id}: Audio saved ✓",
                         extra={'progress': True})
+            store_artifact(cache_key, output_file)
             return (scene_id, output_file)
 
         # Handle cancellation
@@ -261,6 +271,8 @@ def tts_generate(
                 f"Scene {scene_id}: Complete ({completed}/{len(scene_ids)})"
             )
 
+    prune_cache()
+
     if failed_scenes:
         stage_logger.complete(
             f"{len(audio_files)}/{len(scene_ids)} OK, {len(failed_scenes)} failed"
@@ -9,6 +9,7 @@ from pathlib import Path
 import logging
 import wave
 import contextlib
+from typing import Callable, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -35,10 +36,11 @@ def get_audio_duration(audio_path: Path) -> float:
         return 0.0
 
 
-def render_remotion(video_id: str) -> Path:
+def render_remotion(video_id: str, progress_cb: Optional[Callable[[dict], None]] = None) -> Path:
     """
     Load scenes_with_media + script + animations, build props, run remotion render.
     Output: outputs/videos/<video_id>/final.mp4
+    progress_cb (optional) is told when the Remotion render itself starts.
     """
     scenes_path = OUTPUTS_DIR / "scenes_with_media.json"
     script_path = OUTPUTS_DIR / "script.json"
@@ -222,6 +224,9 @@ def render_remotion(video_id: str) -> Path:
         "--port=3001",
     ]
 
+    if progress_cb:
+        progress_cb({"message": "Rendering composition", "total": len(props_scenes)})
+
     subprocess.run(
         cmd,
         cwd=REMOTION_DIR,
@@ -0,0 +1,142 @@
+"""
+Content-addressed on-disk cache for render artifacts (WAV, MP4, ...) and
+small generated texts (LLM-written scene code).
+
+Artifacts are stored under OUTPUTS_DIR/cache/<aa>/<sha256> and hard-linked
+into a video's output directory on a hit, so a cached scene costs a
+directory entry rather than a re-render or a copy. Writers must unlink
+their destination before writing (see ``clear_destination``) so that a
+fresh render never truncates a linked cache entry in place.
+"""
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import orjson
+
+from app.paths import OUTPUTS_DIR
+
+import logging
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = OUTPUTS_DIR / "cache"
+
+# Least-recently-used entries are purged beyond this size
+MAX_CACHE_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+
+
+def artifact_key(*parts) -> str:
+    """Hash the inputs that fully determine an artifact."""
+    raw = orjson.dumps(parts, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _entry(key: str) -> Path:
+    return CACHE_DIR / key[:2] / key
+
+
+def _link_or_copy(src: Path, dest: Path):
+    try:
+        os.link(src, dest)
+    except OSError:
+        # Different filesystem (or no hard-link support): fall back to a copy
+        shutil.copy2(src, dest)
+
+
+def clear_destination(dest: Path):
+    """Remove dest before it is rewritten, detaching it from any cache entry."""
+    dest.unlink(missing_ok=True)
+
+
+def fetch_artifact(key: str, dest: Path) -> bool:
+    """
+    Materialize a cached artifact at dest.
+    
+    Args:
+        key: Key from artifact_key()
+        dest: Where the artifact is expected
+    
+    Returns:
+        True on a hit (dest now holds the artifact), False on a miss
+    """
+    entry = _entry(key)
+    if not entry.exists():
+        return False
+
+    try:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        clear_destination(dest)
+        _link_or_copy(entry, dest)
+        os.utime(entry)  # LRU bookkeeping (atime is often disabled)
+    except OSError as e:
+        logger.warning(f"Artifact cache fetch failed ({key[:12]}): {e}")
+        return False
+    return True
+
+
+def store_artifact(key: str, src: Path):
+    """Add a freshly produced artifact to the cache (best effort)."""
+    entry = _entry(key)
+    if entry.exists() or not src.exists():
+        return
+
+    tmp = entry.with_name(f".{entry.name}.{uuid.uuid4().hex}")
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        _link_or_copy(src, tmp)
+        os.replace(tmp, entry)
+    except OSError as e:
+        tmp.unlink(missing_ok=True)
+        logger.warning(f"Artifact cache store failed ({key[:12]}): {e}")
+
+
+def fetch_text(key: str) -> str | None:
+    """Cached text for key, or None on a miss."""
+    entry = _entry(key)
+    try:
+        text = entry.read_text(encoding="utf-8")
+        os.utime(entry)
+    except OSError:
+        return None
+    return text
+
+
+def store_text(key: str, text: str):
+    """Cache text under key (best effort; concurrent writers race harmlessly)."""
+    entry = _entry(key)
+    tmp = entry.with_name(f".{entry.name}.{uuid.uuid4().hex}")
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, entry)
+    except OSError as e:
+        tmp.unlink(missing_ok=True)
+        logger.warning(f"Artifact cache store failed ({key[:12]}): {e}")
+
+
+def prune_cache(max_bytes: int = MAX_CACHE_BYTES):
+    """Delete least-recently-used entries until the cache fits in max_bytes."""
+    if not CACHE_DIR.exists():
+        return
+
+    entries = []
+    total = 0
+    for path in CACHE_DIR.glob("*/*"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+
+    if total <= max_bytes:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        path.unlink(missing_ok=True)
+        total -= size
+        if total <= max_bytes:
+            break
@@ -1,6 +1,42 @@
-import json
 import re
 
+import orjson
+
+
+def extract_first_json_object(text: str) -> str:
+    """
+    Return the first balanced {...} substring of text.
+
+    Single left-to-right scan tracking brace depth; braces inside JSON string
+    literals (including escaped quotes) are ignored.
+    """
+    start = -1
+    depth = 0
+    in_string = False
+    escaped = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            if depth:
+                in_string = True
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+
+    raise ValueError(f"No JSON object found in LLM output:\n{text[:300]}")
+
 
 def extract_json(text: str) -> dict:
     """
@@ -18,21 +54,17 @@ def extract_json(text: str) -> dict:
 
     # 2️⃣ Fast path: pure JSON
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
+        return orjson.loads(cleaned)
+    except orjson.JSONDecodeError:
         pass
 
     # 3️⃣ Extract first JSON object
-    match = re.search(r"\{[\s\S]*\}", cleaned)
-    if not match:
-        raise ValueError(
-            f"No JSON object found in LLM output:\n{cleaned[:300]}"
-        )
+    snippet = extract_first_json_object(cleaned)
 
     try:
-        return json.loads(match.group(0))
-    except json.JSONDecodeError as e:
+        return orjson.loads(snippet)
+    except orjson.JSONDecodeError as e:
         raise ValueError(
             f"Invalid JSON extracted from LLM output: {e}\n"
-            f"Extracted snippet:\n{match.group(0)[:300]}"
+            f"Extracted snippet:\n{snippet[:300]}"
         )
\ No newline at end of file
@@ -3,7 +3,10 @@ LLM client with logging and retry logic.
 """
 import os
 import time
-from openai import AzureOpenAI
+import asyncio
+import httpx
+from typing import Callable
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from dotenv import load_dotenv
 import logging
 
@@ -21,8 +24,17 @@ client = AzureOpenAI(
 )
 deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 
+# Concurrent requests per batch; each pending request costs a socket, not a thread
+MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "64"))
 
-def call_llm(prompt: str, temperature: float = 0, max_retries: int = 3, timeout: int = 60):
+
+def call_llm(
+    prompt: str,
+    temperature: float = 0,
+    max_retries: int = 3,
+    timeout: int = 60,
+    system: str | None = None,
+):
     """
     Call LLM with logging, retry logic, and timing.
     
@@ -31,12 +43,18 @@ def call_llm(prompt: str, temperature: float = 0, max_retries: int = 3, timeout:
         temperature: LLM temperature (0 = deterministic)
         max_retries: Number of retry attempts
         timeout: Request timeout in seconds
+        system: Optional system message sent ahead of the prompt. Keep it
+            identical across calls so the provider can reuse its cached prefix
     
     Returns:
         LLM response content
     """
     prompt_preview = prompt[:100].replace('\n', ' ') + "..." if len(prompt) > 100 else prompt
     
+    messages = [{"role": "user", "content": prompt}]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    
     for attempt in range(max_retries):
         try:
             start_time = time.time()
@@ -45,7 +63,7 @@ def call_llm(prompt: str, temperature: float = 0, max_retries: int = 3, timeout:
             
             response = client.chat.completions.create(
                 model=deployment_name,
-                messages=[{"role": "user", "content": prompt}],
+                messages=messages,
                 temperature=temperature,
                 timeout=timeout
             )
@@ -71,4 +89,105 @@ def call_llm(prompt: str, temperature: float = 0, max_retries: int = 3, timeout:
                 logger.error(f"LLM request failed after {max_retries} attempts")
                 raise
     
-    raise RuntimeError("LLM call failed after all retries")
\ No newline at end of file
+    raise RuntimeError("LLM call failed after all retries")
+
+
+def call_llm_batch(
+    prompts: list[str],
+    temperature: float = 0,
+    max_retries: int = 3,
+    timeout: int = 60,
+    system: str | list[str | None] | None = None,
+    max_inflight: int | None = None,
+) -> list:
+    """Sync entry point for worker threads; see acall_llm_batch."""
+    return asyncio.run(acall_llm_batch(prompts, temperature, max_retries, timeout, system, max_inflight))
+
+
+async def acall_llm_batch(
+    prompts: list[str],
+    temperature: float = 0,
+    max_retries: int = 3,
+    timeout: int = 60,
+    system: str | list[str | None] | None = None,
+    max_inflight: int | None = None,
+    on_result: Callable[[int, object], None] | None = None,
+) -> list:
+    """
+    Send several prompts at once, all in flight together.
+    
+    Azure chat completions take one conversation per request, so the batch is
+    issued concurrently on one event loop over a shared connection pool
+    rather than one round-trip (or one thread) per prompt.
+    
+    Args:
+        prompts: Input prompts
+        temperature: LLM temperature (0 = deterministic)
+        max_retries: Number of retry attempts per prompt
+        timeout: Request timeout in seconds
+        system: Optional system message shared by every prompt, or a list
+            aligned with prompts giving each its own (None for none)
+        max_inflight: Cap on concurrent requests (default: MAX_INFLIGHT).
+            Requests start in list order, so earlier prompts get slots first
+        on_result: Optional callback(index, result) run as each prompt finishes
+    
+    Returns:
+        List aligned with prompts: response content, or the exception raised
+        once that prompt's retries were exhausted
+    """
+    if not prompts:
+        return []
+    
+    max_inflight = max_inflight or MAX_INFLIGHT
+    sem = asyncio.Semaphore(max_inflight)
+    systems = system if isinstance(system, list) else [system] * len(prompts)
+    
+    # A client per batch: its pool is bound to this event loop
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight),
+    )
+    async with AsyncAzureOpenAI(
+        api_version=api_version,
+        azure_endpoint=endpoint,
+        api_key=subscription_key,
+        http_client=http_client,
+    ) as aclient:
+        
+        async def _call(i: int, prompt: str):
+            result = await _complete(prompt, systems[i])
+            if on_result:
+                on_result(i, result)
+            return result
+        
+        async def _complete(prompt: str, system: str | None):
+            messages = [{"role": "user", "content": prompt}]
+            if system:
+                messages.insert(0, {"role": "system", "content": system})
+            
+            async with sem:
+                for attempt in range(max_retries):
+                    try:
+                        start_time = time.time()
+                        response = await aclient.chat.completions.create(
+                            model=deployment_name,
+                            messages=messages,
+                            temperature=temperature,
+                            timeout=timeout
+                        )
+                        elapsed = time.time() - start_time
+                        logger.debug(f"LLM response received in {elapsed:.1f}s")
+                        return response.choices[0].message.content
+                    
+                    except Exception as e:
+                        logger.warning(f"LLM request failed (attempt {attempt + 1}/{max_retries}): {e}")
+                        
+                        if attempt < max_retries - 1:
+                            # Exponential backoff
+                            await asyncio.sleep(2 ** attempt)
+                        else:
+                            logger.error(f"LLM request failed after {max_retries} attempts")
+                            return e
+            
+            return RuntimeError("LLM call failed after all retries")
+        
+        return await asyncio.gather(*[_call(i, p) for i, p in enumerate(prompts)])
@@ -0,0 +1,125 @@
+"""
+Shared Manim generator prompt, split for provider-side prompt caching.
+
+manim_generator.txt is ~22KB of instructions that are identical for every
+scene, followed by a short per-scene block. Azure OpenAI caches a prompt
+prefix automatically when consecutive requests start with the same tokens,
+so the static instructions are sent as a fixed system message and only the
+scene block varies per request.
+
+Instructions that only apply when a scene has a given field are wrapped in
+marker lines, each on a line of its own:
+
+    {% if pexels_image_path %}
+    ...
+    {% endif %}
+
+The section is kept only for scenes where that field is set (truthy), so
+other scenes don't pay for its tokens. Sections do not nest. Each distinct
+combination of fields yields one fixed system prompt, which still caches.
+
+The runtime-fix prompt used by the render stages is loaded here too.
+"""
+import re
+import orjson
+from functools import lru_cache
+from string import Template
+
+from app.paths import PROMPTS_DIR
+
+MANIM_PROMPT_PATH = PROMPTS_DIR / "manim_generator.txt"
+RUNTIME_FIX_PROMPT_PATH = PROMPTS_DIR / "manim_runtime_fix.txt"
+
+# Everything from this heading on is per-scene; everything before it is static
+SCENE_MARKER = "## SCENE TO GENERATE"
+
+# {% if field %} ... {% endif %} blocks in the static part
+_CONDITIONAL = re.compile(r"^\{% if (\w+) %\}\n(.*?)^\{% endif %\}\n", re.M | re.S)
+
+
+@lru_cache(maxsize=1)
+def _load_manim_prompt() -> tuple[str, Template]:
+    """Read the generator prompt once and split it into (static text, per-scene template)."""
+    if not MANIM_PROMPT_PATH.exists():
+        raise FileNotFoundError(f"Prompt not found: {MANIM_PROMPT_PATH}")
+
+    text = MANIM_PROMPT_PATH.read_text(encoding="utf-8")
+    static, marker, scene_block = text.partition(SCENE_MARKER)
+    if not marker:
+        raise ValueError(f"{MANIM_PROMPT_PATH.name} is missing the '{SCENE_MARKER}' section")
+
+    return static.rstrip(), Template(marker + scene_block)
+
+
+@lru_cache(maxsize=1)
+def _conditional_fields() -> frozenset[str]:
+    """Scene fields that switch a section of the static prompt on."""
+    static, _ = _load_manim_prompt()
+    return frozenset(m.group(1) for m in _CONDITIONAL.finditer(static))
+
+
+@lru_cache(maxsize=None)
+def _static_prompt(fields: frozenset[str]) -> str:
+    """Static instructions specialized to the scene fields that are present."""
+    static, _ = _load_manim_prompt()
+    return _CONDITIONAL.sub(lambda m: m.group(2) if m.group(1) in fields else "", static)
+
+
+def build_manim_prompt(scene: dict, scene_id, duration, visual_elements: str) -> tuple[str, str]:
+    """
+    Build the Manim generator prompt for one scene.
+
+    Args:
+        scene: Scene dict (serialized into the scene block)
+        scene_id: Scene number (also names the generated class)
+        duration: Scene duration in seconds
+        visual_elements: Comma-separated visual elements
+
+    Returns:
+        (system, user) - the static instructions and the per-scene block
+    """
+    _, scene_template = _load_manim_prompt()
+    system = _static_prompt(frozenset(f for f in _conditional_fields() if scene.get(f)))
+
+    # One pass over the scene block; the static instructions are never copied
+    user = scene_template.substitute(
+        scene_json=orjson.dumps(scene, option=orjson.OPT_INDENT_2).decode(),
+        duration=duration,
+        visual_elements=visual_elements,
+        scene_id=scene_id,
+    )
+
+    return system, user
+
+
+@lru_cache(maxsize=1)
+def _load_runtime_fix_template() -> str | None:
+    """Read the runtime-fix prompt once; None if the file is missing."""
+    if not RUNTIME_FIX_PROMPT_PATH.exists():
+        return None
+    return RUNTIME_FIX_PROMPT_PATH.read_text(encoding="utf-8")
+
+
+def build_runtime_fix_prompt(broken_code: str, runtime_error: str, scene_data: dict) -> str | None:
+    """
+    Fill manim_runtime_fix.txt for a scene that failed to render.
+    
+    Args:
+        broken_code: Manim code that failed at runtime
+        runtime_error: Full Python traceback
+        scene_data: Original scene requirements
+    
+    Returns:
+        The prompt, or None if the template is missing (callers fall back
+        to an inline prompt)
+    """
+    template = _load_runtime_fix_template()
+    if template is None:
+        return None
+    
+    # Single pass; braces inside the traceback or code are never re-expanded
+    return template.format_map({
+        "runtime_error": runtime_error,
+        "broken_code": broken_code,
+        "scene_json": orjson.dumps(scene_data, option=orjson.OPT_INDENT_2).decode(),
+    })
@@ -0,0 +1,56 @@
+"""
+Warm Manim's one-time caches before the first real render.
+
+Every scene is rendered by a fresh `manim` subprocess, so nothing can be
+shared in memory. What *is* shared is on disk: the fontconfig cache Pango
+uses for Text, and the LaTeX format/font-map files MathTex compiles against.
+Running one tiny dry-run scene at startup builds those once, instead of the
+first scene of the first video paying for it.
+
+Manim's own Tex/ SVG cache is not warmed: it lives under each render's
+--media_dir (one per video), and the warmup renders into a throwaway
+directory. Only the system-level caches (fontconfig, kpathsea/LaTeX formats)
+carry over.
+"""
+import subprocess
+import tempfile
+from pathlib import Path
+
+import logging
+logger = logging.getLogger(__name__)
+
+WARMUP_SCENE = '''from manim import *
+
+
+class WarmupScene(Scene):
+    def construct(self):
+        self.add(Text("Warmup"), MathTex("x^2"))
+'''
+
+
+def warm_manim_caches(timeout: int = 120) -> bool:
+    """
+    Render a throwaway Text + MathTex scene with --dry_run.
+    
+    Failures (no LaTeX installed, manim missing, ...) are logged and ignored;
+    real renders will simply pay the cold-start cost as before.
+    
+    Returns:
+        Whether the warmup render succeeded
+    """
+    with tempfile.TemporaryDirectory(prefix="manim_warmup_") as tmp:
+        scene_file = Path(tmp) / "warmup.py"
+        scene_file.write_text(WARMUP_SCENE, encoding="utf-8")
+        cmd = [
+            "manim", "-ql", "--dry_run",
+            str(scene_file), "WarmupScene",
+            "--media_dir", tmp,
+        ]
+        try:
+            subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Manim warmup skipped: {str(e)[:200]}")
+            return False
+
+    logger.info("System font/LaTeX caches warmed for Manim")
+    return True
@@ -3,8 +3,11 @@ Pexels API client for searching photos and videos.
 https://www.pexels.com/api/documentation/
 """
 import os
+import time
 import httpx
+import orjson
 from pathlib import Path
+from app.utils.artifact_cache import artifact_key, fetch_text, store_text
 import logging
 logger = logging.getLogger(__name__)
 PEXELS_API = "https://api.pexels.com"
@@ -13,6 +16,12 @@ PEXELS_API = "https://api.pexels.com"
 TARGET_ASPECT_RATIO = 16 / 9
 ASPECT_RATIO_TOLERANCE = 0.2  # Allow ±20% tolerance from target
 
+# Download chunk size; large enough that a photo is a handful of writes
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Search results (URLs, not bytes) are reused across runs for this many seconds
+MEDIA_CACHE_TTL = int(os.getenv("PEXELS_CACHE_TTL", "86400"))
+
 
 def _get_headers():
     key = os.getenv("PEXELS_API_KEY")
@@ -59,6 +68,22 @@ def search_photos(query: str, per_page: int = 5) -> list[dict]:
         r.raise_for_status()
         data = r.json()
     
+    return _parse_photos(data, query, per_page)
+
+
+async def asearch_photos(client: httpx.AsyncClient, query: str, per_page: int = 5) -> list[dict]:
+    """Async search_photos over a caller-owned client."""
+    r = await client.get(
+        f"{PEXELS_API}/v1/search",
+        params={"query": query, "per_page": per_page * 2},
+        headers=_get_headers(),
+    )
+    r.raise_for_status()
+    return _parse_photos(r.json(), query, per_page)
+
+
+def _parse_photos(data: dict, query: str, per_page: int) -> list[dict]:
+    """Filter and rank a /v1/search response (shared by the sync and async clients)."""
     results = []
     for p in data.get("photos", []):
         width = p.get("width", 0)
@@ -101,6 +126,22 @@ def search_videos(query: str, per_page: int = 3) -> list[dict]:
         r.raise_for_status()
         data = r.json()
     
+    return _parse_videos(data, query, per_page)
+
+
+async def asearch_videos(client: httpx.AsyncClient, query: str, per_page: int = 3) -> list[dict]:
+    """Async search_videos over a caller-owned client."""
+    r = await client.get(
+        f"{PEXELS_API}/videos/search",
+        params={"query": query, "per_page": per_page * 2},
+        headers=_get_headers(),
+    )
+    r.raise_for_status()
+    return _parse_videos(r.json(), query, per_page)
+
+
+def _parse_videos(data: dict, query: str, per_page: int) -> list[dict]:
+    """Filter and rank a /videos/search response (shared by the sync and async clients)."""
     out = []
     for v in data.get("videos", []):
         files = v.get("video_files", [])
@@ -157,12 +198,43 @@ def search_videos(query: str, per_page: int = 3) -> list[dict]:
     return out[:per_page]
 
 
-def get_media_for_scene(search_terms: list[str], prefer_video: bool = False) -> dict:
+def _media_key(search_terms: list[str], prefer_video: bool) -> str:
+    return artifact_key("pexels_media", search_terms, prefer_video)
+
+
+def _cached_media(key: str) -> dict | None:
+    """Cached search result for key, or None if missing or older than MEDIA_CACHE_TTL."""
+    raw = fetch_text(key)
+    if raw is None:
+        return None
+    try:
+        entry = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+    if time.time() - entry["at"] > MEDIA_CACHE_TTL:
+        return None
+    return entry["media"]
+
+
+def _store_media(key: str, media: dict):
+    # Only hits are kept, so a query that found nothing is retried next run
+    if media["image"] or media["video"]:
+        store_text(key, orjson.dumps({"at": time.time(), "media": media}).decode())
+
+
+def get_media_for_scene(search_terms: list[str], prefer_video: bool = False, refresh: bool = False) -> dict:
     """
     Get one image and optionally one video for a scene.
     search_terms: list of query strings to try.
+    refresh: bypass the search cache (the fresh result replaces the cached one).
     Returns { "image": {...}, "video": {...} or None }.
     """
+    key = _media_key(search_terms, prefer_video)
+    if not refresh:
+        cached = _cached_media(key)
+        if cached is not None:
+            return cached
+    
     image = None
     video = None
     for q in search_terms:
@@ -176,7 +248,40 @@ def get_media_for_scene(search_terms: list[str], prefer_video: bool = False) ->
                 video = videos[0]
         if image and (not prefer_video or video):
             break
-    return {"image": image, "video": video}
+    media = {"image": image, "video": video}
+    _store_media(key, media)
+    return media
+
+
+async def aget_media_for_scene(
+    client: httpx.AsyncClient,
+    search_terms: list[str],
+    prefer_video: bool = False,
+    refresh: bool = False,
+) -> dict:
+    """Async get_media_for_scene over a caller-owned client."""
+    key = _media_key(search_terms, prefer_video)
+    if not refresh:
+        cached = _cached_media(key)
+        if cached is not None:
+            return cached
+    
+    image = None
+    video = None
+    for q in search_terms:
+        if not image:
+            photos = await asearch_photos(client, q, per_page=1)
+            if photos:
+                image = photos[0]
+        if prefer_video and not video:
+            videos = await asearch_videos(client, q, per_page=1)
+            if videos:
+                video = videos[0]
+        if image and (not prefer_video or video):
+            break
+    media = {"image": image, "video": video}
+    _store_media(key, media)
+    return media
 
 
 def download_media(url: str, dest_path: Path) -> bool:
@@ -187,9 +292,83 @@ def download_media(url: str, dest_path: Path) -> bool:
                 r.raise_for_status()
                 dest_path.parent.mkdir(parents=True, exist_ok=True)
                 with open(dest_path, "wb") as f:
-                    for chunk in r.iter_bytes(chunk_size=8192):
+                    for chunk in r.iter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
                         f.write(chunk)
         return True
     except Exception as e:
         logger.warning(f"Failed to download {url}: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+async def adownload_media(client: httpx.AsyncClient, url: str, dest_path: Path) -> bool:
+    """
+    Async download_media over a caller-owned client. Returns True on success.
+    
+    Chunks are written as they arrive, so other downloads on the loop progress
+    while this one waits on the network; a failed download leaves no partial file.
+    """
+    try:
+        async with client.stream("GET", url) as r:
+            r.raise_for_status()
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(dest_path, "wb") as f:
+                async for chunk in r.aiter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to download {url}: {e}")
+        dest_path.unlink(missing_ok=True)
+        return False
+
+
+async def adownload_scene_media(client: httpx.AsyncClient, media: dict, dest_dir: Path, name: str, label: str) -> dict:
+    """
+    Download a search result's image, or its video only if there is no image.
+    
+    Args:
+        client: Shared async client
+        media: Result of aget_media_for_scene
+        dest_dir: Directory for the downloads
+        name: File stem ({name}_image.jpg / {name}_video.mp4)
+        label: Log prefix (e.g. "Scene 3")
+    
+    Returns:
+        { "image": {local_path, src, alt} or None, "video": {local_path, src} or None }
+    """
+    result = {"image": None, "video": None}
+    
+    # Download image (preferred)
+    image = media.get("image")
+    if image and image.get("src"):
+        image_path = dest_dir / f"{name}_image.jpg"
+        if await adownload_media(client, image["src"], image_path):
+            result["image"] = {
+                "local_path": str(image_path),
+                "src": image["src"],
+                "alt": image.get("alt", "")
+            }
+            logger.info(f"{label}: Downloaded image {image_path.name}")
+        else:
+            logger.warning(f"{label}: Image download failed")
+    
+    # Download video as fallback
+    video = media.get("video")
+    if video and video.get("src") and not result["image"]:
+        video_path = dest_dir / f"{name}_video.mp4"
+        if await adownload_media(client, video["src"], video_path):
+            result["video"] = {
+                "local_path": str(video_path),
+                "src": video["src"]
+            }
+            logger.info(f"{label}: Downloaded video {video_path.name}")
+        else:
+            logger.warning(f"{label}: Video download failed")
+    
+    return result
+
+
+def async_client(max_inflight: int) -> httpx.AsyncClient:
+    """Shared client for a batch of Pexels requests (one pool, reused connections)."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight),
+    )
@@ -3,12 +3,19 @@ Validate generated Manim code before attempting to render.
 Catches common issues: missing imports, syntax errors, undefined variables, and ImageMobject pitfalls.
 """
 import ast
+import hashlib
 import re
+import threading
 from typing import Tuple, Optional
 
 import logging
 logger = logging.getLogger(__name__)
 
+# (sha1(code), scene_id) of code that already passed, so repeats skip the parse
+_validated: set[tuple[bytes, int]] = set()
+_validated_lock = threading.Lock()
+MAX_VALIDATED = 4096
+
 
 class ManimCodeValidator:
     """Validates Manim-generated Python code."""
@@ -215,10 +222,19 @@ def validate_manim_code(code: str, scene_id: int) -> Tuple[bool, Optional[str]]:
     Returns:
         (is_valid, error_message)
     """
+    key = (hashlib.sha1(code.encode("utf-8")).digest(), scene_id)
+    if key in _validated:
+        logger.info(f"✓ Scene {scene_id} code validation passed (seen before)")
+        return True, None
+    
     validator = ManimCodeValidator()
     is_valid, error = validator.validate(code, scene_id)
     
     if is_valid:
+        with _validated_lock:
+            if len(_validated) >= MAX_VALIDATED:
+                _validated.clear()
+            _validated.add(key)
         logger.info(f"✓ Scene {scene_id} code validation passed")
     else:
         logger.error(f"✗ Scene {scene_id} code validation failed: {error}")